@@ -3,7 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import UserProfile
 from django.contrib import admin
-from .models import FAQCategory, FAQItem
+from .models import FAQCategory, FAQItem, Job
 
 
 class UserProfileInline(admin.StackedInline):
@@ -74,4 +74,10 @@ class FAQItemAdmin(admin.ModelAdmin):
     class Media:
         css = {
             'all': ('admin/css/faq_admin.css',)
-        }
\ No newline at end of file
+        }
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'max_attempts', 'run_at', 'updated_at']
+    list_filter = ['status', 'task']
+    readonly_fields = ['payload', 'last_error', 'locked_at', 'created_at', 'updated_at']
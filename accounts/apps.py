@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        # Register signal handlers and job tasks that live outside models.py
+        from . import caching, chat_sessions, faq_bot, ratings, realtime, tasks, technician_search, ticket_stats
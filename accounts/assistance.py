@@ -0,0 +1,58 @@
+# accounts/assistance.py
+"""
+Opening an assistance request from the technician directory.
+
+open_assistance_request() writes the ticket, the assistance request (whose
+post_save receiver in accounts.chat_sessions opens the ticket chat with its
+first message) and the customer's contact in one transaction, so a failure
+leaves nothing behind. Notifying the technician is not needed for the
+request to exist and is queued as a background job in the same transaction.
+"""
+from django.db import transaction
+
+from .jobs import enqueue
+from .models import AssistanceRequest, Contact, CreateTicket
+from .tasks import notify_assistance_request
+
+DEFAULT_CATEGORY = 'Others'
+
+
+def open_assistance_request(user, technician, title, description, priority=None):
+    """Create the ticket and assistance request for technician; returns both"""
+    technician_user = technician.user_profile.user
+    priority = priority or 'medium'
+
+    with transaction.atomic():
+        # Use last ticket category if available, otherwise default
+        last_category = CreateTicket.objects.filter(user=user).order_by('-id').values_list(
+            'category', flat=True
+        ).first()
+        ticket = CreateTicket.objects.create(
+            user=user,
+            title=title,
+            description=description,
+            priority=priority,
+            category=last_category or DEFAULT_CATEGORY,
+            status='open',
+            technician=technician_user,
+        )
+        assistance_request = AssistanceRequest.objects.create(
+            user=user,
+            technician=technician,
+            ticket=ticket,
+            title=title,
+            description=description,
+            priority=priority,
+            status='pending',
+        )
+        # One INSERT; an existing (user, contact_user) row is left as is
+        Contact.objects.bulk_create([Contact(
+            user=user,
+            contact_user=technician_user,
+            contact_name=technician_user.get_full_name() or technician_user.username,
+        )], ignore_conflicts=True)
+
+        enqueue(notify_assistance_request, assistance_request_id=assistance_request.id)
+
+    return ticket, assistance_request
+
@@ -0,0 +1,176 @@
+# accounts/benchmarks.py
+"""
+Benchmarks of the critical pages, run against seeded data.
+
+Each benchmark sends the same request repeatedly through the Django test
+client, acting as the busiest seeded customer or technician. The users
+come from seed_load_data, so a given seed always gives the same worst
+case. Each benchmark records:
+- p50_ms and p95_ms, the latency percentiles
+- queries, the most SQL queries any request ran
+- peak_kib, the median of the highest memory allocated while serving one
+  request, measured with tracemalloc in a separate pass because tracing
+  slows every allocation down
+
+Results are saved as a JSON baseline (the run_benchmarks command). A later
+run is compared with the baseline by find_regressions(). Latency and
+memory may grow by up to the threshold ratio before they count as a
+regression. Query counts must not grow at all. Latencies only compare
+between runs on the same machine and database.
+"""
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from .metrics import RequestStats
+from .models import ChatSession
+
+Benchmark = namedtuple('Benchmark', 'name user method path data')
+
+# The names of the metrics that are compared with the baseline
+RATIO_METRICS = ('p50_ms', 'p95_ms', 'peak_kib')
+EXACT_METRICS = ('queries',)
+# Changes this small are noise, however large the ratio
+MIN_CHANGE = {'p50_ms': 1.0, 'p95_ms': 1.0, 'peak_kib': 16}
+
+BOT_MESSAGE = 'My wifi keeps disconnecting'
+
+
+class NoSeededData(Exception):
+    """There are no seeded users to benchmark with"""
+
+
+def busiest_users(prefix):
+    """The seeded customer who filed the most tickets and the technician assigned the most"""
+    seeded = User.objects.filter(username__startswith=f'{prefix}_')
+    customer = seeded.filter(profile__is_technician=False).annotate(
+        tickets=Count('createticket')
+    ).order_by('-tickets', 'id').first()
+    technician = seeded.filter(profile__is_technician=True).annotate(
+        tickets=Count('create_ticket_assigned')
+    ).order_by('-tickets', 'id').first()
+    if customer is None or technician is None:
+        raise NoSeededData(f'No seeded users prefixed "{prefix}_"; run seed_load_data first')
+    return customer, technician
+
+
+def build_benchmarks(customer, technician):
+    """The benchmarked requests; creates the customer's bot chat if they have none"""
+    busiest_chat = ChatSession.objects.filter(user=customer, chat_type='user_tech').annotate(
+        message_total=Count('messages')
+    ).order_by('-message_total', 'id').first()
+    bot_chat, _ = ChatSession.objects.get_or_create(user=customer, chat_type='user_bot')
+    benchmarks = [
+        Benchmark('technician_directory', customer, 'get', reverse('technician_directory'), None),
+        Benchmark('user_messages', customer, 'get', reverse('user_message'), None),
+        Benchmark('technician_messages', technician, 'get', reverse('technician_messages'), None),
+        Benchmark('unread_count', customer, 'get', reverse('get_unread_count'), None),
+        Benchmark('send_bot_message', customer, 'post', reverse('user_message'), {
+            'action': 'send_message', 'chat_session_id': bot_chat.id, 'content': BOT_MESSAGE,
+        }),
+        Benchmark('user_dashboard', customer, 'get', reverse('user_dashboard'), None),
+        Benchmark('technician_dashboard', technician, 'get', reverse('technician_dashboard'), None),
+    ]
+    if busiest_chat is not None:
+        benchmarks.insert(3, Benchmark(
+            'chat_messages', customer, 'get', reverse('get_chat_messages', args=[busiest_chat.id]), None
+        ))
+    return benchmarks
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_benchmark(benchmark, requests, warmup=3, memory_requests=5):
+    """Measure one benchmark; returns its metrics"""
+    client = Client()
+    client.force_login(benchmark.user)
+    send = getattr(client, benchmark.method)
+
+    def request():
+        response = send(benchmark.path, benchmark.data) if benchmark.data else send(benchmark.path)
+        if response.status_code != 200:
+            raise RuntimeError(f'{benchmark.name}: {benchmark.path} returned {response.status_code}')
+        if response.get('Content-Type') == 'application/json' and response.json().get('success') is False:
+            raise RuntimeError(f'{benchmark.name}: {benchmark.path} failed: {response.json().get("error")}')
+
+    for _ in range(warmup):
+        request()
+
+    timings, queries = [], []
+    for _ in range(requests):
+        stats = RequestStats()
+        with connection.execute_wrapper(stats):
+            start = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(stats.queries)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(memory_requests):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            request()
+            peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': max(queries),
+        'peak_kib': round(statistics.median(peaks), 1) if peaks else None,
+    }
+
+
+def environment(requests):
+    """What a baseline was measured on"""
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        'requests': requests,
+    }
+
+
+def find_regressions(baseline, results, threshold):
+    """
+    Compare results with a baseline ({name: metrics} each).
+
+    Returns (name, metric, old, new) for every metric that got worse by
+    more than threshold (a ratio) and by more than MIN_CHANGE, or for
+    queries, that grew at all. Benchmarks missing from either side are
+    skipped.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        old_metrics = baseline.get(name)
+        if old_metrics is None:
+            continue
+        for metric in RATIO_METRICS + EXACT_METRICS:
+            old, new = old_metrics.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            if metric in EXACT_METRICS:
+                allowed = old
+            else:
+                allowed = max(old * (1 + threshold), old + MIN_CHANGE[metric])
+            if new > allowed:
+                regressions.append((name, metric, old, new))
+    return regressions
@@ -0,0 +1,161 @@
+# accounts/caching.py
+"""
+Namespaced, versioned caching for read-heavy pages.
+
+Cached values are grouped into namespaces ('faq', 'technicians', or a
+per-user scope such as 'user:42'). Every namespace has a version token in
+the cache and each key embeds the versions of the namespaces it depends on,
+so invalidating is a single write: bump() replaces the token and every key
+built on the old one is simply never read again. The model hooks at the
+bottom of this module bump namespaces when the rows behind them change.
+
+The @cached decorator wraps functions that build page data rather than
+whole views, so per-request output such as CSRF tokens and flash messages
+is still rendered fresh. The backend is whatever settings.CACHES points at
+(local memory by default, Redis when REDIS_URL is set).
+"""
+import functools
+import hashlib
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    AssistanceRequest, CreateTicket, FAQCategory, FAQItem, Notification,
+    Technician, TechnicianReview, TechnicianSpecialty, UserProfile,
+)
+
+KEY_PREFIX = 'fixit'
+
+# Default lifetime of cached page data, in seconds
+DEFAULT_TIMEOUT = 300
+
+FAQ = 'faq'
+TECHNICIANS = 'technicians'
+
+
+def user_namespace(user_id):
+    """Namespace for data that belongs to a single user"""
+    return f'user:{user_id}'
+
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:version:{namespace}'
+
+
+def get_versions(*namespaces):
+    """Return the current version token of each namespace, in order"""
+    keys = [_version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            # Keep whichever token a concurrent request stored first
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+def get_version(namespace):
+    """Return the current version token of a namespace"""
+    return get_versions(namespace)[0]
+
+
+def bump(*namespaces):
+    """Invalidate everything cached under the given namespaces"""
+    cache.set_many({
+        _version_key(namespace): uuid.uuid4().hex for namespace in namespaces
+    }, None)
+
+
+def bump_on_commit(*namespaces):
+    """Invalidate once the current transaction commits"""
+    # Bumping earlier would let a concurrent request re-cache the old rows
+    transaction.on_commit(lambda: bump(*namespaces))
+
+
+def make_key(name, namespaces, parts=()):
+    """Build a cache key tied to the current versions of its namespaces"""
+    raw = repr((get_versions(*namespaces), tuple(parts)))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{name}:{digest}'
+
+
+def cached(*namespaces, timeout=DEFAULT_TIMEOUT):
+    """
+    Cache a function's return value until one of its namespaces is bumped.
+
+    Namespaces are names, or callables that receive the function's
+    arguments and return a name (for per-user scopes). Arguments are part
+    of the key, so they should be simple values such as ids and strings.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            scopes = [
+                namespace(*args, **kwargs) if callable(namespace) else namespace
+                for namespace in namespaces
+            ]
+            key = make_key(name, scopes, (args, sorted(kwargs.items())))
+            value = cache.get(key)
+            if value is None:
+                value = func(*args, **kwargs)
+                cache.set(key, value, timeout)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+# Invalidation hooks
+
+@receiver(post_save, sender=FAQItem)
+@receiver(post_delete, sender=FAQItem)
+@receiver(post_save, sender=FAQCategory)
+@receiver(post_delete, sender=FAQCategory)
+def invalidate_faq(sender, **kwargs):
+    bump_on_commit(FAQ)
+
+
+@receiver(post_save, sender=Technician)
+@receiver(post_delete, sender=Technician)
+@receiver(post_save, sender=TechnicianSpecialty)
+@receiver(post_delete, sender=TechnicianSpecialty)
+@receiver(post_save, sender=TechnicianReview)
+@receiver(post_delete, sender=TechnicianReview)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(m2m_changed, sender=Technician.specialties.through)
+def invalidate_technicians(sender, **kwargs):
+    bump_on_commit(TECHNICIANS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_technicians_on_user_change(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no cached page shows
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_on_commit(TECHNICIANS)
+
+
+@receiver(post_save, sender=CreateTicket)
+@receiver(post_delete, sender=CreateTicket)
+@receiver(post_save, sender=AssistanceRequest)
+@receiver(post_delete, sender=AssistanceRequest)
+def invalidate_ticket_owner(sender, instance, **kwargs):
+    bump_on_commit(user_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_notification_recipient(sender, instance, **kwargs):
+    bump_on_commit(user_namespace(instance.recipient_id))
@@ -0,0 +1,155 @@
+# accounts/chat_sessions.py
+"""
+Ticket chat sessions between customers and technicians.
+
+A chat is opened as soon as a technician is attached to a ticket: when the
+assistance request is created and again (idempotently) when it is accepted.
+Page views only read chats. reconcile_ticket_chats() repairs tickets that
+predate this or slipped through, in batches and without per-ticket queries;
+it backs the reconcile_ticket_chats management command.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AssistanceRequest, ChatSession, Message, UnreadMessageCounter
+
+RECONCILE_BATCH_SIZE = 500
+
+
+def ticket_chat_message(ticket):
+    """Opening message for a chat created from a ticket"""
+    return (
+        f"Support ticket created: {ticket.title}\n\n"
+        f"Description: {ticket.description}\n"
+        f"Category: {ticket.category}\n"
+        f"Priority: {ticket.priority}"
+    )
+
+
+def assistance_request_message(assistance_request):
+    """Opening message for a chat created from an assistance request"""
+    return (
+        f"New assistance request: {assistance_request.title}\n\n"
+        f"Description: {assistance_request.description}\n"
+        f"Priority: {assistance_request.priority}"
+    )
+
+
+def ensure_ticket_chat(user, technician_user, ticket, initial_message):
+    """Return the chat for a ticket and technician, opening it if needed"""
+    with transaction.atomic(savepoint=False):
+        chat_session, created = ChatSession.objects.get_or_create(
+            user=user,
+            technician=technician_user,
+            ticket=ticket,
+            defaults={
+                'chat_type': 'user_tech',
+                'status': 'active',
+                'last_message_at': timezone.now(),
+            }
+        )
+        if created:
+            Message.objects.create(
+                chat_session=chat_session,
+                sender=user,
+                receiver=technician_user,
+                content=initial_message,
+                message_type='user_to_tech'
+            )
+    return chat_session, created
+
+
+def ensure_assistance_request_chat(assistance_request):
+    """Open the chat for an assistance request"""
+    return ensure_ticket_chat(
+        assistance_request.user,
+        assistance_request.technician.user_profile.user,
+        assistance_request.ticket,
+        assistance_request_message(assistance_request),
+    )
+
+
+def missing_ticket_chats(technician_user=None):
+    """
+    Assistance requests whose ticket has no chat with their technician.
+
+    A single anti-join, so finding the gaps costs one query however many
+    tickets a technician has.
+    """
+    requests = AssistanceRequest.objects.filter(ticket__isnull=False).annotate(
+        has_chat=Exists(ChatSession.objects.filter(
+            ticket=OuterRef('ticket'),
+            technician=OuterRef('technician__user_profile__user'),
+        ))
+    ).filter(has_chat=False)
+    if technician_user is not None:
+        requests = requests.filter(technician__user_profile__user=technician_user)
+    return requests.select_related('ticket', 'technician__user_profile').order_by('id')
+
+
+def reconcile_ticket_chats(technician_user=None, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Open the missing chats for assigned tickets and return them.
+
+    Chats and their opening messages are written with bulk_create one batch
+    at a time. Running it again finds nothing left to do.
+    """
+    created = []
+    requests = missing_ticket_chats(technician_user)
+    while True:
+        # Each pass re-runs the anti-join, so finished rows drop out
+        batch = list(requests[:batch_size])
+        if not batch:
+            return created
+
+        pending = {}
+        for assistance_request in batch:
+            key = (assistance_request.ticket_id, assistance_request.technician.user_profile.user_id)
+            pending.setdefault(key, assistance_request.ticket)
+
+        now = timezone.now()
+        chats = [
+            ChatSession(
+                user_id=ticket.user_id,
+                technician_id=technician_id,
+                ticket=ticket,
+                chat_type='user_tech',
+                status='active',
+                last_message_at=now,
+                # The opening message below is unread for the technician
+                technician_unread_count=1,
+            )
+            for (_, technician_id), ticket in pending.items()
+        ]
+        with transaction.atomic():
+            ChatSession.objects.bulk_create(chats)
+            # bulk_create skips Message.save, so total counters are bumped here
+            Message.objects.bulk_create(
+                Message(
+                    chat_session=chat,
+                    sender_id=chat.user_id,
+                    receiver_id=chat.technician_id,
+                    content=ticket_chat_message(chat.ticket),
+                    message_type='user_to_tech',
+                )
+                for chat in chats
+            )
+            opened = {}
+            for chat in chats:
+                opened[chat.technician_id] = opened.get(chat.technician_id, 0) + 1
+            for technician_id, count in opened.items():
+                UnreadMessageCounter.adjust(technician_id, None, count)
+        created.extend(chats)
+
+        if len(batch) < batch_size:
+            return created
+
+
+@receiver(post_save, sender=AssistanceRequest)
+def open_chat_for_assistance_request(sender, instance, created, **kwargs):
+    """Open the ticket chat as soon as a technician is asked for help"""
+    if created:
+        ensure_assistance_request_chat(instance)
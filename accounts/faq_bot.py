@@ -0,0 +1,300 @@
+# accounts/faq_bot.py
+"""
+In-memory FAQ data used by the FixIT Assistant bot.
+
+The ranking model and the button payloads are built once per process and
+tagged with the version of the 'faq' cache namespace (see caching.py).
+Saving or deleting an FAQItem or FAQCategory bumps that version, so every
+process rebuilds on its next bot reply. Building the model precomputes BM25 term statistics for
+every field, so answering a chat message only walks the posting lists of
+the words in that message and makes no FAQ queries in steady state.
+"""
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from .caching import FAQ, bump, get_version
+from .models import FAQCategory, FAQItem
+
+# Field weights (same relative importance as the original substring scoring)
+FIELD_WEIGHTS = {
+    'question': 3.0,
+    'keywords': 5.0,
+    'short_question': 8.0,
+    'answer': 2.0,
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Each point of bot_priority nudges a matching FAQ up by this much
+PRIORITY_BOOST = 0.1
+
+# Matches scoring below this are treated as "no answer found"
+MIN_SCORE = 1.0
+
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'can', 'do',
+    'does', 'for', 'from', 'has', 'have', 'how', 'i', 'if', 'in', 'is',
+    'it', 'its', 'me', 'my', 'no', 'not', 'of', 'on', 'or', 'so', 'that',
+    'the', 'this', 'to', 'was', 'what', 'when', 'where', 'which', 'why',
+    'will', 'with', 'you', 'your',
+])
+
+TOKEN_RE = re.compile(r"[\w']+")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens, dropping stop words"""
+    return [
+        token for token in TOKEN_RE.findall((text or '').lower())
+        if token not in STOP_WORDS
+    ]
+
+
+def get_field_text(faq, field):
+    """Return the text of an FAQ field used for ranking"""
+    if field == 'keywords':
+        return ' '.join(faq.get_keywords_list())
+    return getattr(faq, field) or ''
+
+
+class FAQIndex:
+    """
+    Field-weighted BM25 model over the active FAQ items.
+
+    Every (term, FAQ) pair gets its final BM25F weight at build time and is
+    stored in compact parallel arrays per term, so scoring a message is a
+    sparse dot product between the message terms and those posting lists.
+    """
+
+    def __init__(self, faqs):
+        self.faqs = list(faqs)
+        self.postings = {}
+
+        field_counts = []
+        field_lengths = defaultdict(float)
+        document_frequency = Counter()
+
+        for faq in self.faqs:
+            counts = {}
+            terms = set()
+            for field in FIELD_WEIGHTS:
+                tokens = tokenize(get_field_text(faq, field))
+                counts[field] = Counter(tokens)
+                field_lengths[field] += len(tokens)
+                terms.update(tokens)
+            field_counts.append(counts)
+            document_frequency.update(terms)
+
+        total = len(self.faqs)
+        average_lengths = {
+            field: (field_lengths[field] / total if total else 0.0) or 1.0
+            for field in FIELD_WEIGHTS
+        }
+
+        positions = defaultdict(lambda: array('I'))
+        weights = defaultdict(lambda: array('f'))
+
+        for position, counts in enumerate(field_counts):
+            term_frequency = defaultdict(float)
+            for field, weight in FIELD_WEIGHTS.items():
+                field_length = sum(counts[field].values())
+                norm = (1 - B) + B * field_length / average_lengths[field]
+                for term, count in counts[field].items():
+                    term_frequency[term] += weight * count / norm
+
+            for term, tf in term_frequency.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                positions[term].append(position)
+                weights[term].append(idf * tf * (K1 + 1) / (tf + K1))
+
+        for term in positions:
+            self.postings[term] = (positions[term], weights[term])
+
+    @property
+    def term_count(self):
+        """Number of distinct terms in the model"""
+        return len(self.postings)
+
+    def search(self, query, limit=3):
+        """Return the best matching FAQ items for a user message"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            for position, weight in zip(*posting):
+                scores[position] += weight
+
+        ranked = []
+        for position, score in scores.items():
+            if score >= MIN_SCORE:
+                score += PRIORITY_BOOST * self.faqs[position].bot_priority
+                ranked.append((score, -position))
+
+        return [self.faqs[-position] for _, position in heapq.nlargest(limit, ranked)]
+
+
+# Number of FAQ / button entries offered in bot replies
+QUICK_ACTION_CATEGORIES = 3
+QUICK_ACTION_FAQS_PER_CATEGORY = 2
+RELATED_FAQ_LIMIT = 5
+RELATED_BUTTON_LIMIT = 5
+
+GENERAL_ACTION_BUTTONS = [
+    {'text': '🏠 Main Menu', 'action': 'menu', 'icon': 'home'},
+    {'text': '📝 Create Ticket', 'action': 'create_ticket', 'icon': 'ticket-alt'},
+    {'text': '👨‍💻 Contact Tech', 'action': 'contact_technician', 'icon': 'user-cog'},
+    {'text': '📋 All FAQs', 'action': 'view_faqs', 'icon': 'book'},
+]
+
+
+class FAQBotData:
+    """
+    Everything the bot needs from the FAQ tables for one data version:
+    the ranking model plus the button/related-FAQ payloads, which are
+    built lazily on first use and then reused for every reply.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.categories = list(FAQCategory.objects.order_by('order'))
+        self.index = FAQIndex(
+            FAQItem.objects.filter(is_active=True).select_related('category')
+        )
+        self.faqs_by_category = defaultdict(list)
+        for faq in self.index.faqs:
+            self.faqs_by_category[faq.category_id].append(faq)
+        self.payloads = {}
+
+    def payload(self, key, builder):
+        """Return a cached payload, building it on first use"""
+        try:
+            return self.payloads[key]
+        except KeyError:
+            value = self.payloads[key] = builder()
+            return value
+
+    def build_quick_action_buttons(self):
+        buttons = []
+        for category in self.categories[:QUICK_ACTION_CATEGORIES]:
+            category_faqs = sorted(
+                (faq for faq in self.faqs_by_category[category.id] if faq.show_in_bot_buttons),
+                key=lambda faq: (faq.bot_priority, faq.order),
+            )
+            for faq in category_faqs[:QUICK_ACTION_FAQS_PER_CATEGORY]:
+                buttons.append({
+                    'text': faq.short_question,
+                    'faq_id': faq.id,
+                    'category': category.name,
+                    'icon': category.icon,
+                    'action': f'faq_{faq.id}'
+                })
+        buttons.extend(GENERAL_ACTION_BUTTONS)
+        return buttons
+
+    def build_category_buttons(self):
+        return [{
+            'text': category.name,
+            'icon': category.icon,
+            'action': f'category_{category.slug}'
+        } for category in self.categories]
+
+    def build_related_faqs(self, category_id):
+        # One spare entry so the FAQ being answered can be excluded
+        return [{
+            'id': faq.id,
+            'short_question': faq.short_question,
+            'question': faq.question,
+        } for faq in self.faqs_by_category[category_id][:RELATED_FAQ_LIMIT + 1]]
+
+    def build_related_buttons(self, category_id):
+        return [{
+            'text': faq.short_question,
+            'faq_id': faq.id
+        } for faq in self.faqs_by_category[category_id]
+            if faq.show_in_bot_buttons][:RELATED_BUTTON_LIMIT]
+
+
+_data = None
+_data_lock = threading.Lock()
+
+
+def get_data_version():
+    """
+    Return the current FAQ data version token.
+
+    The token lives in the Django cache so every process sharing that cache
+    notices FAQ edits made by any other process.
+    """
+    return get_version(FAQ)
+
+
+def get_bot_data():
+    """Return the FAQ bot data for the current version, rebuilding if stale"""
+    global _data
+    version = get_data_version()
+    data = _data
+    if data is None or data.version != version:
+        with _data_lock:
+            if _data is None or _data.version != version:
+                _data = FAQBotData(version)
+            data = _data
+    return data
+
+
+def get_faq_index():
+    """Return the FAQ ranking model for the current data version"""
+    return get_bot_data().index
+
+
+def invalidate_faq_index():
+    """Bump the data version so every process rebuilds on its next reply"""
+    global _data
+    bump(FAQ)
+    with _data_lock:
+        _data = None
+
+
+def rebuild_faq_index():
+    """Rebuild the index immediately and return it"""
+    invalidate_faq_index()
+    return get_faq_index()
+
+
+def get_quick_action_buttons():
+    """Quick action buttons shown with greetings, menus and fallbacks"""
+    data = get_bot_data()
+    return data.payload('quick_actions', data.build_quick_action_buttons)
+
+
+def get_category_buttons():
+    """One button per FAQ category"""
+    data = get_bot_data()
+    return data.payload('categories', data.build_category_buttons)
+
+
+def get_related_faqs(faq_item):
+    """Other FAQs from the same category as the answered FAQ"""
+    data = get_bot_data()
+    related = data.payload(
+        ('related_faqs', faq_item.category_id),
+        lambda: data.build_related_faqs(faq_item.category_id),
+    )
+    return [faq for faq in related if faq['id'] != faq_item.id][:RELATED_FAQ_LIMIT]
+
+
+def get_related_buttons(category):
+    """FAQ buttons for a category"""
+    data = get_bot_data()
+    return data.payload(
+        ('related_buttons', category.id),
+        lambda: data.build_related_buttons(category.id),
+    )
+
@@ -0,0 +1,139 @@
+# accounts/images.py
+"""
+Profile picture processing.
+
+Uploads are validated by decoding them with Pillow, whatever their name
+says. A picture is re-encoded before it is stored. That drops
+EXIF/GPS and other metadata, and applies the EXIF orientation. The stored
+original is capped at MAX_DIMENSION. Square thumbnails are made at each of
+PROFILE_PICTURE_SIZES; they are WebP where Pillow supports it, else JPEG.
+
+Encoded images are spooled to a temporary file, which goes to disk past
+SPOOL_MAX_MEMORY. The storage backend reads it in chunks, so a large
+upload never has to fit in memory twice. Thumbnail names are kept in
+UserProfile.profile_picture_variants. Pages ask for the smallest variant
+that covers the size they display (see get_profile_picture_url).
+"""
+import logging
+import tempfile
+import uuid
+
+from django.core.files import File
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+PROFILE_PICTURE_MAX_BYTES = 5 * 1024 * 1024
+PROFILE_PICTURE_SIZES = (64, 128, 256)
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP'}
+
+# Longest side of the stored original
+MAX_DIMENSION = 1024
+# Refuse decompression bombs before decoding any pixels
+MAX_PIXELS = 40_000_000
+
+VARIANT_FORMAT, VARIANT_EXTENSION = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+SPOOL_MAX_MEMORY = 256 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidImage(ValueError):
+    """Raised for an upload that is not an image we accept"""
+
+
+def open_image(fileobj):
+    """Decode an uploaded image, upright and without metadata, as RGB"""
+    try:
+        image = Image.open(fileobj)
+        if image.format not in ALLOWED_FORMATS:
+            raise InvalidImage(f'Unsupported image format: {image.format}')
+        if image.width * image.height > MAX_PIXELS:
+            raise InvalidImage('Image dimensions are too large')
+        # Let the JPEG decoder downscale while decoding
+        image.draft('RGB', (MAX_DIMENSION, MAX_DIMENSION))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except InvalidImage:
+        raise
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise InvalidImage('Not a valid image file') from exc
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # Flatten transparency onto white; JPEG has no alpha
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+    return image
+
+
+def encode_image(image, image_format):
+    """Encode to a spooled temporary file; no metadata is written"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    if image_format == 'JPEG':
+        image.save(spool, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        image.save(spool, image_format, quality=80, method=4)
+    spool.seek(0)
+    return File(spool)
+
+
+def save_variants(profile, image, stem):
+    """Store square thumbnails of image; returns {size: storage name}"""
+    field = profile.profile_picture
+    variants = {}
+    for size in PROFILE_PICTURE_SIZES:
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        name = field.field.generate_filename(profile, f'{stem}_{size}.{VARIANT_EXTENSION}')
+        with encode_image(thumbnail, VARIANT_FORMAT) as content:
+            variants[str(size)] = field.storage.save(name, content)
+    return variants
+
+
+def delete_files(storage, names):
+    """Best-effort removal of replaced pictures"""
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception as e:
+            logger.warning("Could not delete old profile picture %s: %s", name, e)
+
+
+def save_profile_picture(profile, uploaded_file, save=True):
+    """
+    Replace a profile's picture with an uploaded file.
+
+    Raises InvalidImage for a file that is too large or does not decode.
+    With save=False the caller saves the profile, and must call this inside
+    the transaction.atomic() block that does so: the old files are deleted
+    when the current transaction commits, which outside one is immediately.
+    """
+    if uploaded_file.size > PROFILE_PICTURE_MAX_BYTES:
+        raise InvalidImage('Image file too large ( > 5MB )')
+    image = open_image(uploaded_file)
+
+    field = profile.profile_picture
+    old_names = [field.name] if field else []
+    old_names += list((profile.profile_picture_variants or {}).values())
+
+    stem = uuid.uuid4().hex
+    with encode_image(image, 'JPEG') as content:
+        field.save(f'{stem}.jpg', content, save=False)
+    profile.profile_picture_variants = save_variants(profile, image, stem)
+    if save:
+        profile.save(update_fields=['profile_picture', 'profile_picture_variants', 'updated_at'])
+
+    transaction.on_commit(lambda: delete_files(field.storage, old_names))
+
+
+def build_missing_variants(profile):
+    """Make thumbnails for a picture stored before they existed"""
+    field = profile.profile_picture
+    with field.storage.open(field.name, 'rb') as original:
+        image = open_image(original)
+    stem = field.name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    profile.profile_picture_variants = save_variants(profile, image, stem)
+    profile.save(update_fields=['profile_picture_variants', 'updated_at'])
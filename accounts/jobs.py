@@ -0,0 +1,158 @@
+# accounts/jobs.py
+"""
+A small database-backed job queue.
+
+Views enqueue() work that does not have to finish before the response
+(sending email, writing notifications) and the run_jobs management command
+executes it. Jobs are rows in the jobs table written in the caller's
+transaction, so they are never lost and never run for a change that was
+rolled back.
+
+A worker claims a job by flipping it from pending to running with a
+conditional UPDATE, so several workers can share the table on any
+backend. A job that raises is retried with exponential backoff until
+max_attempts, then marked failed with its last error. Jobs left running by
+a worker that died are handed out again after JOB_LOCK_TIMEOUT.
+
+Without a worker (settings.JOB_WORKER is false) a job still gets its row,
+but the web process runs it as soon as the enqueuing transaction commits.
+That is still inside the request, so the response waits for the job, SMTP
+included; set JOB_WORKER in production. Failures stay pending for a worker
+or `run_jobs --once` to retry later.
+
+prune_jobs() deletes finished jobs after DONE_JOB_RETENTION and failed ones
+after FAILED_JOB_RETENTION; run_jobs calls it.
+
+Tasks are plain functions registered with @task; their keyword arguments
+are stored as JSON, so pass ids rather than model instances.
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+# Backoff before retry n is RETRY_BACKOFF * 2 ** (n - 1) seconds, capped
+RETRY_BACKOFF = 30
+MAX_RETRY_DELAY = 60 * 60
+
+# Seconds after which a running job is presumed abandoned
+JOB_LOCK_TIMEOUT = 10 * 60
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Seconds finished and failed jobs are kept before prune_jobs() deletes them
+DONE_JOB_RETENTION = 24 * 60 * 60
+FAILED_JOB_RETENTION = 30 * 24 * 60 * 60
+
+TASKS = {}
+
+
+def task(name=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Register a function as a job task"""
+    def decorator(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        TASKS[func.task_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, delay=0, **kwargs):
+    """Queue func(**kwargs) to run in the background; returns the Job"""
+    job = Job.objects.create(
+        task=func.task_name,
+        payload=kwargs,
+        max_attempts=func.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if not settings.JOB_WORKER and not delay:
+        transaction.on_commit(lambda: run_inline(job.pk))
+    return job
+
+
+def run_inline(job_id):
+    """Run a job in this process unless a worker already claimed it"""
+    won = Job.objects.filter(pk=job_id, status='pending').update(status='running', locked_at=timezone.now())
+    if won:
+        run_job(Job.objects.get(pk=job_id))
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next try after `attempts` failures"""
+    return min(RETRY_BACKOFF * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def claim_jobs(limit):
+    """Mark up to limit due jobs as running and return the ones we got"""
+    now = timezone.now()
+    due = Job.objects.filter(status='pending', run_at__lte=now).order_by('run_at', 'id')
+    abandoned = Job.objects.filter(
+        status='running', locked_at__lt=now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    ).order_by('locked_at', 'id')
+
+    claimed = []
+    for queryset in (abandoned, due):
+        for job in queryset[:limit - len(claimed)]:
+            # Only one worker can win the status flip
+            won = Job.objects.filter(pk=job.pk, status=job.status, locked_at=job.locked_at).update(
+                status='running', locked_at=now
+            )
+            if won:
+                job.status, job.locked_at = 'running', now
+                claimed.append(job)
+        if len(claimed) >= limit:
+            break
+    return claimed
+
+
+def run_job(job):
+    """Execute a claimed job and record the outcome; returns True on success"""
+    job.attempts += 1
+    try:
+        func = TASKS.get(job.task)
+        if func is None:
+            raise LookupError(f'Unknown task {job.task!r}')
+        # A task that fails part way leaves nothing behind for its retry
+        with transaction.atomic():
+            func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.run_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        job.locked_at = None
+        job.save(update_fields=['attempts', 'status', 'run_at', 'locked_at', 'last_error', 'updated_at'])
+        return False
+
+    job.status = 'done'
+    job.locked_at = None
+    job.save(update_fields=['attempts', 'status', 'locked_at', 'updated_at'])
+    return True
+
+
+def run_pending(limit=20):
+    """Run up to limit due jobs; returns (succeeded, failed) counts"""
+    succeeded = failed = 0
+    for job in claim_jobs(limit):
+        if run_job(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def prune_jobs():
+    """Delete done and failed jobs past their retention; returns how many"""
+    now = timezone.now()
+    deleted, _ = Job.objects.filter(
+        Q(status='done', updated_at__lt=now - timedelta(seconds=DONE_JOB_RETENTION))
+        | Q(status='failed', updated_at__lt=now - timedelta(seconds=FAILED_JOB_RETENTION))
+    ).delete()
+    return deleted
@@ -0,0 +1,137 @@
+# accounts/keyset.py
+"""
+Keyset (seek) pagination.
+
+Instead of OFFSET, each page continues from the sort values of the last row
+of the previous page, handed to the client as an opaque cursor. With an
+index matching the ordering the database seeks straight to the next page,
+so page 500 costs the same as page 1 and rows inserted meanwhile never
+shift or duplicate results.
+
+An ordering is a tuple of field paths, '-' prefixed for descending, ending
+in a unique field (normally 'id') so every row has a distinct position.
+NULLs always sort last, on every backend.
+"""
+import base64
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by encode_cursor"""
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe cursor for a row's sort values"""
+    values = [
+        str(value) if isinstance(value, Decimal)
+        else value.isoformat() if isinstance(value, date)
+        else value
+        for value in values
+    ]
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, ordering):
+    """Sort values encoded in cursor, checked against the ordering"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor('Cursor does not match the ordering')
+    return values
+
+
+def _split(field):
+    return field.lstrip('-'), field.startswith('-')
+
+
+def _is_nullable(model, path):
+    """Whether a field path can evaluate to NULL"""
+    *relations, name = path.split(LOOKUP_SEP)
+    for relation in relations:
+        field = model._meta.get_field(relation)
+        if field.null:
+            return True
+        # Reverse relations are taken as present; see keyset_page()
+        model = field.related_model
+    return model._meta.get_field(name).null
+
+
+def order_by_keys(queryset, ordering):
+    """Order a queryset by a keyset ordering, NULLs last"""
+    expressions = []
+    for field in ordering:
+        path, descending = _split(field)
+        # Only nullable columns get NULLS LAST, which can keep SQLite from
+        # reading the index in order
+        nulls_last = True if _is_nullable(queryset.model, path) else None
+        expression = F(path)
+        expressions.append(
+            expression.desc(nulls_last=nulls_last) if descending else expression.asc(nulls_last=nulls_last)
+        )
+    return queryset.order_by(*expressions)
+
+
+def after_cursor(model, ordering, values):
+    """Q matching the rows that come after the given sort values"""
+    condition = Q(pk__in=[])
+    bound = Q()
+    # Row comparison spelled out: (a, b, c) > (x, y, z) is
+    # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+    equal = Q()
+    for field, value in zip(ordering, values):
+        path, descending = _split(field)
+        nullable = _is_nullable(model, path)
+        if value is None:
+            # NULLs sort last, so only other NULLs can follow
+            equal &= Q(**{f'{path}__isnull': True})
+            continue
+
+        later = Q(**{f'{path}__{"lt" if descending else "gt"}': value})
+        if not bound:
+            # Redundant, but gives the index a single range to scan in order
+            bound = Q(**{f'{path}__{"lte" if descending else "gte"}': value})
+            if nullable:
+                bound |= Q(**{f'{path}__isnull': True})
+        if nullable:
+            later |= Q(**{f'{path}__isnull': True})
+        condition |= equal & later
+        equal &= Q(**{path: value})
+    return bound & condition
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=20):
+    """
+    One page of a queryset in keyset order.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    Raises InvalidCursor for a malformed cursor. An ordering may follow a
+    reverse one-to-one relation only if the queryset excludes rows without
+    the related object.
+    """
+    annotations = {f'keyset_{index}': F(_split(field)[0]) for index, field in enumerate(ordering)}
+    queryset = order_by_keys(queryset.annotate(**annotations), ordering)
+    if cursor:
+        values = decode_cursor(cursor, ordering)
+        try:
+            queryset = queryset.filter(after_cursor(queryset.model, ordering, values))
+        except (ValidationError, ValueError, TypeError) as exc:
+            # Well-formed, but the values do not fit the ordering's fields
+            raise InvalidCursor(str(exc)) from exc
+
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, name) for name in annotations])
@@ -0,0 +1,113 @@
+# accounts/log.py
+"""
+Logging handlers, formatters and filters used by settings.LOGGING.
+
+QueueHandler keeps logging off the request path. It turns each record into
+plain data in the calling thread and hands it to a bounded queue. A
+background listener thread formats the record and writes it to stdout.
+When the queue is full the record is dropped and counted in
+handler.dropped, so a slow stdout cannot stall a web worker.
+
+JsonFormatter writes one JSON object per line. The object holds the
+logger, level, message, any extra= fields and the formatted traceback.
+
+SampleFilter passes only a fraction of DEBUG records. Debug logging can
+then stay on in production without flooding the log. Code whose debug
+output needs queries should check logger.isEnabledFor(logging.DEBUG)
+first, so nothing is queried when debug is off.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else came from extra=
+RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as a single line of JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SampleFilter(logging.Filter):
+    """Let through every record above DEBUG and a `rate` share of DEBUG ones"""
+
+    def __init__(self, rate=1.0, name=''):
+        super().__init__(name)
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Queue records for a background thread that formats and writes them"""
+
+    def __init__(self, stream='ext://sys.stdout', queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        if stream == 'ext://sys.stderr':
+            stream = sys.stderr
+        elif stream == 'ext://sys.stdout':
+            stream = sys.stdout
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.close)
+        # gunicorn --preload forks after settings are loaded; threads do not survive a fork
+        os.register_at_fork(after_in_child=self._restart_listener)
+
+    def _restart_listener(self):
+        self.queue = self.listener.queue = queue.Queue(self.queue.maxsize)
+        self.listener._thread = None
+        self.listener.start()
+
+    def close(self):
+        """Write out what is queued and stop the listener thread"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        """Freeze what is only valid now (arguments, traceback) into the record"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
@@ -0,0 +1,74 @@
+# accounts/management/commands/benchmark_assistance_requests.py
+import contextlib
+import io
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from accounts.models import Job, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and queries of the request assistance endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests to send')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        customer, technician_user = self.create_users()
+        last_job_id = Job.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        try:
+            client = Client()
+            client.force_login(customer)
+            payload = json.dumps({
+                'technician_id': technician_user.profile.technician_profile.id,
+                'title': 'Benchmark request',
+                'description': 'Created by benchmark_assistance_requests',
+                'priority': 'medium',
+            })
+
+            timings, queries = [], []
+            # Keep the email backend and the view's debug prints out of the numbers
+            with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ), contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(total):
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        response = client.post(
+                            reverse('request_assistance'), payload, content_type='application/json'
+                        )
+                        timings.append((time.perf_counter() - start) * 1000)
+                    queries.append(len(captured))
+                    if response.status_code != 200:
+                        raise RuntimeError(f'Request failed: {response.content[:200]!r}')
+        finally:
+            # Tickets, requests, chats and notifications cascade with the users
+            User.objects.filter(pk__in=[customer.pk, technician_user.pk]).delete()
+            # Queued notifications would point at the deleted requests
+            Job.objects.filter(id__gt=last_job_id).delete()
+
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        self.stdout.write(f'requests:          {total}')
+        self.stdout.write(f'p50 latency:       {statistics.median(timings):.2f} ms')
+        self.stdout.write(f'p95 latency:       {p95:.2f} ms')
+        self.stdout.write(f'queries/request:   {statistics.mean(queries):.1f}')
+
+    def create_users(self):
+        customer = User.objects.create_user('benchmark-customer', password='benchmark')
+        UserProfile.objects.create(user=customer)
+        technician_user = User.objects.create_user(
+            'benchmark-technician', password='benchmark', email='technician@example.com'
+        )
+        UserProfile.objects.create(user=technician_user, is_technician=True)
+        return customer, technician_user
@@ -0,0 +1,77 @@
+# accounts/management/commands/benchmark_sessions.py
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from accounts.models import ChatSession, Message, UserProfile
+
+REFRESH_MIDDLEWARE = 'accounts.middleware.SessionRefreshMiddleware'
+
+
+class Command(BaseCommand):
+    help = 'Measure django_session writes per request on the messaging pages for each session mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per scenario')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        middleware = [name for name in settings.MIDDLEWARE if name != REFRESH_MIDDLEWARE]
+
+        scenarios = [
+            # The old configuration: database sessions saved on every request
+            ('db, save every request', {
+                'SESSION_ENGINE': settings.SESSION_ENGINES['db'],
+                'SESSION_SAVE_EVERY_REQUEST': True,
+                'MIDDLEWARE': middleware,
+            }),
+        ]
+        for mode in ('db', 'cached_db', 'signed_cookies'):
+            scenarios.append((f'{mode}, refresh near expiry', {
+                'SESSION_ENGINE': settings.SESSION_ENGINES[mode],
+                'SESSION_SAVE_EVERY_REQUEST': False,
+                'MIDDLEWARE': settings.MIDDLEWARE,
+            }))
+
+        self.stdout.write(f'{"scenario":<36} {"requests":>8} {"session writes":>15} {"writes/request":>15}')
+        # Everything below is rolled back, including the sessions it creates
+        with transaction.atomic():
+            chat = self.create_chat()
+            paths = [
+                f"{reverse('user_message')}?chat={chat.id}",
+                reverse('get_unread_count'),
+                reverse('get_chat_messages', args=[chat.id]),
+            ]
+            for label, overrides in scenarios:
+                with override_settings(ALLOWED_HOSTS=['testserver'], **overrides):
+                    writes = self.count_session_writes(chat.user, paths, total)
+                self.stdout.write(f'{label:<36} {total:>8} {writes:>15} {writes / total:>15.2f}')
+            transaction.set_rollback(True)
+
+    def create_chat(self):
+        customer = User.objects.create_user('benchmark-customer', password='benchmark')
+        UserProfile.objects.create(user=customer)
+        technician = User.objects.create_user('benchmark-technician', password='benchmark')
+        UserProfile.objects.create(user=technician, is_technician=True)
+        chat = ChatSession.objects.create(user=customer, technician=technician)
+        Message.objects.create(
+            chat_session=chat, sender=technician, receiver=customer,
+            content='How can I help?', message_type='tech_to_user',
+        )
+        return chat
+
+    def count_session_writes(self, user, paths, total):
+        client = Client()
+        client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            for number in range(total):
+                client.get(paths[number % len(paths)])
+        return sum(
+            1 for query in queries.captured_queries
+            if 'django_session' in query['sql']
+            and query['sql'].lstrip().upper().startswith(('UPDATE', 'INSERT', 'DELETE'))
+        )
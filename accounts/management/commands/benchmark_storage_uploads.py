@@ -0,0 +1,54 @@
+# accounts/management/commands/benchmark_storage_uploads.py
+import os
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.storage_clients import _build_s3_client, get_s3_client, reset_clients
+
+
+class Command(BaseCommand):
+    help = 'Compare upload latency with a new S3 client per upload against the shared client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=50, help='Uploads per mode')
+        parser.add_argument('--size-kb', type=int, default=64, help='Size of each object in KB')
+        parser.add_argument('--bucket', default=getattr(settings, 'AWS_STORAGE_BUCKET_NAME', None),
+                            help='Bucket to write to (defaults to AWS_STORAGE_BUCKET_NAME)')
+
+    def handle(self, *args, **options):
+        if not options['bucket']:
+            raise CommandError('No bucket: pass --bucket or set AWS_STORAGE_BUCKET_NAME')
+        body = os.urandom(options['size_kb'] * 1024)
+        prefix = f'benchmark/{uuid.uuid4().hex}'
+        reset_clients()
+
+        modes = {
+            'new client per upload': _build_s3_client,
+            'shared client': get_s3_client,
+        }
+        keys = []
+        try:
+            for label, make_client in modes.items():
+                timings = []
+                for index in range(options['uploads']):
+                    key = f'{prefix}/{label.split()[0]}-{index}'
+                    start = time.perf_counter()
+                    make_client().put_object(Bucket=options['bucket'], Key=key, Body=body)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    keys.append(key)
+                timings.sort()
+                p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+                self.stdout.write(
+                    f'{label:24} p50 {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms'
+                )
+        finally:
+            client = get_s3_client()
+            for start in range(0, len(keys), 1000):
+                client.delete_objects(
+                    Bucket=options['bucket'],
+                    Delete={'Objects': [{'Key': key} for key in keys[start:start + 1000]]},
+                )
@@ -0,0 +1,21 @@
+# accounts/management/commands/build_profile_picture_variants.py
+from django.core.management.base import BaseCommand
+
+from accounts.images import InvalidImage, build_missing_variants
+from accounts.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Create thumbnails for profile pictures uploaded before they existed'
+
+    def handle(self, *args, **options):
+        built = skipped = 0
+        profiles = UserProfile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        for profile in profiles.filter(profile_picture_variants={}).iterator():
+            try:
+                build_missing_variants(profile)
+                built += 1
+            except (InvalidImage, OSError) as e:
+                skipped += 1
+                self.stderr.write(f'Skipped {profile.profile_picture.name}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Built thumbnails for {built} profiles, skipped {skipped}'))
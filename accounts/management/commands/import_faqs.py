@@ -1,6 +1,7 @@
 # accounts/management/commands/import_faqs.py
 from django.core.management.base import BaseCommand
 from accounts.models import FAQCategory, FAQItem 
+from accounts.faq_bot import rebuild_faq_index
 import html
 
 class Command(BaseCommand):
@@ -473,4 +474,8 @@ If you can't remove the virus yourself, create a HIGH priority ticket immediatel
                 )
                 self.stdout.write(f"  - {'Created' if created else 'Updated'}: {faq['question']}")
         
-        self.stdout.write(self.style.SUCCESS('Successfully imported all FAQ data!'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Successfully imported all FAQ data!'))
+
+        # Rebuild the bot ranking model from the imported FAQs
+        index = rebuild_faq_index()
+        self.stdout.write(f"Indexed {len(index.faqs)} FAQs ({index.term_count} terms) for the bot")
\ No newline at end of file
@@ -0,0 +1,12 @@
+# accounts/management/commands/prune_notifications.py
+from django.core.management.base import BaseCommand
+
+from accounts.notifications import prune_notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete notifications past their retention period (run daily)'
+
+    def handle(self, *args, **options):
+        deleted = prune_notifications()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} notifications'))
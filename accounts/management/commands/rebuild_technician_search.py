@@ -0,0 +1,10 @@
+# accounts/management/commands/rebuild_technician_search.py
+from django.core.management.base import BaseCommand
+from accounts.technician_search import rebuild_search_documents
+
+class Command(BaseCommand):
+    help = 'Rebuild the technician directory search documents'
+
+    def handle(self, *args, **options):
+        count = rebuild_search_documents()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search documents for {count} technicians'))
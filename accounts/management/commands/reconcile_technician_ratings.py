@@ -0,0 +1,12 @@
+# accounts/management/commands/reconcile_technician_ratings.py
+from django.core.management.base import BaseCommand
+
+from accounts.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Check technician rating aggregates against their reviews and fix any that drifted (run daily)'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_ratings()
+        self.stdout.write(self.style.SUCCESS(f'Fixed rating aggregates of {len(fixed)} technicians'))
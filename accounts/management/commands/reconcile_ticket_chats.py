@@ -0,0 +1,25 @@
+# accounts/management/commands/reconcile_ticket_chats.py
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from accounts.chat_sessions import RECONCILE_BATCH_SIZE, missing_ticket_chats, reconcile_ticket_chats
+
+class Command(BaseCommand):
+    help = 'Open chat sessions for assigned tickets that are missing one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--technician', help='Only reconcile tickets for this technician username')
+        parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many chats are missing')
+
+    def handle(self, *args, **options):
+        technician_user = None
+        if options['technician']:
+            technician_user = User.objects.get(username=options['technician'])
+
+        if options['dry_run']:
+            missing = missing_ticket_chats(technician_user).count()
+            self.stdout.write(f'{missing} assistance requests have no ticket chat')
+            return
+
+        created = reconcile_ticket_chats(technician_user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Opened {len(created)} missing ticket chats'))
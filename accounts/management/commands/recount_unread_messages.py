@@ -0,0 +1,12 @@
+# accounts/management/commands/recount_unread_messages.py
+from django.core.management.base import BaseCommand
+from accounts.models import UnreadMessageCounter
+
+class Command(BaseCommand):
+    help = 'Rebuild the unread message counters from the messages table'
+
+    def handle(self, *args, **options):
+        UnreadMessageCounter.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted unread messages for {UnreadMessageCounter.objects.count()} users'
+        ))
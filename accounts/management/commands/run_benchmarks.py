@@ -0,0 +1,77 @@
+# accounts/management/commands/run_benchmarks.py
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from accounts.benchmarks import (
+    NoSeededData, build_benchmarks, busiest_users, environment, find_regressions, run_benchmark,
+)
+from accounts.caching import bump, user_namespace
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the critical pages against seeded data and compare with a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=30, help='Measured requests per benchmark')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests before each benchmark')
+        parser.add_argument('--memory-requests', type=int, default=5, help='Requests traced for memory')
+        parser.add_argument('--prefix', default='load', help='Username prefix used by seed_load_data')
+        parser.add_argument('--only', nargs='+', metavar='NAME', help='Run only these benchmarks')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+        parser.add_argument('--save', action='store_true', help='Store the results as the new baseline')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed growth of latency and memory, as a ratio (0.25 = 25%%)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        results = {}
+        self.stdout.write(f'{"benchmark":<22} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"peak KiB":>9}')
+        # Messages sent by the bot benchmark are rolled back with everything else
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            try:
+                customer, technician = busiest_users(options['prefix'])
+            except NoSeededData as e:
+                raise CommandError(str(e))
+            for benchmark in build_benchmarks(customer, technician):
+                if options['only'] and benchmark.name not in options['only']:
+                    continue
+                metrics = results[benchmark.name] = run_benchmark(
+                    benchmark, options['requests'], options['warmup'], options['memory_requests']
+                )
+                self.stdout.write(
+                    f'{benchmark.name:<22} {metrics["p50_ms"]:>9} {metrics["p95_ms"]:>9} '
+                    f'{metrics["queries"]:>8} {metrics["peak_kib"] if metrics["peak_kib"] is not None else "-":>9}'
+                )
+            transaction.set_rollback(True)
+        # Cached pages may hold what was rolled back
+        bump(user_namespace(customer.id), user_namespace(technician.id))
+
+        path = Path(options['baseline'])
+        if options['save']:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(
+                {'environment': environment(options['requests']), 'results': results}, indent=2
+            ) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {path}'))
+            return
+        if not path.exists():
+            self.stdout.write(f'No baseline at {path}; run with --save to create one')
+            return
+
+        baseline = json.loads(path.read_text())
+        if baseline.get('environment', {}).get('database') != environment(options['requests'])['database']:
+            self.stdout.write(self.style.WARNING('The baseline was measured on another database'))
+        regressions = find_regressions(baseline.get('results', {}), results, options['threshold'])
+        for name, metric, old, new in regressions:
+            self.stdout.write(self.style.ERROR(f'{name}: {metric} {old} -> {new}'))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path}'))
@@ -0,0 +1,37 @@
+# accounts/management/commands/run_jobs.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.jobs import prune_jobs, run_pending
+
+# Seconds between prune_jobs() runs of a long-running worker
+PRUNE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (email, notifications) and prune old ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due now, then exit')
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs claimed per round')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        pruned_at = None
+        while True:
+            close_old_connections()
+            if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                pruned = prune_jobs()
+                if pruned:
+                    self.stdout.write(f'{pruned} old jobs deleted')
+                pruned_at = time.monotonic()
+            succeeded, failed = run_pending(options['batch_size'])
+            if succeeded or failed:
+                self.stdout.write(f'{succeeded} jobs done, {failed} failed')
+            if options['once']:
+                if succeeded + failed < options['batch_size']:
+                    return
+            elif not (succeeded or failed):
+                time.sleep(options['sleep'])
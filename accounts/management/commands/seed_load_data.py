@@ -0,0 +1,468 @@
+# accounts/management/commands/seed_load_data.py
+"""
+Generate production-sized data for load testing and benchmarks.
+
+Accounts, profiles and technicians are written with bulk_create. Tickets,
+assistance requests, chats, messages, reviews and notifications run to
+hundreds of thousands of rows. bulk_create spends most of its time
+preparing each value, so these go through executemany with primary keys
+assigned here. Either way no model signals run, and the command does the
+receivers' work itself: technician profiles, search documents, unread
+counters and the technicians' rating aggregates.
+
+Activity is skewed the way it is in production:
+- a few customers file most tickets and a few technicians take most of them
+- recent weeks are busier than last year
+- old tickets are mostly resolved and most reviews are good
+
+The same --seed always produces the same rows. Timestamps are relative to
+the time of the run. Seeded usernames start with --prefix; --flush deletes
+a previous run with that prefix first. Do not seed while the site is
+writing to the same tables.
+"""
+import contextlib
+import itertools
+import random
+import time
+from collections import Counter, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.caching import TECHNICIANS, bump_on_commit
+from accounts.models import (
+    AssistanceRequest, Attachment, ChatSession, CreateTicket, Message, MessageEditHistory, Notification,
+    Technician, TechnicianReview, TechnicianSpecialty, UnreadMessageCounter, UserProfile,
+)
+from accounts.ratings import AGGREGATE_FIELDS, expected_aggregates
+from accounts.technician_search import rebuild_search_documents
+
+PASSWORD = 'loadtest'
+HISTORY_DAYS = 365
+
+SPECIALTIES = [
+    ('Hardware Repair', 'fa-laptop'),
+    ('Software Support', 'fa-desktop'),
+    ('Network Issues', 'fa-wifi'),
+    ('Mobile Devices', 'fa-mobile-alt'),
+    ('Data Recovery', 'fa-hdd'),
+    ('Printer Setup', 'fa-print'),
+    ('Security', 'fa-shield-alt'),
+    ('Smart Home', 'fa-home'),
+]
+FIRST_NAMES = ['Ana', 'Ben', 'Carla', 'Dan', 'Elena', 'Felix', 'Grace', 'Hugo', 'Iris', 'Jon',
+               'Kim', 'Luis', 'Mia', 'Noel', 'Olga', 'Paul', 'Rosa', 'Sam', 'Tina', 'Victor']
+LAST_NAMES = ['Reyes', 'Santos', 'Cruz', 'Garcia', 'Lim', 'Tan', 'Smith', 'Brown', 'Lopez', 'Kim',
+              'Nguyen', 'Silva', 'Moreno', 'Diaz', 'Young', 'Perez', 'Walker', 'Chen', 'Ramos', 'Flores']
+CITIES = [('Cebu City', 'Philippines'), ('Manila', 'Philippines'), ('Davao', 'Philippines'),
+          ('Singapore', 'Singapore'), ('Austin', 'United States'), ('Toronto', 'Canada')]
+PROBLEMS = {
+    'hardware': ['Laptop will not boot', 'Cracked screen', 'Overheating desktop', 'Dead keyboard'],
+    'software': ['App keeps crashing', 'Windows update stuck', 'Email not syncing', 'Slow startup'],
+    'network': ['WiFi drops every hour', 'No internet on one floor', 'VPN will not connect', 'Slow router'],
+    'other': ['Printer offline', 'Phone backup failed', 'Smart TV setup', 'Lost files'],
+}
+CATEGORY_WEIGHTS = {'hardware': 35, 'software': 35, 'network': 20, 'other': 10}
+PRIORITY_WEIGHTS = {'low': 25, 'medium': 50, 'high': 18, 'critical': 7}
+ASSISTANCE_PRIORITY = {'low': 'low', 'medium': 'medium', 'high': 'high', 'critical': 'urgent'}
+ASSISTANCE_STATUS = {'open': 'pending', 'in_progress': 'accepted', 'resolved': 'completed'}
+RATING_WEIGHTS = [3, 4, 10, 30, 53]
+REVIEW_COMMENTS = ['', 'Quick and friendly.', 'Fixed it on the first visit.', 'Took longer than expected.']
+CUSTOMER_LINES = ['Hi, any update on this?', 'It happened again this morning.', 'Thanks, that worked!',
+                  'Can you come by tomorrow?', 'I attached a photo of the error.', 'Still not fixed.']
+TECHNICIAN_LINES = ['I am looking into it now.', 'Please restart the device and try again.',
+                    'I can visit at 2pm.', 'The part has been ordered.', 'Should be fixed now.',
+                    'Can you send the exact error message?']
+BOT_GREETING = "Hello! I'm FixIT Assistant 👋 I'm here to help you with common issues and FAQs. How can I assist you today?"
+
+SeededTicket = namedtuple('SeededTicket', 'id user_id technician_id title status priority created_at')
+
+
+def zipf_cum_weights(count, skew, rng):
+    """Cumulative weights giving count items a shuffled Zipf-like popularity"""
+    weights = [1 / (rank + 1) ** skew for rank in range(count)]
+    rng.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+
+@contextlib.contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values we set"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_ids(model):
+    """Primary keys following the highest one in the table"""
+    return itertools.count((model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1)
+
+
+def insert_rows(model, fields, rows):
+    """INSERT rows of database-ready values for the named fields"""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
+    return len(rows)
+
+
+def delete_rows(queryset):
+    """DELETE a queryset's rows in one statement, without signals or cascades"""
+    quote = connection.ops.quote_name
+    meta = queryset.model._meta
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {quote(meta.db_table)} WHERE {quote(meta.pk.column)} IN ({sql})', params)
+        return cursor.rowcount
+
+
+class Command(BaseCommand):
+    help = 'Seed users, technicians, tickets, chats, reviews and notifications for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=327, help='Random seed')
+        parser.add_argument('--customers', type=int, default=5000, help='Customer accounts')
+        parser.add_argument('--technicians', type=int, default=1000, help='Technician accounts')
+        parser.add_argument('--tickets', type=int, default=100000, help='Tickets')
+        parser.add_argument('--messages-per-chat', type=float, default=4, help='Mean messages per ticket chat')
+        parser.add_argument('--skew', type=float, default=0.8,
+                            help='Zipf exponent of customer and technician activity')
+        parser.add_argument('--prefix', default='load', help='Username prefix of seeded accounts')
+        parser.add_argument('--flush', action='store_true', help='Delete accounts seeded with this prefix first')
+
+    def handle(self, *args, **options):
+        if options['customers'] < 1 or options['technicians'] < 1:
+            raise CommandError('Need at least one customer and one technician')
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.skew = options['skew']
+        # Looked up once; it is called for every timestamp
+        self.db_time = connection.ops.adapt_datetimefield_value
+        prefix = options['prefix']
+
+        seeded = User.objects.filter(username__startswith=f'{prefix}_')
+        if options['flush']:
+            self.stdout.write(f'Deleted {self.flush(seeded)} rows from a previous run')
+        elif seeded.exists():
+            raise CommandError(f'Accounts prefixed "{prefix}_" already exist; use --flush or another --prefix')
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            with explicit_timestamps(User, UserProfile, Technician):
+                customers = self.create_users(prefix, 'customer', options['customers'])
+                technician_users = self.create_users(prefix, 'tech', options['technicians'])
+                technicians = self.create_technicians(technician_users)
+            tickets = self.create_tickets(customers, technician_users, options['tickets'])
+            requests = self.create_assistance_requests(tickets, technicians)
+            chats, messages = self.create_chats(customers, tickets, options['messages_per_chat'])
+            reviews = self.create_reviews(tickets, technicians)
+            notifications = self.create_notifications(tickets)
+            self.reset_sequences()
+            rebuild_search_documents([technician.id for technician in technicians])
+            bump_on_commit(TECHNICIANS)
+        elapsed = time.perf_counter() - start
+
+        for label, count in [
+            ('customers', len(customers)), ('technicians', len(technicians)), ('tickets', len(tickets)),
+            ('assistance requests', requests), ('chat sessions', chats), ('messages', messages),
+            ('reviews', reviews), ('notifications', notifications),
+        ]:
+            self.stdout.write(f'{label:>20}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Seeded in {elapsed:.1f}s (seed {options["seed"]})'))
+
+    def flush(self, seeded):
+        """
+        Delete seeded accounts and everything they own.
+
+        Seeded tickets and chats are all owned by seeded customers. Their
+        rows are deleted directly, so the cascade of seeded.delete() only
+        has to load the accounts.
+        """
+        user_ids = seeded.values('pk')
+        deleted = 0
+        with transaction.atomic():
+            for queryset in [
+                MessageEditHistory.objects.filter(message__chat_session__user__in=user_ids),
+                Attachment.objects.filter(message__chat_session__user__in=user_ids),
+                Message.objects.filter(chat_session__user__in=user_ids),
+                ChatSession.objects.filter(user__in=user_ids),
+                Notification.objects.filter(ticket__user__in=user_ids),
+                TechnicianReview.objects.filter(user__in=user_ids),
+                AssistanceRequest.objects.filter(user__in=user_ids),
+                CreateTicket.objects.filter(user__in=user_ids),
+            ]:
+                deleted += delete_rows(queryset)
+            deleted += seeded.delete()[0]
+        return deleted
+
+    def past(self, max_days=HISTORY_DAYS):
+        """A timestamp in the last max_days, more likely recent than old"""
+        return self.now - timedelta(days=max_days * self.rng.random() ** 2, seconds=self.rng.randrange(86400))
+
+    def reset_sequences(self):
+        """Move the id sequences past the ids assigned here (nothing to do on SQLite)"""
+        models = [CreateTicket, AssistanceRequest, ChatSession, Message, TechnicianReview, Notification]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def create_users(self, prefix, role, count):
+        rng = self.rng
+        password = make_password(PASSWORD)
+        users = []
+        for number in range(count):
+            users.append(User(
+                username=f'{prefix}_{role}_{number}',
+                email=f'{prefix}_{role}_{number}@load.fixit.test',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=self.past(),
+            ))
+        users = User.objects.bulk_create(users)
+
+        profiles = []
+        for user in users:
+            city, country = rng.choice(CITIES)
+            profiles.append(UserProfile(
+                user=user,
+                is_technician=role == 'tech',
+                phone_number=f'09{rng.randrange(10 ** 9):09d}',
+                city=city,
+                country=country,
+                created_at=user.date_joined,
+                updated_at=user.date_joined,
+            ))
+        for user, profile in zip(users, UserProfile.objects.bulk_create(profiles)):
+            user.profile = profile
+        return users
+
+    def create_technicians(self, technician_users):
+        rng = self.rng
+        specialties = []
+        for name, icon_class in SPECIALTIES:
+            specialty, _ = TechnicianSpecialty.objects.get_or_create(name=name, defaults={'icon_class': icon_class})
+            specialties.append(specialty)
+        specialty_weights = zipf_cum_weights(len(specialties), 1.0, rng)
+
+        technicians = []
+        for user in technician_users:
+            experience = min(int(rng.expovariate(1 / 5)), 30)
+            technicians.append(Technician(
+                user_profile=user.profile,
+                bio=f'{experience} years fixing things for homes and small offices.',
+                is_available=rng.random() < 0.8,
+                experience_years=experience,
+                average_response_time=round(rng.uniform(0.3, 6), 1),
+                hourly_rate=Decimal(rng.randrange(30, 150)),
+                languages=rng.choice(['English', 'English, Filipino', 'English, Spanish']),
+                accepts_emergency_calls=rng.random() < 0.3,
+                success_rate=round(rng.uniform(80, 100), 1),
+                created_at=user.date_joined,
+                updated_at=user.date_joined,
+            ))
+        technicians = Technician.objects.bulk_create(technicians)
+
+        through = Technician.specialties.through
+        links = []
+        for technician in technicians:
+            chosen = set(rng.choices(specialties, cum_weights=specialty_weights, k=rng.randint(1, 3)))
+            links.extend(through(technician_id=technician.id, technicianspecialty_id=specialty.id)
+                         for specialty in chosen)
+        through.objects.bulk_create(links)
+        return technicians
+
+    def create_tickets(self, customers, technician_users, count):
+        rng = self.rng
+        owners = rng.choices(customers, cum_weights=zipf_cum_weights(len(customers), self.skew, rng), k=count)
+        assignees = rng.choices(
+            technician_users, cum_weights=zipf_cum_weights(len(technician_users), self.skew, rng), k=count
+        )
+        categories = rng.choices(list(CATEGORY_WEIGHTS), weights=list(CATEGORY_WEIGHTS.values()), k=count)
+        priorities = rng.choices(list(PRIORITY_WEIGHTS), weights=list(PRIORITY_WEIGHTS.values()), k=count)
+
+        tickets, rows = [], []
+        for ticket_id, owner, assignee, category, priority in zip(
+            next_ids(CreateTicket), owners, assignees, categories, priorities
+        ):
+            created_at = max(self.past(), owner.date_joined)
+            technician_id = assignee.id
+            if rng.random() < 0.1:
+                # Not picked up by anyone yet
+                technician_id, status = None, 'open'
+            elif self.now - created_at > timedelta(days=14):
+                status = rng.choices(['resolved', 'in_progress', 'open'], weights=[90, 6, 4])[0]
+            else:
+                status = rng.choices(['resolved', 'in_progress', 'open'], weights=[30, 40, 30])[0]
+            title = rng.choice(PROBLEMS[category])
+            tickets.append(SeededTicket(ticket_id, owner.id, technician_id, title, status, priority, created_at))
+            rows.append((
+                ticket_id, owner.id, technician_id, title, f'{title}. Reported by {owner.first_name}.',
+                category, priority, status, self.db_time(created_at),
+            ))
+        insert_rows(CreateTicket, [
+            'id', 'user', 'technician', 'title', 'description', 'category', 'priority', 'status', 'created_at',
+        ], rows)
+        return tickets
+
+    def create_assistance_requests(self, tickets, technicians):
+        """A quarter of assigned tickets came in as assistance requests"""
+        rng = self.rng
+        technician_ids = {technician.user_profile.user_id: technician.id for technician in technicians}
+        request_ids = next_ids(AssistanceRequest)
+        rows = []
+        for ticket in tickets:
+            if ticket.technician_id and rng.random() < 0.25:
+                created_at = self.db_time(ticket.created_at)
+                rows.append((
+                    next(request_ids), ticket.user_id, technician_ids[ticket.technician_id], ticket.id,
+                    ticket.title, f'Assistance requested: {ticket.title}', ASSISTANCE_STATUS[ticket.status],
+                    ASSISTANCE_PRIORITY[ticket.priority], created_at, created_at,
+                ))
+        return insert_rows(AssistanceRequest, [
+            'id', 'user', 'technician', 'ticket', 'title', 'description', 'status', 'priority',
+            'created_at', 'updated_at',
+        ], rows)
+
+    def create_chats(self, customers, tickets, messages_per_chat):
+        """A chat per assigned ticket, a bot chat for some customers, and their unread counters"""
+        rng = self.rng
+        chat_ids, message_ids = next_ids(ChatSession), next_ids(Message)
+        mean_replies = max(messages_per_chat - 1, 0.1)
+        chats, messages = [], []
+        unread = Counter()
+
+        for ticket in tickets:
+            if not ticket.technician_id:
+                continue
+            chat_id = next(chat_ids)
+            parties = [(ticket.user_id, ticket.technician_id, 'user_to_tech', CUSTOMER_LINES),
+                       (ticket.technician_id, ticket.user_id, 'tech_to_user', TECHNICIAN_LINES)]
+            thread = []
+            side = 0
+            sent_at = ticket.created_at
+            for number in range(1 + int(rng.expovariate(1 / mean_replies))):
+                if number and rng.random() < 0.7:
+                    # Usually a reply, sometimes a follow-up from the same side
+                    side = 1 - side
+                sender_id, receiver_id, message_type, lines = parties[side]
+                sent_at = min(sent_at + timedelta(minutes=rng.expovariate(1 / 180)), self.now)
+                thread.append({
+                    'id': next(message_ids), 'sender': sender_id, 'receiver': receiver_id,
+                    'content': rng.choice(lines), 'message_type': message_type,
+                    'created_at': self.db_time(sent_at), 'is_read': True,
+                })
+
+            active = ticket.status != 'resolved'
+            unread_counts = {ticket.user_id: 0, ticket.technician_id: 0}
+            if active and rng.random() < 0.5:
+                # The newest run of messages from one side is still unread
+                last_receiver = thread[-1]['receiver']
+                for message in reversed(thread):
+                    if message['receiver'] != last_receiver:
+                        break
+                    message['is_read'] = False
+                    unread_counts[last_receiver] += 1
+                unread[last_receiver] += unread_counts[last_receiver]
+            last_message_at = thread[-1]['created_at']
+            chats.append((
+                chat_id, ticket.user_id, ticket.technician_id, ticket.id, 'user_tech',
+                'active' if active else 'closed', self.db_time(ticket.created_at), last_message_at,
+                last_message_at, unread_counts[ticket.user_id], unread_counts[ticket.technician_id],
+            ))
+            messages.extend((
+                message['id'], chat_id, message['sender'], message['receiver'], message['content'],
+                message['message_type'], message['created_at'], message['created_at'], message['is_read'], False,
+            ) for message in thread)
+
+        for customer in customers:
+            if rng.random() < 0.3:
+                chat_id = next(chat_ids)
+                started = self.db_time(max(self.past(), customer.date_joined))
+                chats.append((chat_id, customer.id, None, None, 'user_bot', 'active', started, started, started, 0, 0))
+                messages.append((next(message_ids), chat_id, None, None, BOT_GREETING, 'bot_to_user',
+                                 started, started, False, False))
+
+        insert_rows(ChatSession, [
+            'id', 'user', 'technician', 'ticket', 'chat_type', 'status', 'created_at', 'updated_at',
+            'last_message_at', 'user_unread_count', 'technician_unread_count',
+        ], chats)
+        insert_rows(Message, [
+            'id', 'chat_session', 'sender', 'receiver', 'content', 'message_type', 'created_at', 'updated_at',
+            'is_read', 'is_deleted',
+        ], messages)
+        UnreadMessageCounter.objects.bulk_create(
+            UnreadMessageCounter(user_id=user_id, count=count) for user_id, count in unread.items()
+        )
+        return len(chats), len(messages)
+
+    def create_reviews(self, tickets, technicians):
+        """Reviews on some resolved tickets, plus each technician's totals"""
+        rng = self.rng
+        by_user = {technician.user_profile.user_id: technician for technician in technicians}
+        ratings = {technician.id: [] for technician in technicians}
+        review_ids = next_ids(TechnicianReview)
+        rows = []
+        for ticket in tickets:
+            if ticket.status != 'resolved' or not ticket.technician_id:
+                continue
+            technician = by_user[ticket.technician_id]
+            technician.completed_tickets += 1
+            if rng.random() < 0.4:
+                rating = rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0]
+                ratings[technician.id].append(rating)
+                reviewed_at = self.db_time(min(ticket.created_at + timedelta(days=rng.uniform(1, 7)), self.now))
+                rows.append((next(review_ids), technician.id, ticket.user_id, ticket.id, rating,
+                             rng.choice(REVIEW_COMMENTS), reviewed_at, reviewed_at))
+        insert_rows(TechnicianReview, [
+            'id', 'technician', 'user', 'ticket', 'rating', 'comment', 'created_at', 'updated_at',
+        ], rows)
+
+        for technician in technicians:
+            for field, value in expected_aggregates(Counter(ratings[technician.id])).items():
+                setattr(technician, field, value)
+        Technician.objects.bulk_update(technicians, ['completed_tickets', *AGGREGATE_FIELDS])
+        return len(rows)
+
+    def create_notifications(self, tickets):
+        """Assignment notices for technicians and resolution notices for customers"""
+        rng = self.rng
+        read_before = self.now - timedelta(days=3)
+        notification_ids = next_ids(Notification)
+        rows = []
+        for ticket in tickets:
+            if not ticket.technician_id:
+                continue
+            rows.append((
+                next(notification_ids), ticket.technician_id, ticket.user_id, ticket.id,
+                f'New ticket assigned: {ticket.title}',
+                ticket.created_at < read_before or rng.random() < 0.5, self.db_time(ticket.created_at),
+            ))
+            if ticket.status == 'resolved':
+                resolved_at = min(ticket.created_at + timedelta(hours=rng.expovariate(1 / 48)), self.now)
+                rows.append((
+                    next(notification_ids), ticket.user_id, ticket.technician_id, ticket.id,
+                    f'Your ticket "{ticket.title}" has been resolved',
+                    resolved_at < read_before or rng.random() < 0.5, self.db_time(resolved_at),
+                ))
+        return insert_rows(Notification, [
+            'id', 'recipient', 'sender', 'ticket', 'message', 'is_read', 'created_at',
+        ], rows)
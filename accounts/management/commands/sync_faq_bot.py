@@ -1,6 +1,7 @@
 # accounts/management/commands/sync_faq_bot.py
 from django.core.management.base import BaseCommand
 from accounts.models import FAQItem 
+from accounts.faq_bot import rebuild_faq_index
 
 class Command(BaseCommand):
     help = 'Sync FAQ data between HTML and bot system'
@@ -43,4 +44,8 @@ class Command(BaseCommand):
                 faq.save()
                 updated += 1
         
-        self.stdout.write(self.style.SUCCESS(f'Updated {updated} FAQ items for bot compatibility'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} FAQ items for bot compatibility'))
+
+        # Rebuild the bot ranking model with the synced keywords
+        index = rebuild_faq_index()
+        self.stdout.write(f"Indexed {len(index.faqs)} FAQs ({index.term_count} terms) for the bot")
\ No newline at end of file
@@ -0,0 +1,174 @@
+# accounts/metrics.py
+"""
+Per-request performance metrics in Prometheus text format.
+
+RequestMetricsMiddleware (accounts.middleware) measures every request. It
+records the total latency, the number of SQL queries and the time spent in
+them, and the time spent rendering templates. The samples go into
+in-process histograms labelled with the route, which is the URL pattern
+name. The metrics endpoint serves them with render_prometheus(). Each
+worker process keeps its own histograms, so scrape every worker or sum
+them.
+
+Template time is measured by the DjangoTemplates backend subclass below.
+Set it as the TEMPLATES backend.
+
+A view can declare how many queries it should need with @query_budget(n).
+QUERY_BUDGET_MODE decides what happens when a request goes over:
+- 'off' (the default) does nothing
+- 'warn' logs a warning
+- 'raise' raises QueryBudgetExceeded, which fails the test that made the
+  request
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Stats of the request being handled in this thread or task
+current_request = ContextVar('current_request', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its declared budget"""
+
+
+def query_budget(queries):
+    """Declare the most queries a view should run per request"""
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+class RequestStats:
+    """What one request has spent so far"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook: count and time each query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+class Histogram:
+    """A thread-safe Prometheus histogram with one label set per series"""
+
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[label] for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._series[key] = (counts, total + value)
+
+    def samples(self):
+        """(labels, bucket counts, sum) for every series"""
+        with self._lock:
+            return [(dict(zip(self.labels, key)), list(counts), total)
+                    for key, (counts, total) in sorted(self._series.items())]
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, counts, total in self.samples():
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_LATENCY = Histogram(
+    'fixit_request_duration_seconds', 'Time to produce a response.', LATENCY_BUCKETS,
+    ('route', 'method', 'status'),
+)
+REQUEST_QUERIES = Histogram(
+    'fixit_request_queries', 'SQL queries run per request.', QUERY_BUCKETS, ('route',),
+)
+REQUEST_DB_TIME = Histogram(
+    'fixit_request_db_seconds', 'Time spent in SQL queries per request.', LATENCY_BUCKETS, ('route',),
+)
+REQUEST_TEMPLATE_TIME = Histogram(
+    'fixit_request_template_seconds', 'Time spent rendering templates per request.', LATENCY_BUCKETS,
+    ('route',),
+)
+HISTOGRAMS = (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, REQUEST_TEMPLATE_TIME)
+
+
+def record_request(route, method, status, stats):
+    """Add a finished request to the histograms"""
+    REQUEST_LATENCY.observe(time.perf_counter() - stats.started, route=route, method=method, status=status)
+    REQUEST_QUERIES.observe(stats.queries, route=route)
+    REQUEST_DB_TIME.observe(stats.db_time, route=route)
+    REQUEST_TEMPLATE_TIME.observe(stats.template_time, route=route)
+
+
+def render_prometheus():
+    """All histograms in the Prometheus text exposition format"""
+    return '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+class Template(django_backend.Template):
+    """Backend template that adds its render time to the current request"""
+
+    def render(self, context=None, request=None):
+        stats = current_request.get()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, timing renders for RequestMetricsMiddleware"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
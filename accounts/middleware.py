@@ -0,0 +1,89 @@
+# accounts/middleware.py
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import QueryBudgetExceeded, RequestStats, current_request, record_request
+
+logger = logging.getLogger(__name__)
+
+# Session key holding when the session's expiry was last pushed forward
+SESSION_REFRESHED_AT_KEY = '_refreshed_at'
+
+
+class SessionRefreshMiddleware(MiddlewareMixin):
+    """
+    Extend a session's expiry only when it is close to running out.
+
+    Replaces SESSION_SAVE_EVERY_REQUEST, which rewrote the session on every
+    page view and poll. A session is saved again only once less than
+    SESSION_REFRESH_WINDOW seconds of its SESSION_COOKIE_AGE are left, so an
+    active user costs one session write every few hours instead of one per
+    request. Must come after SessionMiddleware.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is None:
+            return response
+
+        now = int(time.time())
+        if session.modified:
+            # Being saved with a fresh expiry anyway; just note when
+            if not session.is_empty():
+                session[SESSION_REFRESHED_AT_KEY] = now
+        elif session.session_key:
+            refreshed_at = session.get(SESSION_REFRESHED_AT_KEY, 0)
+            if refreshed_at + settings.SESSION_COOKIE_AGE - now < settings.SESSION_REFRESH_WINDOW:
+                session[SESSION_REFRESHED_AT_KEY] = now
+
+        return response
+
+
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """
+    Record latency, SQL queries, DB time and template time per route.
+
+    The samples feed the histograms in accounts.metrics, and the metrics
+    endpoint serves them. Views decorated with @query_budget(n) are
+    checked against their budget as QUERY_BUDGET_MODE says. Place it
+    early, so that the work of the middleware below it is counted too.
+    """
+
+    def process_request(self, request):
+        stats = RequestStats()
+        request._metrics = stats
+        current_request.set(stats)
+        request._metrics_wrappers = [connection.execute_wrapper(stats) for connection in connections.all()]
+        for wrapper in request._metrics_wrappers:
+            wrapper.__enter__()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+
+    def process_response(self, request, response):
+        stats = getattr(request, '_metrics', None)
+        if stats is None:
+            return response
+        for wrapper in reversed(request._metrics_wrappers):
+            wrapper.__exit__(None, None, None)
+        # Not reset() with a token: under ASGI the two hooks run in
+        # different contexts, and the token only works in its own
+        current_request.set(None)
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        record_request(route, request.method, response.status_code, stats)
+
+        budget = getattr(request, '_query_budget', None)
+        if budget is not None and stats.queries > budget:
+            message = f'{route} ran {stats.queries} queries, budget is {budget}'
+            mode = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+            if mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            if mode == 'warn':
+                logger.warning(message, extra={'route': route, 'queries': stats.queries, 'budget': budget})
+        return response
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_unread_counters(apps, schema_editor):
+    ChatSession = apps.get_model('accounts', 'ChatSession')
+    Message = apps.get_model('accounts', 'Message')
+    UnreadMessageCounter = apps.get_model('accounts', 'UnreadMessageCounter')
+
+    unread = Message.objects.filter(is_read=False, receiver__isnull=False).order_by()
+    UnreadMessageCounter.objects.bulk_create(
+        UnreadMessageCounter(user_id=row['receiver'], count=row['total'])
+        for row in unread.values('receiver').annotate(total=models.Count('id'))
+    )
+
+    per_chat = unread.filter(chat_session__isnull=False).values(
+        'chat_session', 'receiver', 'chat_session__user', 'chat_session__technician'
+    ).annotate(total=models.Count('id'))
+    for row in per_chat:
+        counts = {}
+        if row['receiver'] == row['chat_session__user']:
+            counts['user_unread_count'] = row['total']
+        if row['receiver'] == row['chat_session__technician']:
+            counts['technician_unread_count'] = row['total']
+        if counts:
+            ChatSession.objects.filter(id=row['chat_session']).update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_faqcategory_message_bot_response_data_faqitem'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadMessageCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'unread_message_counters',
+            },
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='technician_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='user_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'technician_search_fts'
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        document, content='technician_search_documents', content_rowid='technician_id'
+    )""",
+    f"""CREATE TRIGGER technician_search_ai AFTER INSERT ON technician_search_documents BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.technician_id, new.document);
+    END""",
+    f"""CREATE TRIGGER technician_search_ad AFTER DELETE ON technician_search_documents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.technician_id, old.document);
+    END""",
+    f"""CREATE TRIGGER technician_search_au AFTER UPDATE ON technician_search_documents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.technician_id, old.document);
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.technician_id, new.document);
+    END""",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS technician_search_ai',
+    'DROP TRIGGER IF EXISTS technician_search_ad',
+    'DROP TRIGGER IF EXISTS technician_search_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS technician_search_trgm '
+    'ON technician_search_documents USING gin (document gin_trgm_ops)',
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS technician_search_trgm',
+]
+
+
+def run_for_vendor(sqlite, postgresql):
+    def run(apps, schema_editor):
+        statements = {'sqlite': sqlite, 'postgresql': postgresql}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+def backfill_search_documents(apps, schema_editor):
+    Technician = apps.get_model('accounts', 'Technician')
+    TechnicianSearchDocument = apps.get_model('accounts', 'TechnicianSearchDocument')
+
+    documents = []
+    technicians = Technician.objects.select_related('user_profile__user').prefetch_related('specialties')
+    for technician in technicians:
+        profile = technician.user_profile
+        user = profile.user
+        specialties = sorted(specialty.name for specialty in technician.specialties.all())
+        parts = [
+            user.first_name, user.last_name, user.username,
+            profile.city, profile.country,
+            ' '.join(specialties), technician.bio,
+        ]
+        documents.append(TechnicianSearchDocument(
+            technician=technician,
+            document=' '.join(part for part in parts if part).lower(),
+            specialty_names='\n'.join(specialties),
+        ))
+    TechnicianSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_unread_message_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TechnicianSearchDocument',
+            fields=[
+                ('technician', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='accounts.technician')),
+                ('document', models.TextField()),
+                ('specialty_names', models.TextField(blank=True, help_text='Newline-separated specialty names')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'technician_search_documents',
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor(SQLITE_FORWARD, POSTGRESQL_FORWARD),
+            run_for_vendor(SQLITE_BACKWARD, POSTGRESQL_BACKWARD),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+FTS_TABLE = 'technician_search_fts'
+
+# SQLite adds the column by rebuilding technician_search_documents, which
+# drops the FTS sync triggers from 0020; put them back and resync the index
+SQLITE_RESTORE_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS technician_search_ai',
+    'DROP TRIGGER IF EXISTS technician_search_ad',
+    'DROP TRIGGER IF EXISTS technician_search_au',
+    f"""CREATE TRIGGER technician_search_ai AFTER INSERT ON technician_search_documents BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.technician_id, new.document);
+    END""",
+    f"""CREATE TRIGGER technician_search_ad AFTER DELETE ON technician_search_documents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.technician_id, old.document);
+    END""",
+    f"""CREATE TRIGGER technician_search_au AFTER UPDATE ON technician_search_documents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.technician_id, old.document);
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.technician_id, new.document);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def restore_sqlite_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_RESTORE_TRIGGERS:
+            schema_editor.execute(statement)
+
+
+def backfill_sort_names(apps, schema_editor):
+    TechnicianSearchDocument = apps.get_model('accounts', 'TechnicianSearchDocument')
+
+    documents = list(TechnicianSearchDocument.objects.select_related('technician__user_profile__user'))
+    for document in documents:
+        user = document.technician.user_profile.user
+        full_name = f'{user.first_name} {user.last_name}'.strip()
+        document.sort_name = (full_name or user.username).lower()
+    TechnicianSearchDocument.objects.bulk_update(documents, ['sort_name'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_technician_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='techniciansearchdocument',
+            name='sort_name',
+            field=models.CharField(blank=True, help_text='Lowercase full name for sorting', max_length=301),
+        ),
+        migrations.RunPython(restore_sqlite_triggers, restore_sqlite_triggers),
+        migrations.RunPython(backfill_sort_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='technician',
+            index=models.Index(fields=['-average_rating', 'id'], name='technician_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technician',
+            index=models.Index(fields=['-experience_years', 'id'], name='technician_experience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technician',
+            index=models.Index(fields=['average_response_time', 'id'], name='technician_response_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technician',
+            index=models.Index(fields=['hourly_rate', 'id'], name='technician_rate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='techniciansearchdocument',
+            index=models.Index(fields=['sort_name', 'technician'], name='technician_name_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, IntegerField, OuterRef, Subquery, Value, When
+
+
+def backfill_ticket_technicians(apps, schema_editor):
+    CreateTicket = apps.get_model('accounts', 'CreateTicket')
+    AssistanceRequest = apps.get_model('accounts', 'AssistanceRequest')
+
+    # The accepted request's technician, else the most recently asked one
+    assigned = AssistanceRequest.objects.filter(ticket=OuterRef('pk')).annotate(
+        accepted_first=Case(
+            When(status='accepted', then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('accepted_first', '-id').values('technician__user_profile__user_id')[:1]
+    CreateTicket.objects.filter(technician__isnull=True).update(technician_id=Subquery(assigned))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_technician_directory_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='createticket',
+            name='technician',
+            field=models.ForeignKey(blank=True, help_text='Currently assigned technician; set by every assignment path', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='create_ticket_assigned', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='createticket',
+            index=models.Index(fields=['technician', 'status', 'created_at'], name='accounts_cr_technic_6aa209_idx'),
+        ),
+        migrations.RunPython(backfill_ticket_technicians, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:43
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    """Rebuild every technician's rating aggregates from its reviews"""
+    Technician = apps.get_model('accounts', 'Technician')
+    TechnicianReview = apps.get_model('accounts', 'TechnicianReview')
+    default_average = Technician._meta.get_field('average_rating').default
+
+    star_counts = {}
+    for row in TechnicianReview.objects.order_by().values('technician_id', 'rating').annotate(total=Count('id')):
+        star_counts.setdefault(row['technician_id'], {})[row['rating']] = row['total']
+
+    technicians = list(Technician.objects.all())
+    for technician in technicians:
+        counts = star_counts.get(technician.id, {})
+        technician.review_count = sum(counts.values())
+        technician.rating_sum = sum(stars * total for stars, total in counts.items())
+        for stars in range(1, 6):
+            setattr(technician, f'rating_{stars}_count', counts.get(stars, 0))
+        technician.average_rating = (
+            technician.rating_sum / technician.review_count if technician.review_count else default_average
+        )
+    Technician.objects.bulk_update(technicians, [
+        'review_count', 'rating_sum', 'average_rating',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='technician',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='technician',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='technician',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='technician',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='technician',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='technician',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
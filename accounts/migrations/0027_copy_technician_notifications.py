@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def copy_technician_notifications(apps, schema_editor):
+    """Move Notifications_Technician rows into Notification, timestamps included"""
+    # INSERT ... SELECT keeps created_at, which auto_now_add would overwrite
+    Notification = apps.get_model('accounts', 'Notification')
+    Notifications_Technician = apps.get_model('accounts', 'Notifications_Technician')
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"INSERT INTO {quote(Notification._meta.db_table)} "
+        f"(recipient_id, message, is_read, created_at) "
+        f"SELECT technician_id, message, is_read, created_at "
+        f"FROM {quote(Notifications_Technician._meta.db_table)} "
+        f"WHERE technician_id IS NOT NULL"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_technician_rating_aggregates'),
+    ]
+
+    # Only the copy, so no schema change shares its transaction
+    operations = [
+        # The old rows point at legacy Ticket rows, which Notification.ticket cannot hold
+        migrations.RunPython(copy_technician_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_copy_technician_notifications'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='notifications_technician',
+            name='technician',
+        ),
+        migrations.RemoveField(
+            model_name='notifications_technician',
+            name='ticket',
+        ),
+        migrations.DeleteModel(
+            name='Notifications_Technician',
+        ),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import Case, F, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.conf import settings
@@ -22,6 +24,8 @@ class UserProfile(models.Model):
         null=True,
         max_length=500
     )
+    # Square thumbnails of profile_picture by size in px (see accounts.images)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     date_of_birth = models.DateField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -33,12 +37,28 @@ class UserProfile(models.Model):
         verbose_name = 'User Profile'
         verbose_name_plural = 'User Profiles'
 
-    def get_profile_picture_url(self):
-        """Safe method to get profile picture URL"""
-        if self.profile_picture and hasattr(self.profile_picture, 'url'):
+    def get_profile_picture_url(self, size=None):
+        """
+        Safe method to get profile picture URL
+
+        With size, the smallest thumbnail at least size px wide is used
+        when there is one, so small avatars do not load the original.
+        """
+        if not self.profile_picture:
+            return None
+        if size:
+            fits = [int(width) for width in self.profile_picture_variants or {} if int(width) >= size]
+            if fits:
+                return self.profile_picture.storage.url(self.profile_picture_variants[str(min(fits))])
+        if hasattr(self.profile_picture, 'url'):
             return self.profile_picture.url
         return None
 
+    @property
+    def avatar_url(self):
+        """Profile picture for the 32 px navigation avatar"""
+        return self.get_profile_picture_url(64)
+
 class TechnicianSpecialty(models.Model):
     """
     Model for technician specialties/skills
@@ -69,6 +89,13 @@ class Technician(models.Model):
     is_available = models.BooleanField(default=True)
     average_rating = models.FloatField(default=4.0)
     review_count = models.IntegerField(default=0)
+    # Maintained from TechnicianReview by accounts.ratings
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
     experience_years = models.IntegerField(default=0)
     average_response_time = models.FloatField(default=2.0, help_text="Average response time in hours")
     hourly_rate = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
@@ -93,6 +120,13 @@ class Technician(models.Model):
     class Meta:
         verbose_name = 'Technician'
         verbose_name_plural = 'Technicians'
+        # One per directory sort order (see TECHNICIAN_DIRECTORY_ORDERINGS)
+        indexes = [
+            models.Index(fields=['-average_rating', 'id'], name='technician_rating_idx'),
+            models.Index(fields=['-experience_years', 'id'], name='technician_experience_idx'),
+            models.Index(fields=['average_response_time', 'id'], name='technician_response_idx'),
+            models.Index(fields=['hourly_rate', 'id'], name='technician_rate_idx'),
+        ]
 
     @property
     def user(self):
@@ -111,8 +145,8 @@ class Technician(models.Model):
 
     @property
     def profile_picture_url(self):
-        """Get profile picture URL"""
-        return self.user_profile.get_profile_picture_url()
+        """Get profile picture URL (a thumbnail, for cards and lists)"""
+        return self.user_profile.get_profile_picture_url(128)
 
     @property
     def initials(self):
@@ -141,18 +175,57 @@ class Technician(models.Model):
         """Get list of specialty names"""
         return [specialty.name for specialty in self.specialties.all()]
 
-    def update_rating(self, new_rating):
-        """Update average rating when new review is added"""
-        total_rating = (self.average_rating * self.review_count) + new_rating
-        self.review_count += 1
-        self.average_rating = total_rating / self.review_count
-        self.save()
+    @property
+    def rating_histogram(self):
+        """Review count and share of each star rating, 5 stars first"""
+        histogram = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'rating_{stars}_count')
+            histogram.append({
+                'stars': stars,
+                'count': count,
+                'percent': round(100 * count / self.review_count) if self.review_count else 0,
+            })
+        return histogram
 
     def increment_completed_tickets(self):
         """Increment completed tickets count"""
         self.completed_tickets += 1
         self.save()
 
+class TechnicianSearchDocument(models.Model):
+    """
+    Denormalized search text for one technician.
+
+    Built from the technician, their user, profile and specialties by
+    accounts.technician_search, which keeps it current through signals.
+    The document column is indexed for full-text search: a pg_trgm GIN
+    index on PostgreSQL and an FTS5 table on SQLite.
+    """
+    technician = models.OneToOneField(
+        Technician,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    document = models.TextField()
+    specialty_names = models.TextField(blank=True, help_text="Newline-separated specialty names")
+    sort_name = models.CharField(max_length=301, blank=True, help_text="Lowercase full name for sorting")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'technician_search_documents'
+        indexes = [
+            models.Index(fields=['sort_name', 'technician'], name='technician_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"Search document for technician {self.technician_id}"
+
+    def get_specialties_list(self):
+        """Specialty names as a list, without touching the M2M table"""
+        return [name for name in self.specialty_names.split('\n') if name]
+
 class TechnicianReview(models.Model):
     """
     Model for technician reviews and ratings
@@ -320,6 +393,9 @@ class ChatSession(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_message_at = models.DateTimeField(null=True, blank=True)
     deleted_at = models.DateTimeField(null=True, blank=True)  # ADD THIS FOR SOFT DELETE
+    # Unread messages received by each participant, maintained by Message.save
+    user_unread_count = models.PositiveIntegerField(default=0)
+    technician_unread_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         db_table = 'chat_sessions'
@@ -345,20 +421,32 @@ class ChatSession(models.Model):
     @property
     def unread_count_for_user(self):
         """Count unread messages for the user"""
-        return self.messages.filter(is_read=False, receiver=self.user).count()
+        return self.user_unread_count
 
     @property
     def unread_count_for_technician(self):
         """Count unread messages for the technician"""
-        return self.messages.filter(is_read=False, receiver=self.technician).count()
+        return self.technician_unread_count
+
+    def unread_count_for(self, user):
+        """Count unread messages for either participant"""
+        if user.id == self.user_id:
+            return self.user_unread_count
+        if user.id == self.technician_id:
+            return self.technician_unread_count
+        return 0
 
     def get_last_message(self):
         """Get the most recent message in the chat"""
         return self.messages.filter(is_deleted=False).order_by('-created_at').first()
 
     def mark_messages_as_read(self, user):
-        """Mark all messages as read for a user"""
-        self.messages.filter(receiver=user, is_read=False).update(is_read=True)
+        """Mark all messages as read for a user and return how many were marked"""
+        with transaction.atomic():
+            marked = self.messages.filter(receiver=user, is_read=False).update(is_read=True)
+            if marked:
+                UnreadMessageCounter.adjust(user.id, self.id, -marked)
+        return marked
 
 class Message(models.Model):
     """
@@ -424,10 +512,15 @@ class Message(models.Model):
         sender_name = self.sender.username if self.sender else 'System'
         receiver_name = self.receiver.username if self.receiver else 'Unknown'
         return f"{sender_name} to {receiver_name}: {self.content[:50]}"
-    def __str__(self):
-        sender_name = self.sender.username if self.sender else 'System'
-        receiver_name = self.receiver.username if self.receiver else 'Unknown'
-        return f"{sender_name} to {receiver_name}: {self.content[:50]}"
+
+    def save(self, *args, **kwargs):
+        """Save the message, counting it as unread for its receiver when new"""
+        if not self._state.adding or self.is_read or not self.receiver_id:
+            return super().save(*args, **kwargs)
+        # No savepoint when nested: an error here fails the caller's transaction anyway
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            UnreadMessageCounter.adjust(self.receiver_id, self.chat_session_id, 1)
     
     @property
     def has_bot_data(self):
@@ -484,6 +577,84 @@ class MessageEditHistory(models.Model):
         db_table = 'message_edit_history'
         ordering = ['-edited_at']
 
+def _floor_at_zero(expression):
+    """Clamp a counter expression so drifted counters never go negative"""
+    return Greatest(expression, 0, output_field=models.PositiveIntegerField())
+
+class UnreadMessageCounter(models.Model):
+    """
+    Denormalized count of a user's unread messages.
+
+    Together with ChatSession.user_unread_count/technician_unread_count it
+    replaces counting Message rows on every badge poll. Counters only move
+    through adjust(), which uses F() expressions so concurrent requests
+    never lose an update; recount() rebuilds them from the messages table.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter'
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'unread_message_counters'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} unread"
+
+    @classmethod
+    def get_count(cls, user):
+        """Return the user's unread message count"""
+        return cls.objects.filter(user=user).values_list('count', flat=True).first() or 0
+
+    @classmethod
+    def adjust(cls, user_id, chat_session_id, delta):
+        """Move a user's total and per-chat unread counters by delta"""
+        updated = cls.objects.filter(user_id=user_id).update(count=_floor_at_zero(F('count') + delta))
+        if not updated and delta > 0:
+            counter, created = cls.objects.get_or_create(user_id=user_id, defaults={'count': delta})
+            if not created:
+                # Another request created the row first
+                cls.objects.filter(user_id=user_id).update(count=F('count') + delta)
+
+        if chat_session_id:
+            ChatSession.objects.filter(id=chat_session_id).update(
+                user_unread_count=Case(
+                    When(user_id=user_id, then=_floor_at_zero(F('user_unread_count') + delta)),
+                    default=F('user_unread_count'),
+                ),
+                technician_unread_count=Case(
+                    When(technician_id=user_id, then=_floor_at_zero(F('technician_unread_count') + delta)),
+                    default=F('technician_unread_count'),
+                ),
+            )
+
+    @classmethod
+    def recount(cls):
+        """Rebuild every counter from the messages table"""
+        unread = Message.objects.filter(is_read=False, receiver__isnull=False)
+        with transaction.atomic():
+            totals = unread.order_by().values('receiver').annotate(total=models.Count('id'))
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                cls(user_id=row['receiver'], count=row['total']) for row in totals
+            )
+
+            ChatSession.objects.update(user_unread_count=0, technician_unread_count=0)
+            per_chat = unread.filter(chat_session__isnull=False).order_by().values(
+                'chat_session', 'receiver', 'chat_session__user', 'chat_session__technician'
+            ).annotate(total=models.Count('id'))
+            for row in per_chat:
+                counts = {}
+                if row['receiver'] == row['chat_session__user']:
+                    counts['user_unread_count'] = row['total']
+                if row['receiver'] == row['chat_session__technician']:
+                    counts['technician_unread_count'] = row['total']
+                if counts:
+                    ChatSession.objects.filter(id=row['chat_session']).update(**counts)
+
 class Attachment(models.Model):
     """
     Model for message attachments
@@ -526,13 +697,34 @@ class CreateTicket(models.Model):
         null=True,
         blank=True,
         related_name='create_ticket_assigned',
+        help_text="Currently assigned technician; set by every assignment path",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['technician', 'status', 'created_at']),
+        ]
+
     def __str__(self):
         return f"Ticket {self.id}: {self.title}"
 
+    def assign_technician(self, technician_user, status=None):
+        """Make technician_user the ticket's assigned technician"""
+        self.technician = technician_user
+        update_fields = ['technician']
+        if status is not None:
+            self.status = status
+            update_fields.append('status')
+        self.save(update_fields=update_fields)
+
 class Notification(models.Model):
-    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    """
+    A notification in a user's feed, customer or technician alike.
+
+    Written through accounts.notifications; the two indexes serve the
+    newest-first feed and the unread feed/count for one recipient.
+    """
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications', db_index=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_notifications', null=True, blank=True)
     ticket = models.ForeignKey('CreateTicket', on_delete=models.CASCADE, null=True, blank=True)
     message = models.TextField()
@@ -540,27 +732,66 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notification_feed_idx'),
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='notification_unread_idx'),
+        ]
 
     def __str__(self):
         return f"Notification to {self.recipient.username}: {self.message}"
 
-class Notifications_Technician(models.Model):
-    technician = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    message = models.CharField(max_length=255)
-    ticket = models.ForeignKey('Ticket', on_delete=models.CASCADE, null=True, blank=True)
-    is_read = models.BooleanField(default=False)
+
+class Job(models.Model):
+    """
+    A unit of background work (email, notifications); see accounts.jobs.
+
+    Enqueued with accounts.jobs.enqueue() inside the request's transaction,
+    so a job exists only if the change that caused it was committed.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        db_table = 'notifications_technician'
+        db_table = 'jobs'
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id}: {self.task} ({self.status})"
 
 # Remove duplicate BotChat and BotMessage models since we're using ChatSession and Message
 
 # Signals
+@receiver(post_delete, sender=Message)
+def discount_deleted_unread_message(sender, instance, **kwargs):
+    """Keep unread counters in step when unread messages are hard deleted"""
+    if not instance.is_read and instance.receiver_id:
+        UnreadMessageCounter.adjust(instance.receiver_id, instance.chat_session_id, -1)
+
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
     """Save UserProfile when User is saved"""
+    # Logins only touch last_login; resaving the profile would invalidate
+    # the technician caches and search documents on every login
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
     if hasattr(instance, 'profile'):
         instance.profile.save()
 
@@ -570,35 +801,6 @@ def create_technician_profile(sender, instance, created, **kwargs):
     if instance.is_technician:
         Technician.objects.get_or_create(user_profile=instance)
 
-@receiver(post_save, sender=AssistanceRequest)
-def create_chat_session_on_assistance_request(sender, instance, created, **kwargs):
-    """
-    Automatically create a chat session when an assistance request is created
-    """
-    if created and instance.status == 'accepted':
-        # Create chat session for user-technician communication
-        chat_session, created = ChatSession.objects.get_or_create(
-            user=instance.user,
-            technician=instance.technician.user_profile.user,
-            ticket=instance.ticket,
-            defaults={
-                'chat_type': 'user_tech',
-                'status': 'active'
-            }
-        )
-        
-        # Create initial message
-        if created:
-            Message.objects.create(
-                chat_session=chat_session,
-                sender=instance.user,
-                receiver=instance.technician.user_profile.user,
-                content=f"Assistance request created for ticket: {instance.ticket.title}",
-                message_type='user_to_tech'
-            )
-
-
-
 # models.py - Enhanced FAQ models
 class FAQCategory(models.Model):
     """Categories for organizing FAQ items"""
@@ -0,0 +1,100 @@
+# accounts/notifications.py
+"""
+The notification store for customers and technicians.
+
+Every notification is a Notification row addressed to one recipient.
+notify() writes one and notify_many() fans a batch out in a single INSERT.
+Feeds are read newest first with keyset pagination. Both feeds and the
+unread count are range scans of the Notification indexes that start with
+recipient.
+
+bulk_create() and update() send no model signals, so notify_many() and
+mark_all_read() invalidate the recipients' cached dashboards themselves.
+
+prune_notifications() applies the retention policy:
+- read notifications are kept for READ_RETENTION_DAYS
+- unread ones are kept for UNREAD_RETENTION_DAYS
+- no recipient keeps more than MAX_NOTIFICATIONS_PER_USER
+
+The prune_notifications management command runs it.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .caching import bump_on_commit, user_namespace
+from .keyset import after_cursor, keyset_page
+from .models import Notification
+
+NOTIFICATION_FEED_ORDERING = ('-created_at', '-id')
+NOTIFICATION_FEED_PAGE_SIZE = 20
+
+READ_RETENTION_DAYS = 30
+UNREAD_RETENTION_DAYS = 180
+MAX_NOTIFICATIONS_PER_USER = 200
+
+
+def notify(recipient_id, message, sender_id=None, ticket_id=None):
+    """Add one notification to a user's feed"""
+    return Notification.objects.create(
+        recipient_id=recipient_id, sender_id=sender_id, ticket_id=ticket_id, message=message
+    )
+
+
+def notify_many(notifications):
+    """
+    Write many notifications in one INSERT.
+
+    notifications is an iterable of dicts with the keyword arguments of
+    notify(). Returns the created Notification objects.
+    """
+    created = Notification.objects.bulk_create([Notification(**fields) for fields in notifications])
+    bump_on_commit(*{user_namespace(notification.recipient_id) for notification in created})
+    return created
+
+
+def notification_feed(user_id, cursor=None, limit=NOTIFICATION_FEED_PAGE_SIZE, unread_only=False):
+    """
+    One page of a user's notifications, newest first.
+
+    Returns (notifications, next_cursor) like keyset_page and raises
+    InvalidCursor for a malformed cursor.
+    """
+    notifications = Notification.objects.filter(recipient_id=user_id)
+    if unread_only:
+        notifications = notifications.filter(is_read=False)
+    return keyset_page(notifications, NOTIFICATION_FEED_ORDERING, cursor, limit)
+
+
+def unread_notification_count(user_id):
+    """Number of unread notifications for a user"""
+    return Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+
+
+def mark_all_read(user_id):
+    """Mark every unread notification of a user as read; returns how many"""
+    updated = Notification.objects.filter(recipient_id=user_id, is_read=False).update(is_read=True)
+    if updated:
+        bump_on_commit(user_namespace(user_id))
+    return updated
+
+
+def prune_notifications(now=None):
+    """Delete notifications outside the retention policy; returns how many"""
+    now = now or timezone.now()
+    expired = Q(is_read=True, created_at__lt=now - timedelta(days=READ_RETENTION_DAYS)) | Q(
+        created_at__lt=now - timedelta(days=UNREAD_RETENTION_DAYS)
+    )
+    deleted, _ = Notification.objects.filter(expired).delete()
+
+    # Cap what is left per recipient, dropping the oldest
+    crowded = list(Notification.objects.values('recipient_id').annotate(
+        total=Count('id')
+    ).filter(total__gt=MAX_NOTIFICATIONS_PER_USER).values_list('recipient_id', flat=True))
+    for recipient_id in crowded:
+        feed = Notification.objects.filter(recipient_id=recipient_id).order_by(*NOTIFICATION_FEED_ORDERING)
+        last_kept = feed.values_list('created_at', 'id')[MAX_NOTIFICATIONS_PER_USER - 1]
+        removed, _ = feed.filter(after_cursor(Notification, NOTIFICATION_FEED_ORDERING, last_kept)).delete()
+        deleted += removed
+    return deleted
@@ -0,0 +1,146 @@
+# accounts/ratings.py
+"""
+Technician rating aggregates.
+
+Each Technician row stores the integer sum and count of its review ratings
+and a count per star (rating_1_count .. rating_5_count). average_rating is
+derived from sum / count. The directory sorts on it and the profile page
+shows the per-star histogram, so neither has to scan TechnicianReview.
+
+The receivers below keep the aggregates in step with every review that is
+created, re-rated or deleted. Each change is a single UPDATE with F()
+expressions, so concurrent reviews cannot lose an update. The average is
+recomputed from the integers every time, so it does not drift. A
+technician without reviews shows the model's default average_rating.
+
+reconcile_ratings() checks every technician against TechnicianReview and
+rewrites the aggregates that differ. Run it daily with the
+reconcile_technician_ratings management command.
+"""
+import logging
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast, Greatest
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .caching import TECHNICIANS, bump_on_commit
+from .models import Technician, TechnicianReview
+
+STAR_FIELDS = {stars: f'rating_{stars}_count' for stars in range(1, 6)}
+AGGREGATE_FIELDS = ['review_count', 'rating_sum', *STAR_FIELDS.values(), 'average_rating']
+DEFAULT_AVERAGE_RATING = Technician._meta.get_field('average_rating').default
+
+logger = logging.getLogger(__name__)
+
+
+def _floor_at_zero(expression):
+    return Greatest(expression, Value(0))
+
+
+def adjust_rating(technician_id, added=None, removed=None):
+    """
+    Count one rating in (added), out (removed), or both when a review is re-rated.
+
+    One UPDATE of the technician row. Right-hand sides read the row as it
+    was before the UPDATE, so the average is built from the new sum and
+    count explicitly.
+    """
+    if added == removed:
+        return
+    count_delta = (added is not None) - (removed is not None)
+    new_count = _floor_at_zero(F('review_count') + count_delta)
+    new_sum = _floor_at_zero(F('rating_sum') + (added or 0) - (removed or 0))
+    changes = {
+        'review_count': new_count,
+        'rating_sum': new_sum,
+        'average_rating': Case(
+            When(review_count__gt=-count_delta, then=Cast(new_sum, FloatField()) / Cast(new_count, FloatField())),
+            default=Value(DEFAULT_AVERAGE_RATING),
+            output_field=FloatField(),
+        ),
+    }
+    if added is not None:
+        changes[STAR_FIELDS[added]] = F(STAR_FIELDS[added]) + 1
+    if removed is not None:
+        changes[STAR_FIELDS[removed]] = _floor_at_zero(F(STAR_FIELDS[removed]) - 1)
+    Technician.objects.filter(pk=technician_id).update(**changes)
+
+
+def expected_aggregates(star_counts):
+    """The aggregate field values for a Counter of {stars: reviews}"""
+    review_count = sum(star_counts.values())
+    rating_sum = sum(stars * count for stars, count in star_counts.items())
+    values = {'review_count': review_count, 'rating_sum': rating_sum}
+    values.update({field: star_counts.get(stars, 0) for stars, field in STAR_FIELDS.items()})
+    values['average_rating'] = rating_sum / review_count if review_count else DEFAULT_AVERAGE_RATING
+    return values
+
+
+def _differs(technician, expected):
+    return any(
+        abs(getattr(technician, field) - value) > 1e-9 if field == 'average_rating'
+        else getattr(technician, field) != value
+        for field, value in expected.items()
+    )
+
+
+def reconcile_ratings():
+    """Rewrite the aggregates of technicians that disagree with their reviews; returns their ids"""
+    actual = defaultdict(Counter)
+    for row in TechnicianReview.objects.order_by().values('technician_id', 'rating').annotate(total=Count('id')):
+        actual[row['technician_id']][row['rating']] = row['total']
+
+    stale = [
+        technician.id for technician in Technician.objects.only(*AGGREGATE_FIELDS).iterator()
+        if _differs(technician, expected_aggregates(actual[technician.id]))
+    ]
+    for technician_id in stale:
+        with transaction.atomic():
+            # adjust_rating() waits for this lock, and we wait for reviews already being counted
+            list(Technician.objects.select_for_update().filter(pk=technician_id).values_list('pk'))
+            star_counts = Counter(dict(
+                TechnicianReview.objects.filter(technician_id=technician_id).order_by()
+                .values_list('rating').annotate(total=Count('id'))
+            ))
+            Technician.objects.filter(pk=technician_id).update(**expected_aggregates(star_counts))
+    if stale:
+        logger.warning(
+            "Fixed rating aggregates of %d technicians", len(stale), extra={'technician_ids': stale[:100]}
+        )
+        bump_on_commit(TECHNICIANS)
+    return stale
+
+
+# Signals
+
+@receiver(post_init, sender=TechnicianReview)
+def remember_counted_rating(sender, instance, **kwargs):
+    # __dict__ so deferred fields are not loaded just for this
+    instance._counted_rating = (instance.__dict__.get('technician_id'), instance.__dict__.get('rating'))
+
+
+@receiver(post_save, sender=TechnicianReview)
+def count_review_rating(sender, instance, created, raw=False, **kwargs):
+    previous_technician_id, previous_rating = instance._counted_rating
+    instance._counted_rating = (instance.technician_id, instance.rating)
+    if raw:
+        # Fixtures carry their technicians' aggregates
+        return
+    if created:
+        adjust_rating(instance.technician_id, added=instance.rating)
+    elif previous_rating is None:
+        # Loaded without its rating; reconcile_ratings() catches any change
+        return
+    elif previous_technician_id != instance.technician_id:
+        adjust_rating(previous_technician_id, removed=previous_rating)
+        adjust_rating(instance.technician_id, added=instance.rating)
+    else:
+        adjust_rating(instance.technician_id, added=instance.rating, removed=previous_rating)
+
+
+@receiver(post_delete, sender=TechnicianReview)
+def discount_review_rating(sender, instance, **kwargs):
+    adjust_rating(instance.technician_id, removed=instance.rating)
@@ -0,0 +1,134 @@
+# accounts/realtime.py
+"""
+Server push for chat sessions.
+
+Message rows are published to a broker when they are created, edited or
+soft-deleted, and the chat pages listen on a server-sent events stream
+(see views.chat_events) instead of reloading themselves every few seconds.
+
+The broker is pluggable through settings.CHAT_EVENT_BROKER. The default
+InProcessBroker fans events out inside the current process, which covers
+tests and single-process ASGI deployments; a multi-process deployment can
+point the setting at a broker backed by a shared pub/sub service.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Message
+
+DEFAULT_BROKER = 'accounts.realtime.InProcessBroker'
+
+
+def chat_channel(chat_session_id):
+    """Broker channel name for a chat session"""
+    return f'chat:{chat_session_id}'
+
+
+class Subscription:
+    """A single listener on a broker channel"""
+
+    def __init__(self, broker, channel, loop):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def deliver(self, event):
+        # Publishers run in worker threads, the listener runs in the event loop
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        except RuntimeError:
+            # The listener's event loop is gone; drop the subscription
+            self.close()
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan out events to subscribers living in this process"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel, loop=None):
+        subscription = Subscription(self, channel, loop or asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide chat event broker"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_path = getattr(settings, 'CHAT_EVENT_BROKER', DEFAULT_BROKER)
+                _broker = import_string(broker_path)()
+    return _broker
+
+
+def serialize_message_event(message, event_type):
+    """Build the payload pushed to chat listeners"""
+    return {
+        'type': event_type,
+        'message': {
+            'id': message.id,
+            'chat_session_id': message.chat_session_id,
+            'sender_id': message.sender_id,
+            'message_type': message.message_type,
+            'content': '' if message.is_deleted else message.content,
+            'is_deleted': message.is_deleted,
+            'created_at': message.created_at.isoformat() if message.created_at else None,
+            'updated_at': message.updated_at.isoformat() if message.updated_at else None,
+        },
+    }
+
+
+@receiver(post_save, sender=Message)
+def publish_message_event(sender, instance, created, **kwargs):
+    """Push new, edited and soft-deleted messages to chat listeners"""
+    if not instance.chat_session_id:
+        return
+
+    if created:
+        event_type = 'message.created'
+    elif instance.is_deleted:
+        event_type = 'message.deleted'
+    else:
+        event_type = 'message.updated'
+
+    event = serialize_message_event(instance, event_type)
+    channel = chat_channel(instance.chat_session_id)
+    # Only announce rows other requests can actually read
+    transaction.on_commit(lambda: get_broker().publish(channel, event))
@@ -0,0 +1,77 @@
+# accounts/storage_clients.py
+"""
+Process-wide S3 client for the Supabase storage bucket.
+
+Building a boto3 client resolves credentials and loads service models. The
+first request on it then pays for DNS and a TLS handshake. get_s3_client()
+builds the client once per process, on first use, and every caller shares
+it. boto3 clients are thread-safe and keep a urllib3 pool of up to
+AWS_S3_MAX_POOL_CONNECTIONS keep-alive connections.
+
+Gunicorn forks workers from a master that may already have built the
+client. Pooled sockets must not be shared across processes, so the client
+is dropped in the child after a fork and rebuilt on its first use there.
+The client is also dropped when a test overrides an AWS_* setting.
+
+django-storages' S3Storage keeps its own connection per thread and is not
+routed through here.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_MAX_POOL_CONNECTIONS = 20
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def _build_s3_client():
+    import boto3
+    from botocore.config import Config
+
+    return boto3.session.Session().client(
+        's3',
+        aws_access_key_id=getattr(settings, 'AWS_ACCESS_KEY_ID', None),
+        aws_secret_access_key=getattr(settings, 'AWS_SECRET_ACCESS_KEY', None),
+        endpoint_url=getattr(settings, 'AWS_S3_ENDPOINT_URL', None),
+        region_name=getattr(settings, 'AWS_S3_REGION_NAME', None),
+        config=Config(
+            max_pool_connections=getattr(settings, 'AWS_S3_MAX_POOL_CONNECTIONS', DEFAULT_MAX_POOL_CONNECTIONS),
+            tcp_keepalive=True,
+            retries={'max_attempts': 3, 'mode': 'standard'},
+            s3={'addressing_style': getattr(settings, 'AWS_S3_ADDRESSING_STYLE', None) or 'auto'},
+        ),
+    )
+
+
+def get_s3_client():
+    """The shared S3 client, built on first use"""
+    client = _clients.get('s3')
+    if client is None:
+        with _lock:
+            # Another thread may have built it while we waited
+            client = _clients.get('s3')
+            if client is None:
+                client = _clients['s3'] = _build_s3_client()
+    return client
+
+
+def reset_clients():
+    """Forget the shared clients; the next call builds new ones"""
+    global _lock
+    _clients.clear()
+    # The lock may have been held by another thread when the process forked
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=reset_clients)
+
+
+@receiver(setting_changed)
+def reset_on_setting_change(setting, **kwargs):
+    if setting.startswith('AWS_'):
+        reset_clients()
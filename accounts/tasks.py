@@ -0,0 +1,86 @@
+# accounts/tasks.py
+"""
+Background tasks run by the job queue (see accounts.jobs).
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .jobs import enqueue, task
+from .models import AssistanceRequest, UserSettings
+from .notifications import notify, notify_many
+
+
+def wants_email(user):
+    """Whether a user has an address and has not turned email notifications off"""
+    if not user.email:
+        return False
+    enabled = UserSettings.objects.filter(user=user).values_list('email_notifications', flat=True).first()
+    return enabled is not False
+
+
+@task(max_attempts=8)
+def send_email(subject, message, recipient_list, html_message=None):
+    """Send one email; SMTP errors propagate so the job is retried"""
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=recipient_list,
+        fail_silently=False,
+        html_message=html_message,
+    )
+
+
+@task(max_attempts=8)
+def send_password_reset_email(user_id, protocol, domain):
+    """Email a password reset link; the token is made here so it is never stored in a job"""
+    user = User.objects.get(pk=user_id)
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    reset_url = f"{protocol}://{domain}/accounts/reset/{uid}/{token}/"
+    html_message = render_to_string('accounts/password_reset_email.html', {
+        'user': user,
+        'reset_url': reset_url,
+        'protocol': protocol,
+        'domain': domain,
+        'uid': uid,
+        'token': token,
+    })
+    send_email(
+        subject="Password Reset for FixIT",
+        # The plain message is the fallback for the HTML one
+        message=f"Please use this link to reset your password: {reset_url}",
+        recipient_list=[user.email],
+        html_message=html_message,
+    )
+
+
+@task()
+def send_notifications(notifications):
+    """Fan notifications out to their recipients' feeds (see notify_many)"""
+    notify_many(notifications)
+
+
+@task()
+def notify_assistance_request(assistance_request_id):
+    """Tell the technician about a new assistance request, by email too if wanted"""
+    assistance_request = AssistanceRequest.objects.select_related(
+        'user', 'technician__user_profile__user'
+    ).get(pk=assistance_request_id)
+    technician_user = assistance_request.technician.user_profile.user
+    message = f"New assistance request from {assistance_request.user.username}: {assistance_request.title}"
+    notify(technician_user.id, message, sender_id=assistance_request.user_id, ticket_id=assistance_request.ticket_id)
+
+    # A separate job, so a slow or failing mail server only retries the email
+    if wants_email(technician_user):
+        enqueue(
+            send_email,
+            subject=f"FixIT: {assistance_request.title}",
+            message=f"{message}\n\n{assistance_request.description}",
+            recipient_list=[technician_user.email],
+        )
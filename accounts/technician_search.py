@@ -0,0 +1,149 @@
+# accounts/technician_search.py
+"""
+Technician directory search.
+
+Each technician has a TechnicianSearchDocument holding one lowercase text
+blob (names, username, location, specialties and bio), plus the specialty
+names and sort key the directory reads. The receivers below
+rebuild the affected documents whenever one of those sources changes, and
+search_technicians() matches free text against the indexed documents:
+
+* SQLite: the technician_search_fts FTS5 table (kept in sync by triggers),
+  matching every query word as a prefix.
+* PostgreSQL and others: LIKE '%word%' per word, which PostgreSQL answers
+  from the pg_trgm GIN index on the document column.
+
+Both backends are created by migration 0020.
+"""
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Technician, TechnicianSearchDocument, TechnicianSpecialty, UserProfile
+
+FTS_TABLE = 'technician_search_fts'
+
+TOKEN_RE = re.compile(r'\w+')
+
+_fts_available = {}
+
+
+def build_search_document(technician):
+    """Build the (unsaved) search document for a technician"""
+    profile = technician.user_profile
+    user = profile.user
+    specialties = sorted(specialty.name for specialty in technician.specialties.all())
+    parts = [
+        user.first_name, user.last_name, user.username,
+        profile.city, profile.country,
+        ' '.join(specialties), technician.bio,
+    ]
+    return TechnicianSearchDocument(
+        technician=technician,
+        document=' '.join(part for part in parts if part).lower(),
+        specialty_names='\n'.join(specialties),
+        sort_name=(user.get_full_name() or user.username).lower(),
+    )
+
+
+def rebuild_search_documents(technician_ids=None):
+    """Rebuild the search documents of the given technicians (default: all)"""
+    technicians = Technician.objects.select_related(
+        'user_profile__user'
+    ).prefetch_related('specialties')
+    if technician_ids is not None:
+        technicians = technicians.filter(pk__in=technician_ids)
+
+    documents = [build_search_document(technician) for technician in technicians]
+    TechnicianSearchDocument.objects.bulk_create(
+        documents,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['technician'],
+        update_fields=['document', 'specialty_names', 'sort_name', 'updated_at'],
+    )
+    return len(documents)
+
+
+def fts_available():
+    """Whether the SQLite FTS5 table exists on the current database"""
+    alias = connection.alias
+    if alias not in _fts_available:
+        _fts_available[alias] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[alias]
+
+
+def search_technicians(queryset, query):
+    """Restrict a Technician queryset to those matching every word of query"""
+    tokens = TOKEN_RE.findall((query or '').lower())
+    if not tokens:
+        return queryset
+
+    if fts_available():
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        ))
+
+    for token in tokens:
+        queryset = queryset.filter(search_document__document__contains=token)
+    return queryset
+
+
+# Signals
+
+@receiver(post_save, sender=Technician)
+def update_technician_document(sender, instance, **kwargs):
+    rebuild_search_documents([instance.pk])
+
+
+@receiver(post_save, sender=UserProfile)
+def update_profile_documents(sender, instance, **kwargs):
+    if instance.is_technician:
+        rebuild_search_documents(Technician.objects.filter(user_profile=instance).values('pk'))
+
+
+@receiver(post_save, sender=User)
+def update_user_documents(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which is not searchable
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    technicians = Technician.objects.filter(user_profile__user=instance).values('pk')
+    rebuild_search_documents(technicians)
+
+
+@receiver(m2m_changed, sender=Technician.specialties.through)
+def update_specialty_documents(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Remember who loses the specialty before the rows disappear
+        instance._search_technician_ids = list(instance.technicians.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            rebuild_search_documents([instance.pk])
+        elif action == 'post_clear':
+            rebuild_search_documents(getattr(instance, '_search_technician_ids', []))
+        else:
+            rebuild_search_documents(pk_set)
+
+
+@receiver(post_save, sender=TechnicianSpecialty)
+def update_renamed_specialty_documents(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_search_documents(instance.technicians.values('pk'))
+
+
+@receiver(pre_delete, sender=TechnicianSpecialty)
+def remember_specialty_technicians(sender, instance, **kwargs):
+    instance._search_technician_ids = list(instance.technicians.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=TechnicianSpecialty)
+def update_deleted_specialty_documents(sender, instance, **kwargs):
+    rebuild_search_documents(getattr(instance, '_search_technician_ids', []))
@@ -1,3 +1,1459 @@
-from django.test import TestCase
+import asyncio
+import http.server
+import io
+import json
+import logging
+import os
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import unquote, urlsplit
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .assistance import open_assistance_request
+from .benchmarks import find_regressions
+from .caching import TECHNICIANS, bump, cached, get_version
+from .chat_sessions import reconcile_ticket_chats
+from .faq_bot import get_faq_index, invalidate_faq_index
+from .images import MAX_DIMENSION, PROFILE_PICTURE_SIZES, InvalidImage, save_profile_picture
+from .jobs import JOB_LOCK_TIMEOUT, enqueue, retry_delay, run_pending, task
+from .keyset import InvalidCursor, encode_cursor, keyset_page
+from .log import JsonFormatter, QueueHandler, SampleFilter
+from .metrics import REQUEST_QUERIES, QueryBudgetExceeded, query_budget, reset_metrics
+from .middleware import SESSION_REFRESHED_AT_KEY, RequestMetricsMiddleware
+from .ratings import reconcile_ratings
+from .notifications import (
+    MAX_NOTIFICATIONS_PER_USER, READ_RETENTION_DAYS, mark_all_read, notification_feed, notify_many,
+    prune_notifications,
+)
+from .models import (
+    AssistanceRequest, ChatSession, Contact, CreateTicket, FAQCategory, FAQItem, Job, Message,
+    Notification, Technician, TechnicianReview, TechnicianSearchDocument, TechnicianSpecialty,
+    UnreadMessageCounter, UserProfile,
+)
+from . import storage_clients
+from .realtime import chat_channel, get_broker
+from .tasks import send_email
+from .technician_search import search_technicians
+from .ticket_stats import customer_ticket_stats, technician_ticket_stats
+from .views import TECHNICIAN_DIRECTORY_ORDERINGS, generate_bot_response
+
+class FAQIndexTests(TestCase):
+    """Tests for the in-memory FAQ bot index"""
+
+    def setUp(self):
+        invalidate_faq_index()
+        self.category = FAQCategory.objects.create(name='Network', slug='network')
+        self.wifi = FAQItem.objects.create(
+            category=self.category,
+            question='Why is my WiFi connection slow?',
+            short_question='Slow WiFi',
+            answer='Restart your router and move closer to the access point.',
+            short_answer='Restart router.',
+            keywords='wifi, internet, router',
+        )
+        self.printer = FAQItem.objects.create(
+            category=self.category,
+            question='How do I connect a printer?',
+            short_question='Connect Printer',
+            answer='Install the printer driver from the manufacturer website.',
+            short_answer='Install the driver.',
+            keywords='printer, driver',
+        )
+
+    def test_keyword_match_ranks_first(self):
+        results = get_faq_index().search('my wifi keeps dropping')
+        self.assertEqual(results, [self.wifi])
+
+    def test_short_question_phrase_match(self):
+        results = get_faq_index().search('connect printer')
+        self.assertEqual(results[0], self.printer)
+
+    def test_no_match_returns_empty(self):
+        self.assertEqual(get_faq_index().search('hello there'), [])
+
+    def test_bot_replies_make_no_queries_once_warm(self):
+        for message in ('hello', 'wifi', 'thanks', 'view_faqs', 'something else'):
+            generate_bot_response(message)
+        with self.assertNumQueries(0):
+            for message in ('hello', 'wifi', 'thanks', 'view_faqs', 'something else'):
+                generate_bot_response(message)
+
+    def test_index_rebuilt_after_faq_change(self):
+        self.assertEqual(get_faq_index().search('bluetooth'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.printer.keywords = 'printer, driver, bluetooth'
+            self.printer.save()
+        self.assertEqual(get_faq_index().search('bluetooth'), [self.printer])
+
+
+class ChatEventTests(TestCase):
+    """Tests for pushing message changes to open chats"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('customer', password='pass12345')
+        self.technician = User.objects.create_user('tech', password='pass12345')
+        self.chat = ChatSession.objects.create(user=self.user, technician=self.technician)
+        self.loop = asyncio.new_event_loop()
+        self.subscription = get_broker().subscribe(chat_channel(self.chat.id), loop=self.loop)
+
+    def tearDown(self):
+        self.subscription.close()
+        self.loop.close()
+
+    def next_event(self):
+        return self.loop.run_until_complete(asyncio.wait_for(self.subscription.get(), 1))
+
+    def test_created_edited_and_deleted_messages_are_pushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            message = Message.objects.create(
+                chat_session=self.chat, sender=self.user, receiver=self.technician,
+                content='My laptop will not boot', message_type='user_to_tech',
+            )
+        self.assertEqual(self.next_event()['type'], 'message.created')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            message.content = 'My laptop will not boot past the logo'
+            message.save()
+        event = self.next_event()
+        self.assertEqual(event['type'], 'message.updated')
+        self.assertEqual(event['message']['content'], 'My laptop will not boot past the logo')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            message.soft_delete(self.user)
+        event = self.next_event()
+        self.assertEqual(event['type'], 'message.deleted')
+        self.assertEqual(event['message']['content'], '')
+
+    def test_stream_requires_asgi(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('chat_events', args=[self.chat.id]))
+        self.assertEqual(response.status_code, 204)
+
+    def test_stream_rejects_other_users(self):
+        outsider = User.objects.create_user('outsider', password='pass12345')
+        self.client.force_login(outsider)
+        response = self.client.get(reverse('chat_events', args=[self.chat.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ChatMessagesAPITests(TestCase):
+    """Tests for the cursor-based chat messages endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('customer', password='pass12345')
+        self.technician = User.objects.create_user('tech', password='pass12345')
+        self.chat = ChatSession.objects.create(user=self.user, technician=self.technician)
+        self.messages = [
+            Message.objects.create(
+                chat_session=self.chat, sender=self.user, receiver=self.technician,
+                content=f'Message {i}', message_type='user_to_tech',
+            )
+            for i in range(5)
+        ]
+        self.url = reverse('get_chat_messages', args=[self.chat.id])
+        self.client.force_login(self.user)
+
+    def message_ids(self, response):
+        return [message['id'] for message in response.json()['messages']]
+
+    def test_after_id_returns_only_newer_messages(self):
+        response = self.client.get(self.url, {'after_id': self.messages[2].id})
+        self.assertEqual(self.message_ids(response), [m.id for m in self.messages[3:]])
+        self.assertFalse(response.json()['has_more'])
+
+    def test_before_id_pages_backwards(self):
+        response = self.client.get(self.url, {'before_id': self.messages[4].id, 'limit': 2})
+        self.assertEqual(self.message_ids(response), [m.id for m in self.messages[2:4]])
+        self.assertTrue(response.json()['has_more'])
+        self.assertEqual(response.json()['next_before_id'], self.messages[2].id)
+
+    def test_latest_page_by_default(self):
+        response = self.client.get(self.url, {'limit': 3})
+        self.assertEqual(self.message_ids(response), [m.id for m in self.messages[2:]])
+
+    def test_cursors_follow_created_at_order(self):
+        # Backdate the newest message so created_at and id order disagree
+        backdated = self.messages[4]
+        Message.objects.filter(id=backdated.id).update(created_at=self.messages[0].created_at - timedelta(minutes=1))
+        expected = [backdated.id] + [m.id for m in self.messages[:4]]
+
+        response = self.client.get(self.url, {'after_id': backdated.id, 'limit': 2})
+        forwards = self.message_ids(response)
+        while response.json()['has_more']:
+            response = self.client.get(self.url, {'after_id': response.json()['next_after_id'], 'limit': 2})
+            forwards += self.message_ids(response)
+        self.assertEqual(forwards, expected[1:])
+
+        response = self.client.get(self.url, {'limit': 2})
+        backwards = self.message_ids(response)
+        while response.json()['has_more']:
+            response = self.client.get(self.url, {'before_id': response.json()['next_before_id'], 'limit': 2})
+            backwards = self.message_ids(response) + backwards
+        self.assertEqual(backwards, expected)
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.client.get(self.url)  # the first request stamps the session
+        with CaptureQueriesContext(connection) as short_history:
+            self.client.get(self.url)
+        for i in range(20):
+            Message.objects.create(
+                chat_session=self.chat, sender=self.technician, receiver=self.user,
+                content=f'Reply {i}', message_type='tech_to_user',
+            )
+        with self.assertNumQueries(len(short_history)):
+            self.client.get(self.url)
+
+
+class UnreadCounterTests(TestCase):
+    """Tests for the denormalized unread message counters"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('customer', password='pass12345')
+        self.technician = User.objects.create_user('tech', password='pass12345')
+        self.chat = ChatSession.objects.create(user=self.user, technician=self.technician)
+
+    def send(self, sender, receiver):
+        return Message.objects.create(
+            chat_session=self.chat, sender=sender, receiver=receiver,
+            content='Hello', message_type='user_to_tech',
+        )
+
+    def test_counters_follow_new_and_read_messages(self):
+        self.send(self.user, self.technician)
+        self.send(self.user, self.technician)
+        self.send(self.technician, self.user)
+        self.chat.refresh_from_db()
+        self.assertEqual(self.chat.technician_unread_count, 2)
+        self.assertEqual(self.chat.user_unread_count, 1)
+        self.assertEqual(UnreadMessageCounter.get_count(self.technician), 2)
+
+        self.assertEqual(self.chat.mark_messages_as_read(self.technician), 2)
+        self.chat.refresh_from_db()
+        self.assertEqual(self.chat.technician_unread_count, 0)
+        self.assertEqual(UnreadMessageCounter.get_count(self.technician), 0)
+        self.assertEqual(UnreadMessageCounter.get_count(self.user), 1)
+
+    def test_badge_endpoint_reads_counter(self):
+        self.send(self.user, self.technician)
+        self.client.force_login(self.technician)
+        response = self.client.get(reverse('get_unread_count'))
+        self.assertEqual(response.json()['unread_count'], 1)
+
+    def test_recount_matches_messages(self):
+        self.send(self.user, self.technician)
+        UnreadMessageCounter.objects.all().delete()
+        ChatSession.objects.update(technician_unread_count=5)
+        UnreadMessageCounter.recount()
+        self.chat.refresh_from_db()
+        self.assertEqual(self.chat.technician_unread_count, 1)
+        self.assertEqual(UnreadMessageCounter.get_count(self.technician), 1)
+
+
+class TechnicianInboxTests(TestCase):
+    """Tests for the technician messages inbox"""
+
+    def setUp(self):
+        self.technician = User.objects.create_user('tech', password='pass12345')
+        UserProfile.objects.create(user=self.technician, is_technician=True)
+        self.client.force_login(self.technician)
+
+    def add_chat(self, number):
+        customer = User.objects.create_user(f'customer{number}', password='pass12345')
+        chat = ChatSession.objects.create(user=customer, technician=self.technician)
+        Message.objects.create(
+            chat_session=chat, sender=customer, receiver=self.technician,
+            content=f'Help with issue {number}', message_type='user_to_tech',
+        )
+        return chat
+
+    def test_inbox_rows_carry_preview_and_unread_count(self):
+        chat = self.add_chat(1)
+        response = self.client.get(reverse('technician_messages'))
+        row = response.context['customer_chats'][0]
+        self.assertEqual(row['id'], chat.id)
+        self.assertEqual(row['unread_count'], 1)
+        self.assertEqual(row['last_message_preview'], 'Help with issue 1')
+
+    def test_query_count_does_not_grow_with_chats(self):
+        self.add_chat(0)
+        self.client.get(reverse('technician_messages'))  # the first request stamps the session
+        with CaptureQueriesContext(connection) as one_chat:
+            self.client.get(reverse('technician_messages'))
+        for number in range(1, 30):
+            self.add_chat(number)
+        with self.assertNumQueries(len(one_chat)):
+            response = self.client.get(reverse('technician_messages'))
+        self.assertEqual(len(response.context['customer_chats']), 25)
+
+
+class TicketChatTests(TestCase):
+    """Tests for opening and reconciling ticket chats"""
+
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', password='pass12345')
+        self.technician_user = User.objects.create_user('tech', password='pass12345')
+        profile = UserProfile.objects.create(user=self.technician_user, is_technician=True)
+        self.technician = profile.technician_profile
+
+    def request_assistance(self, title):
+        ticket = CreateTicket.objects.create(
+            user=self.customer, title=title, description='It broke', category='hardware'
+        )
+        return AssistanceRequest.objects.create(
+            user=self.customer, technician=self.technician, ticket=ticket,
+            title=title, description='It broke',
+        )
+
+    def test_assistance_request_opens_chat(self):
+        assistance_request = self.request_assistance('Laptop')
+        chat = ChatSession.objects.get(ticket=assistance_request.ticket)
+        self.assertEqual(chat.technician, self.technician_user)
+        self.assertEqual(chat.messages.count(), 1)
+        self.assertEqual(UnreadMessageCounter.get_count(self.technician_user), 1)
+
+    def test_reconcile_opens_missing_chats_once(self):
+        for title in ('Laptop', 'Printer', 'Router'):
+            self.request_assistance(title)
+        ChatSession.objects.all().delete()
+
+        created = reconcile_ticket_chats(batch_size=2)
+        self.assertEqual(len(created), 3)
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(UnreadMessageCounter.get_count(self.technician_user), 3)
+        self.assertEqual(reconcile_ticket_chats(), [])
+
+    def test_inbox_page_does_not_open_chats(self):
+        self.request_assistance('Laptop')
+        ChatSession.objects.all().delete()
+        self.client.force_login(self.technician_user)
+        self.client.get(reverse('technician_messages'))
+        self.assertFalse(ChatSession.objects.exists())
+
+
+class CachingTests(TestCase):
+    """Tests for namespaced, versioned page data caching"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('customer', password='pass12345')
+        self.client.force_login(self.user)
+        self.category = FAQCategory.objects.create(name='Network', slug='network')
+        self.faq = FAQItem.objects.create(
+            category=self.category,
+            question='Why is my WiFi connection slow?',
+            short_question='Slow WiFi',
+            answer='Restart your router.',
+            short_answer='Restart router.',
+        )
+
+    def test_bump_invalidates_cached_values(self):
+        calls = []
+
+        @cached('example')
+        def build(value):
+            calls.append(value)
+            return value * 2
+
+        self.assertEqual(build(2), 4)
+        self.assertEqual(build(2), 4)
+        self.assertEqual(calls, [2])
+        bump('example')
+        build(2)
+        self.assertEqual(calls, [2, 2])
+
+    def test_help_center_served_from_cache_until_faq_changes(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(reverse('help_center'))
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(reverse('help_center'))
+        self.assertLess(len(warm), len(cold))
+        self.assertContains(response, 'Why is my WiFi connection slow?')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.faq.question = 'Why does my WiFi keep dropping?'
+            self.faq.save()
+        response = self.client.get(reverse('help_center'))
+        self.assertContains(response, 'Why does my WiFi keep dropping?')
+
+    def test_dashboard_refreshes_after_new_ticket(self):
+        UserProfile.objects.create(user=self.user)
+        self.client.get(reverse('user_dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            CreateTicket.objects.create(
+                user=self.user, title='Printer jam', description='Paper stuck', category='hardware'
+            )
+        response = self.client.get(reverse('user_dashboard'))
+        self.assertEqual(response.context['total_tickets_created'], 1)
+
+    def test_login_keeps_technicians_cache(self):
+        UserProfile.objects.create(user=self.user)
+        version = get_version(TECHNICIANS)
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(username='customer', password='pass12345'))
+        self.assertEqual(get_version(TECHNICIANS), version)
+        self.assertFalse([q for q in queries.captured_queries if 'UPDATE "accounts_userprofile"' in q['sql']])
+
+
+class SessionRefreshTests(TestCase):
+    """Tests for refreshing sessions only when they near expiry"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('customer', password='pass12345')
+        self.client.force_login(self.user)
+        self.url = reverse('get_unread_count')
+
+    def session_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        return [
+            query for query in queries.captured_queries
+            if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')
+        ]
+
+    def test_fresh_session_is_not_rewritten(self):
+        self.session_writes()  # stamps the session created by force_login
+        self.assertEqual(self.session_writes(), [])
+        self.assertEqual(self.session_writes(), [])
+
+    def test_session_near_expiry_is_extended(self):
+        session = self.client.session
+        session[SESSION_REFRESHED_AT_KEY] = int(time.time()) - settings.SESSION_COOKIE_AGE + 60
+        session.save()
+        self.assertTrue(self.session_writes())
+        self.assertEqual(self.session_writes(), [])
+
+
+class TechnicianSearchTests(TestCase):
+    """Tests for the technician directory search documents"""
+
+    def setUp(self):
+        cache.clear()
+        self.network = TechnicianSpecialty.objects.create(name='Networking')
+        self.printers = TechnicianSpecialty.objects.create(name='Printers')
+        self.jane = self.create_technician('jdoe', 'Jane', 'Doe', 'Fixes office routers')
+        self.jane.specialties.add(self.network)
+        self.bob = self.create_technician('bsmith', 'Bob', 'Smith', 'Laptop repairs')
+        self.bob.specialties.add(self.printers)
+
+    def create_technician(self, username, first_name, last_name, bio):
+        user = User.objects.create_user(username, password='pass12345', first_name=first_name, last_name=last_name)
+        profile = UserProfile.objects.create(user=user, is_technician=True)
+        technician = profile.technician_profile
+        technician.bio = bio
+        technician.save()
+        return technician
+
+    def search(self, query):
+        return set(search_technicians(Technician.objects.all(), query))
+
+    def test_matches_names_specialties_and_bio(self):
+        self.assertEqual(self.search('jane'), {self.jane})
+        self.assertEqual(self.search('network'), {self.jane})
+        self.assertEqual(self.search('laptop'), {self.bob})
+        self.assertEqual(self.search('jane printers'), set())
+        self.assertEqual(self.search(''), {self.jane, self.bob})
+
+    def test_documents_follow_source_changes(self):
+        self.bob.specialties.add(self.network)
+        self.assertEqual(self.search('networking'), {self.jane, self.bob})
+
+        self.network.name = 'Wireless'
+        self.network.save()
+        self.assertEqual(self.search('wireless'), {self.jane, self.bob})
+
+        user = self.jane.user_profile.user
+        user.first_name = 'Janet'
+        user.save()
+        self.assertEqual(self.search('janet'), {self.jane})
+
+    def test_login_leaves_documents_untouched(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(username='jdoe', password='pass12345'))
+        writes = [
+            query for query in queries.captured_queries
+            if 'technician_search_documents' in query['sql'] and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(writes, [])
+
+    def test_directory_uses_search(self):
+        user = User.objects.create_user('customer', password='pass12345')
+        self.client.force_login(user)
+        response = self.client.get(reverse('technician_directory'), {'search': 'printers'})
+        rows = response.context['technicians']
+        self.assertEqual([row['id'] for row in rows], [self.bob.id])
+        self.assertEqual(rows[0]['specialties'], ['Printers'])
+
+
+class TechnicianDirectoryPaginationTests(TestCase):
+    """Tests for keyset pagination of the technician directory"""
+
+    def setUp(self):
+        cache.clear()
+        # Ties and NULL rates on purpose, so the id tiebreak is exercised
+        for number, (name, rating, rate) in enumerate([
+            ('Ann', 4.5, '30.00'), ('bob', 4.5, None), ('Cid', 3.0, '30.00'),
+            ('Dee', 5.0, None), ('Eve', 4.5, '12.50'),
+        ]):
+            user = User.objects.create_user(f'tech{number}', password='pass12345', first_name=name)
+            technician = UserProfile.objects.create(user=user, is_technician=True).technician_profile
+            technician.average_rating = rating
+            technician.hourly_rate = rate
+            technician.experience_years = number % 2
+            technician.save()
+        self.customer = User.objects.create_user('customer', password='pass12345')
+
+    def walk(self, ordering, limit=2):
+        ids, cursor = [], None
+        while True:
+            page, cursor = keyset_page(Technician.objects.all(), ordering, cursor, limit)
+            ids.extend(technician.id for technician in page)
+            if cursor is None:
+                return ids
+
+    def test_pages_match_a_full_sort(self):
+        technicians = list(Technician.objects.select_related('search_document'))
+        expected = {
+            'rating': sorted(technicians, key=lambda t: (-t.average_rating, t.id)),
+            'name': sorted(technicians, key=lambda t: (t.search_document.sort_name, t.id)),
+            'experience': sorted(technicians, key=lambda t: (-t.experience_years, t.id)),
+            'rate': sorted(technicians, key=lambda t: (t.hourly_rate is None, t.hourly_rate or 0, t.id)),
+        }
+        for sort_by, technicians in expected.items():
+            with self.subTest(sort_by=sort_by):
+                self.assertEqual(
+                    self.walk(TECHNICIAN_DIRECTORY_ORDERINGS[sort_by]),
+                    [technician.id for technician in technicians],
+                )
+
+    def test_rejects_malformed_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            keyset_page(Technician.objects.all(), TECHNICIAN_DIRECTORY_ORDERINGS['rating'], 'not-a-cursor')
+
+    def test_rejects_cursor_with_wrongly_typed_values(self):
+        cursor = encode_cursor(['x', 'y'])
+        with self.assertRaises(InvalidCursor):
+            notification_feed(self.customer.id, cursor)
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse('notifications_api'), {'cursor': cursor}).status_code, 400)
+
+    @mock.patch('accounts.views.TECHNICIAN_DIRECTORY_PAGE_SIZE', 2)
+    def test_directory_api_scrolls_through_every_technician(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('technician_directory'), {'sort': 'name'})
+        self.assertEqual(response.context['summary']['total'], 5)
+        names = [row['first_name'] for row in response.context['technicians']]
+        cursor = response.context['next_cursor']
+        while cursor:
+            data = self.client.get(
+                reverse('technician_directory_api'), {'sort': 'name', 'cursor': cursor}
+            ).json()
+            self.assertIn('request-assistance-btn', data['html'])
+            names.extend(row['first_name'] for row in data['technicians'])
+            cursor = data['next_cursor']
+        self.assertEqual(names, ['Ann', 'bob', 'Cid', 'Dee', 'Eve'])
+
+        response = self.client.get(reverse('technician_directory_api'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TicketStatsTests(TestCase):
+    """Tests for the aggregated, cached ticket counters"""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user('customer', password='pass12345')
+        UserProfile.objects.create(user=self.customer)
+        self.tech_user = User.objects.create_user('tech', password='pass12345')
+        self.technician = UserProfile.objects.create(user=self.tech_user, is_technician=True).technician_profile
+        self.tickets = {}
+        for status in ['open', 'open', 'in_progress', 'resolved']:
+            ticket = CreateTicket.objects.create(
+                user=self.customer, title=status, description='It broke', category='hardware',
+                status=status, technician=self.tech_user,
+            )
+            AssistanceRequest.objects.create(
+                user=self.customer, technician=self.technician, ticket=ticket,
+                title=status, description='It broke',
+            )
+            self.tickets[status] = ticket
+        self.start_of_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    def test_counters_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            stats = technician_ticket_stats.uncached(self.tech_user.id)
+        self.assertEqual(stats, {
+            'total_tickets': 4, 'open_tickets': 2, 'in_progress_tickets': 1, 'resolved_tickets': 1,
+        })
+        with self.assertNumQueries(1):
+            stats = customer_ticket_stats.uncached(self.customer.id, self.start_of_month)
+        self.assertEqual(stats, {
+            'total_tickets_created': 4, 'open_tickets_count': 3, 'resolved_this_month_count': 1,
+        })
+
+    def test_status_transition_invalidates_technician_stats(self):
+        technician_ticket_stats(self.tech_user.id)
+        with self.assertNumQueries(0):
+            technician_ticket_stats(self.tech_user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = self.tickets['in_progress']
+            ticket.status = 'resolved'
+            ticket.save()
+        stats = technician_ticket_stats(self.tech_user.id)
+        self.assertEqual(stats['in_progress_tickets'], 0)
+        self.assertEqual(stats['resolved_tickets'], 2)
+
+        self.client.force_login(self.tech_user)
+        response = self.client.get(reverse('technician_tickets'))
+        self.assertEqual(response.context['resolved_tickets'], 2)
+
+
+class TicketAssignmentTests(TestCase):
+    """Tests for keeping CreateTicket.technician the authoritative assignment"""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user('customer', password='pass12345')
+        UserProfile.objects.create(user=self.customer)
+        self.first = self.create_technician('first')
+        self.second = self.create_technician('second')
+        self.client.force_login(self.customer)
+
+    def create_technician(self, username):
+        user = User.objects.create_user(username, password='pass12345')
+        return UserProfile.objects.create(user=user, is_technician=True).technician_profile
+
+    def post_json(self, name, data):
+        return self.client.post(reverse(name), data, content_type='application/json').json()
+
+    def test_every_assignment_path_sets_the_technician(self):
+        data = self.post_json('request_assistance', {
+            'technician_id': self.first.id, 'title': 'No sound', 'description': 'Speakers are silent',
+        })
+        ticket = CreateTicket.objects.get(pk=data['ticket_id'])
+        self.assertEqual(ticket.technician, self.first.user)
+        self.assertEqual(technician_ticket_stats(self.first.user.id)['total_tickets'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_json('assign_ticket_to_technician', {
+                'technician_id': self.second.id, 'ticket_id': ticket.id,
+            })
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.technician, self.second.user)
+        self.assertEqual(technician_ticket_stats(self.first.user.id)['total_tickets'], 0)
+
+    def test_pending_request_does_not_take_an_accepted_ticket(self):
+        data = self.post_json('request_assistance', {
+            'technician_id': self.first.id, 'title': 'No sound', 'description': 'Speakers are silent',
+        })
+        ticket = CreateTicket.objects.get(pk=data['ticket_id'])
+        AssistanceRequest.objects.filter(ticket=ticket).update(status='accepted')
+
+        self.post_json('assign_ticket_to_technician', {'technician_id': self.second.id, 'ticket_id': ticket.id})
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.technician, self.first.user)
+        self.assertTrue(AssistanceRequest.objects.filter(ticket=ticket, technician=self.second, status='pending').exists())
+
+        # The review goes to the assigned technician, not to whichever request comes first
+        AssistanceRequest.objects.filter(ticket=ticket, technician=self.first).delete()
+        CreateTicket.objects.filter(pk=ticket.pk).update(status='resolved')
+        self.client.post(reverse('submit_ticket_review', args=[ticket.id]), {'rating': 5})
+        self.assertEqual(TechnicianReview.objects.get(ticket=ticket).technician, self.first)
+        response = self.client.get(reverse('ticket_details', args=[ticket.id]))
+        self.assertEqual(response.context['assigned_technician'], self.first)
+
+
+class TechnicianTicketQueryTests(TestCase):
+    """Tests that the technician ticket pages stay at a fixed query count"""
+
+    def setUp(self):
+        cache.clear()
+        self.tech_user = User.objects.create_user('tech', password='pass12345')
+        self.technician = UserProfile.objects.create(user=self.tech_user, is_technician=True).technician_profile
+        self.add_tickets(2)
+        self.client.force_login(self.tech_user)
+        # Stamps the session, which writes once
+        self.client.get(reverse('technician_tickets'))
+
+    def add_tickets(self, count):
+        for number in range(count):
+            customer = User.objects.create_user(
+                f'customer{CreateTicket.objects.count()}', password='pass12345', first_name='Pat', last_name='Lee'
+            )
+            UserProfile.objects.create(user=customer)
+            ticket = CreateTicket.objects.create(
+                user=customer, title='Broken screen', description='Cracked', category='hardware',
+                status='resolved', technician=self.tech_user,
+            )
+            if number % 2:
+                TechnicianReview.objects.create(
+                    technician=self.technician, user=customer, ticket=ticket, rating=5
+                )
+
+    def get(self, name):
+        cache.clear()
+        return self.client.get(reverse(name))
+
+    def test_tickets_page_query_count_is_constant(self):
+        # session, user, ticket rows, ticket stats, sidebar profile
+        with self.assertNumQueries(5):
+            self.get('technician_tickets')
+        self.add_tickets(6)
+        with self.assertNumQueries(5):
+            response = self.get('technician_tickets')
+        rows = response.context['ticket_data']
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(sum(row['has_review'] for row in rows), 4)
+        self.assertEqual(rows[0]['customer']['full_name'], 'Pat Lee')
+
+    def test_dashboard_query_count_is_constant(self):
+        self.get('technician_dashboard')
+        with CaptureQueriesContext(connection) as few:
+            self.get('technician_dashboard')
+        self.add_tickets(6)
+        with self.assertNumQueries(len(few)):
+            response = self.get('technician_dashboard')
+        self.assertEqual(len(response.context['ticket_data']), 5)
+
+
+class OpenAssistanceRequestTests(TestCase):
+    """Tests for the transactional assistance request pipeline"""
+
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', password='pass12345')
+        UserProfile.objects.create(user=self.customer)
+        tech_user = User.objects.create_user('tech', password='pass12345', email='tech@example.com')
+        self.technician = UserProfile.objects.create(user=tech_user, is_technician=True).technician_profile
+
+    def test_opens_everything_and_queues_the_notification(self):
+        ticket, assistance_request = open_assistance_request(
+            self.customer, self.technician, 'No sound', 'Speakers are silent'
+        )
+        self.assertFalse(Notification.objects.exists())
+
+        self.assertEqual(ticket.technician, self.technician.user)
+        self.assertEqual(assistance_request.ticket, ticket)
+        self.assertTrue(ChatSession.objects.filter(ticket=ticket, technician=self.technician.user).exists())
+        self.assertTrue(Contact.objects.filter(user=self.customer, contact_user=self.technician.user).exists())
+
+        # The notification job queues the email as a job of its own
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(Notification.objects.filter(recipient=self.technician.user, ticket=ticket).count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failure_leaves_nothing_behind(self):
+        with mock.patch.object(Contact.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                open_assistance_request(self.customer, self.technician, 'No sound', 'Speakers are silent')
+        self.assertFalse(CreateTicket.objects.exists())
+        self.assertFalse(AssistanceRequest.objects.exists())
+        self.assertFalse(ChatSession.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept a message and keep it on the server"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.reply('220 localhost test sink')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'DATA':
+                self.reply('354 end with <CRLF>.<CRLF>')
+                lines = []
+                for data in iter(self.rfile.readline, b'.\r\n'):
+                    lines.append(data.decode())
+                self.server.messages.append(''.join(lines))
+                self.reply('250 queued')
+            elif command == 'EHLO':
+                self.reply('250 localhost')
+            else:
+                self.reply('250 ok')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """A local SMTP server for tests; messages collects what it received"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.messages = []
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+@task(name='tests.flaky', max_attempts=2)
+def flaky_task(fail):
+    if fail:
+        raise RuntimeError('try again later')
+
+
+class JobQueueTests(TestCase):
+    """Tests for the database-backed job queue"""
+
+    def test_failed_job_is_retried_with_backoff_then_given_up(self):
+        job = enqueue(flaky_task, fail=True)
+
+        self.assertEqual(run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIn('try again later', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=retry_delay(1) - 5))
+        # Not due yet
+        self.assertEqual(run_pending(), (0, 0))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_abandoned_running_job_is_picked_up_again(self):
+        job = enqueue(flaky_task, fail=False)
+        Job.objects.filter(pk=job.pk).update(
+            status='running', locked_at=timezone.now() - timedelta(seconds=JOB_LOCK_TIMEOUT + 1)
+        )
+        self.assertEqual(run_pending(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+
+    @override_settings(JOB_WORKER=True)
+    def test_password_reset_email_is_sent_by_the_worker(self):
+        User.objects.create_user('forgetful', email='forgetful@example.com', password='pass12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('password_reset'), {'email': 'forgetful@example.com'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['forgetful@example.com'])
+
+    @override_settings(JOB_WORKER=True)
+    def test_reset_job_does_not_store_the_token(self):
+        user = User.objects.create_user('forgetful', email='forgetful@example.com', password='pass12345')
+        self.client.post(reverse('password_reset'), {'email': 'forgetful@example.com'})
+        self.assertEqual(Job.objects.get().payload, {'user_id': user.pk, 'protocol': 'http', 'domain': 'testserver'})
+
+        self.assertEqual(run_pending(), (1, 0))
+        token = mail.outbox[0].body.rstrip('/').rsplit('/', 1)[-1]
+        self.assertTrue(default_token_generator.check_token(user, token))
+
+    def test_prune_deletes_old_finished_jobs(self):
+        done, failed, recent = (enqueue(flaky_task, fail=False) for _ in range(3))
+        Job.objects.filter(pk=done.pk).update(status='done', updated_at=timezone.now() - timedelta(days=2))
+        Job.objects.filter(pk=failed.pk).update(status='failed', updated_at=timezone.now() - timedelta(days=2))
+        Job.objects.filter(pk=recent.pk).update(status='done')
+
+        call_command('run_jobs', '--once', stdout=io.StringIO())
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {failed.pk, recent.pk})
+
+    @override_settings(JOB_WORKER=False)
+    def test_jobs_run_inline_without_a_worker(self):
+        User.objects.create_user('forgetful', email='forgetful@example.com', password='pass12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('password_reset'), {'email': 'forgetful@example.com'})
+        self.assertEqual(mail.outbox[0].to, ['forgetful@example.com'])
+        self.assertEqual(Job.objects.get().status, 'done')
+
+        # A failure is left for run_jobs to retry
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue(flaky_task, fail=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+
+    def test_email_is_retried_until_the_smtp_server_answers(self):
+        job = enqueue(send_email, subject='Hello', message='Queued', recipient_list=['someone@example.com'])
+
+        with SMTPSink() as sink:
+            port = sink.server_address[1]
+        # Nothing listens on the port any more
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=port, EMAIL_USE_TLS=False,
+                               EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_TIMEOUT=5):
+            self.assertEqual(run_pending(), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'pending')
+
+            with SMTPSink() as sink:
+                with override_settings(EMAIL_PORT=sink.server_address[1]):
+                    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+                    self.assertEqual(run_pending(), (1, 0))
+            self.assertEqual(len(sink.messages), 1)
+            self.assertIn('Subject: Hello', sink.messages[0])
+
+
+class NotificationTests(TestCase):
+    """Tests for the unified notification store"""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user('customer', password='pass12345')
+        UserProfile.objects.create(user=self.customer)
+        self.tech_user = User.objects.create_user('tech', password='pass12345')
+        UserProfile.objects.create(user=self.tech_user, is_technician=True)
+
+    def test_fan_out_is_one_insert(self):
+        with self.assertNumQueries(1):
+            notify_many([
+                {'recipient_id': self.customer.id, 'message': 'Ticket resolved'},
+                {'recipient_id': self.tech_user.id, 'message': 'You resolved a ticket'},
+            ])
+        self.assertEqual(Notification.objects.filter(recipient=self.tech_user).count(), 1)
+
+    def test_feed_pages_newest_first(self):
+        notify_many([{'recipient_id': self.tech_user.id, 'message': f'n{i}'} for i in range(5)])
+        notify_many([{'recipient_id': self.customer.id, 'message': 'not mine'}])
+
+        first, cursor = notification_feed(self.tech_user.id, limit=3)
+        second, end = notification_feed(self.tech_user.id, cursor=cursor, limit=3)
+        self.assertEqual([n.message for n in first + second], ['n4', 'n3', 'n2', 'n1', 'n0'])
+        self.assertIsNone(end)
+
+    def test_api_feed_and_mark_all_read(self):
+        notify_many([{'recipient_id': self.tech_user.id, 'message': f'n{i}'} for i in range(3)])
+        self.client.force_login(self.tech_user)
+
+        data = self.client.get(reverse('notifications_api'), {'unread': '1'}).json()
+        self.assertEqual(data['unread_count'], 3)
+        self.assertEqual(len(data['notifications']), 3)
+
+        self.assertEqual(self.client.post(reverse('mark_notifications_read')).json()['updated'], 3)
+        data = self.client.get(reverse('notifications_api'), {'unread': '1'}).json()
+        self.assertEqual((data['unread_count'], data['notifications']), (0, []))
+        self.assertEqual(self.client.get(reverse('notifications_api'), {'cursor': 'junk'}).status_code, 400)
+
+    def test_dashboard_sees_mark_all_read(self):
+        notify_many([{'recipient_id': self.customer.id, 'message': 'Ticket resolved'}])
+        self.client.force_login(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertContains(self.client.get(reverse('user_dashboard')), 'Ticket resolved')
+            mark_all_read(self.customer.id)
+        self.assertTrue(self.client.get(reverse('user_dashboard')).context['notifications'][0].is_read)
+
+    def test_prune_applies_retention_and_cap(self):
+        old = timezone.now() - timedelta(days=READ_RETENTION_DAYS + 1)
+        notify_many([
+            {'recipient_id': self.customer.id, 'message': 'old read', 'is_read': True},
+            {'recipient_id': self.customer.id, 'message': 'old unread'},
+        ])
+        Notification.objects.update(created_at=old)
+        notify_many([{'recipient_id': self.tech_user.id, 'message': f'n{i}'}
+                     for i in range(MAX_NOTIFICATIONS_PER_USER + 2)])
+
+        self.assertEqual(prune_notifications(), 3)
+        self.assertEqual(list(Notification.objects.filter(recipient=self.customer).values_list('message', flat=True)),
+                         ['old unread'])
+        kept = Notification.objects.filter(recipient=self.tech_user)
+        self.assertEqual(kept.count(), MAX_NOTIFICATIONS_PER_USER)
+        self.assertFalse(kept.filter(message__in=['n0', 'n1']).exists())
+
+
+def make_upload(name='photo.png', size=(1600, 1200), image_format='PNG', **save_options):
+    buffer = io.BytesIO()
+    mode = 'RGBA' if image_format == 'PNG' else 'RGB'
+    Image.new(mode, size, 'red').save(buffer, image_format, **save_options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ProfilePictureTests(TestCase):
+    """Tests for profile picture processing and thumbnails"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user('pictured', password='pass12345')
+        self.profile = UserProfile.objects.create(user=self.user, is_technician=True)
+
+    def test_upload_is_reencoded_with_thumbnails(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'SecretCam'
+        save_profile_picture(self.profile, make_upload('photo.jpg', image_format='JPEG', exif=exif.tobytes()))
+
+        self.profile.refresh_from_db()
+        with Image.open(self.profile.profile_picture.path) as original:
+            self.assertEqual(original.format, 'JPEG')
+            self.assertEqual(max(original.size), MAX_DIMENSION)
+            self.assertNotIn('exif', original.info)
+        self.assertEqual(sorted(map(int, self.profile.profile_picture_variants)), list(PROFILE_PICTURE_SIZES))
+        for size, name in self.profile.profile_picture_variants.items():
+            with self.profile.profile_picture.storage.open(name) as variant, Image.open(variant) as thumbnail:
+                self.assertEqual(thumbnail.size, (int(size), int(size)))
+
+        # Cards get the 128 px thumbnail, not the original
+        self.assertEqual(
+            self.profile.technician_profile.profile_picture_url,
+            self.profile.profile_picture.storage.url(self.profile.profile_picture_variants['128'])
+        )
+
+    def test_validation_decodes_instead_of_trusting_the_name(self):
+        with self.assertRaises(InvalidImage):
+            save_profile_picture(self.profile, SimpleUploadedFile('evil.png', b'<?php echo 1; ?>'))
+        # A real image with a misleading name is fine
+        save_profile_picture(self.profile, make_upload('picture.txt', size=(80, 60)))
+        self.assertTrue(self.profile.profile_picture.name.endswith('.jpg'))
+
+    def test_replacing_a_picture_deletes_the_old_files(self):
+        save_profile_picture(self.profile, make_upload(size=(300, 300)))
+        old_names = [self.profile.profile_picture.name, *self.profile.profile_picture_variants.values()]
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('user_profile'), {'profile_picture': make_upload(size=(300, 300))})
+        self.assertEqual(response.status_code, 302)
+
+        storage = self.profile.profile_picture.storage
+        self.assertFalse(any(storage.exists(name) for name in old_names))
+        self.profile.refresh_from_db()
+        self.assertTrue(storage.exists(self.profile.profile_picture.name))
+
+    def test_failed_settings_save_keeps_the_old_files(self):
+        save_profile_picture(self.profile, make_upload(size=(300, 300)))
+        old_names = [self.profile.profile_picture.name, *self.profile.profile_picture_variants.values()]
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(UserProfile, 'save', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError), self.assertLogs('django.request', 'ERROR'):
+                self.client.post(reverse('technician_settings'), {
+                    'tab': 'profile', 'profile_picture': make_upload(size=(300, 300)),
+                })
+
+        storage = self.profile.profile_picture.storage
+        self.assertTrue(all(storage.exists(name) for name in old_names))
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.profile_picture.name, old_names[0])
+
+
+class StorageClientTests(TestCase):
+    """Tests for the shared S3 client registry"""
+
+    def setUp(self):
+        storage_clients.reset_clients()
+        self.addCleanup(storage_clients.reset_clients)
+        patcher = mock.patch.object(storage_clients, '_build_s3_client', side_effect=lambda: object())
+        self.build = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_is_built_once_and_shared_across_threads(self):
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(storage_clients.get_s3_client()))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.build.call_count, 1)
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+    def test_forked_worker_builds_its_own_client(self):
+        storage_clients.get_s3_client()
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Child: report whether the parent's client was dropped
+            os.write(write_end, b'1' if not storage_clients._clients else b'0')
+            os._exit(0)
+        os.close(write_end)
+        os.waitpid(pid, 0)
+        self.assertEqual(os.read(read_end, 1), b'1')
+        os.close(read_end)
+        self.assertTrue(storage_clients._clients)
+
+    def test_changing_aws_settings_drops_the_client(self):
+        first = storage_clients.get_s3_client()
+        with override_settings(AWS_S3_ENDPOINT_URL='http://127.0.0.1:9000'):
+            self.assertIsNot(storage_clients.get_s3_client(), first)
+
+
+class S3SinkHandler(http.server.BaseHTTPRequestHandler):
+    """Just enough of the S3 REST API (path-style) for the storage views"""
+    protocol_version = 'HTTP/1.1'  # keep-alive, so pooled connections are reused
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        self.server.authorizations.append(self.headers.get('Authorization', ''))
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        bucket, _, key = unquote(urlsplit(self.path).path).lstrip('/').partition('/')
+        if not key:
+            self.server.buckets.setdefault(bucket, {})
+        elif bucket in self.server.buckets:
+            self.server.buckets[bucket][key] = body
+        else:
+            return self.reply(404, b'<Error><Code>NoSuchBucket</Code></Error>')
+        self.reply(200)
+
+    def do_GET(self):
+        self.server.authorizations.append(self.headers.get('Authorization', ''))
+        bucket = unquote(urlsplit(self.path).path).strip('/')
+        if not bucket:
+            names = ''.join(f'<Bucket><Name>{name}</Name></Bucket>' for name in self.server.buckets)
+            return self.reply(200, f'<ListAllMyBucketsResult><Buckets>{names}</Buckets></ListAllMyBucketsResult>'.encode())
+        if bucket not in self.server.buckets:
+            return self.reply(404, b'<Error><Code>NoSuchBucket</Code></Error>')
+        keys = sorted(self.server.buckets[bucket])
+        contents = ''.join(f'<Contents><Key>{key}</Key></Contents>' for key in keys)
+        self.reply(200, (
+            f'<ListBucketResult><Name>{bucket}</Name><KeyCount>{len(keys)}</KeyCount>'
+            f'<IsTruncated>false</IsTruncated>{contents}</ListBucketResult>'
+        ).encode())
+
+
+class S3Sink(http.server.ThreadingHTTPServer):
+    """A local S3 endpoint for tests; buckets maps names to {key: body}"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), S3SinkHandler)
+        self.buckets = {}
+        self.connections = 0
+        self.authorizations = []
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class StorageBucketTests(TestCase):
+    """The storage views through the real shared client, against a local S3 endpoint"""
+
+    def setUp(self):
+        self.s3 = S3Sink().__enter__()
+        self.addCleanup(self.s3.__exit__, None, None, None)
+        aws_settings = override_settings(
+            AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='secret', AWS_S3_REGION_NAME='ap-south-1',
+            AWS_S3_ENDPOINT_URL=self.s3.url, AWS_S3_ADDRESSING_STYLE='path',
+            AWS_STORAGE_BUCKET_NAME='profile-pictures',
+        )
+        aws_settings.enable()
+        self.addCleanup(aws_settings.disable)
+        storage_clients.reset_clients()
+        self.addCleanup(storage_clients.reset_clients)
+        storage_clients.get_s3_client().create_bucket(
+            Bucket='profile-pictures', CreateBucketConfiguration={'LocationConstraint': 'ap-south-1'}
+        )
+
+        self.user = User.objects.create_user('admin', password='pass12345')
+        UserProfile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def test_list_bucket_files_uses_the_shared_client(self):
+        storage_clients.get_s3_client().put_object(Bucket='profile-pictures', Key='a.webp', Body=b'x')
+        with mock.patch.object(storage_clients, '_build_s3_client') as build:
+            for _ in range(3):
+                data = self.client.get(reverse('list_files')).json()
+        build.assert_not_called()
+        self.assertEqual(data['files'], ['a.webp'])
+        self.assertEqual(self.s3.buckets['profile-pictures'], {'a.webp': b'x'})
+        # Every request was signed with the configured key and region and
+        # went over the one pooled keep-alive connection
+        self.assertTrue(all(
+            'Credential=testing/' in auth and '/ap-south-1/s3/' in auth for auth in self.s3.authorizations
+        ))
+        self.assertEqual(self.s3.connections, 1)
+
+
+class LoggingTests(TestCase):
+    """Tests for the queued JSON logging pipeline"""
+
+    def make_record(self, level=logging.INFO, msg='Ticket %s resolved', args=(7,), **extra):
+        record = logging.LogRecord('accounts.views', level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter_includes_extra_fields_and_traceback(self):
+        try:
+            raise RuntimeError('boom')
+        except RuntimeError:
+            record = self.make_record(ticket_id=7)
+            record.exc_info = sys.exc_info()
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(entry['message'], 'Ticket 7 resolved')
+        self.assertEqual((entry['level'], entry['logger'], entry['ticket_id']), ('INFO', 'accounts.views', 7))
+        self.assertIn('RuntimeError: boom', entry['exc'])
+
+    def test_sample_filter_only_samples_debug(self):
+        sample = SampleFilter(rate=0)
+        self.assertFalse(sample.filter(self.make_record(logging.DEBUG)))
+        self.assertTrue(sample.filter(self.make_record(logging.INFO)))
+        self.assertTrue(SampleFilter(rate=1).filter(self.make_record(logging.DEBUG)))
+
+    def test_queue_handler_writes_in_the_background_and_drops_when_full(self):
+        stream = io.StringIO()
+        handler = QueueHandler(stream=stream, queue_size=2)
+        handler.setFormatter(JsonFormatter())
+        handler.listener.stop()  # hold records in the queue
+
+        for ticket_id in range(3):
+            handler.handle(self.make_record(args=(ticket_id,)))
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(stream.getvalue(), '')
+
+        handler.listener.start()
+        handler.listener.stop()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([line['message'] for line in lines], ['Ticket 0 resolved', 'Ticket 1 resolved'])
+
+
+class RequestMetricsTests(TestCase):
+    """Tests for the request metrics middleware and endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+        self.customer = User.objects.create_user('customer', password='pass12345')
+        UserProfile.objects.create(user=self.customer)
+
+    def test_requests_are_recorded_per_route(self):
+        self.client.force_login(self.customer)
+        self.client.get(reverse('my_tickets'))
+
+        (labels, counts, queries), = REQUEST_QUERIES.samples()
+        self.assertEqual(labels, {'route': 'my_tickets'})
+        self.assertEqual(sum(counts), 1)
+        self.assertGreater(queries, 0)
+
+    async def test_requests_are_recorded_under_asgi(self):
+        response = await self.async_client.get(reverse('login'))
+        self.assertEqual(response.status_code, 200)
+        routes = [labels['route'] for labels, _, _ in REQUEST_QUERIES.samples()]
+        self.assertEqual(routes, ['login'])
+
+    def test_metrics_endpoint_is_for_staff_or_token_holders(self):
+        self.client.force_login(self.customer)
+        self.client.get(reverse('my_tickets'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        with override_settings(METRICS_TOKEN='s3cret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE fixit_request_duration_seconds histogram', body)
+        self.assertIn('fixit_request_queries_count{route="my_tickets"} 1', body)
+        self.assertIn('fixit_request_template_seconds_bucket{route="my_tickets",le="+Inf"} 1', body)
+
+    def test_exceeding_a_budget_raises_in_raise_mode(self):
+        middleware = RequestMetricsMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/')
+        middleware.process_request(request)
+        middleware.process_view(request, query_budget(1)(lambda request: None), (), {})
+        User.objects.count()
+        User.objects.count()
+
+        with override_settings(QUERY_BUDGET_MODE='raise'), self.assertRaises(QueryBudgetExceeded):
+            middleware.process_response(request, HttpResponse())
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class QueryBudgetTests(TestCase):
+    """Ticket and inbox pages stay within their @query_budget as tickets pile up"""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user('customer', password='pass12345')
+        UserProfile.objects.create(user=self.customer)
+        self.tech_user = User.objects.create_user('tech', password='pass12345')
+        technician = UserProfile.objects.create(user=self.tech_user, is_technician=True).technician_profile
+        for index in range(15):
+            open_assistance_request(self.customer, technician, f'Issue {index}', 'Details')
+
+    def test_pages_stay_within_budget(self):
+        for user, name in ((self.tech_user, 'technician_tickets'), (self.tech_user, 'technician_messages'),
+                           (self.customer, 'my_tickets')):
+            with self.subTest(name):
+                self.client.force_login(user)
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+
+class SeedLoadDataTests(TestCase):
+    """seed_load_data is reproducible and leaves derived data consistent"""
+
+    def seed(self, **options):
+        call_command('seed_load_data', customers=20, technicians=5, tickets=300, stdout=io.StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(CreateTicket.objects.order_by('id').values_list(
+                'user__username', 'technician__username', 'title', 'status', 'priority'
+            )),
+            list(Message.objects.order_by('id').values_list('sender__username', 'content', 'is_read')),
+            list(TechnicianReview.objects.order_by('id').values_list('ticket__title', 'rating')),
+        )
+
+    def test_same_seed_gives_same_data(self):
+        self.seed(seed=7)
+        first = self.snapshot()
+        self.seed(seed=7, flush=True)
+        self.assertEqual(self.snapshot(), first)
+        self.seed(seed=8, flush=True)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_derived_data_matches_rows(self):
+        self.seed()
+        self.assertEqual(CreateTicket.objects.count(), 300)
+        self.assertEqual(TechnicianSearchDocument.objects.count(), 5)
+        self.assertEqual(reconcile_ratings(), [])
+
+        counters = dict(UnreadMessageCounter.objects.values_list('user_id', 'count'))
+        chats = list(ChatSession.objects.order_by('id').values_list('user_unread_count', 'technician_unread_count'))
+        self.assertTrue(counters)
+        UnreadMessageCounter.recount()
+        self.assertEqual(dict(UnreadMessageCounter.objects.values_list('user_id', 'count')), counters)
+        self.assertEqual(
+            list(ChatSession.objects.order_by('id').values_list('user_unread_count', 'technician_unread_count')),
+            chats,
+        )
+
+
+class BenchmarkTests(TestCase):
+    """run_benchmarks measures every critical page and compares with its baseline"""
+
+    def test_saves_and_checks_a_baseline(self):
+        call_command('seed_load_data', customers=10, technicians=3, tickets=60, stdout=io.StringIO())
+        path = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        options = {'requests': 2, 'warmup': 0, 'memory_requests': 1, 'baseline': path, 'stdout': io.StringIO()}
+
+        call_command('run_benchmarks', save=True, **options)
+        with open(path) as baseline_file:
+            results = json.load(baseline_file)['results']
+        self.assertEqual(set(results), {
+            'technician_directory', 'user_messages', 'technician_messages', 'chat_messages',
+            'unread_count', 'send_bot_message', 'user_dashboard', 'technician_dashboard',
+        })
+        self.assertTrue(all(metrics['queries'] > 0 for metrics in results.values()))
+
+        # The bot messages sent while benchmarking were rolled back
+        self.assertFalse(Message.objects.filter(message_type='user_to_bot').exists())
+        output = io.StringIO()
+        call_command('run_benchmarks', **{**options, 'stdout': output, 'threshold': 100})
+        self.assertIn('No regressions', output.getvalue())
+
+    def test_find_regressions(self):
+        baseline = {'page': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 4, 'peak_kib': 100.0}}
+        self.assertEqual(find_regressions(baseline, {
+            'page': {'p50_ms': 12.0, 'p95_ms': 30.0, 'queries': 5, 'peak_kib': 110.0},
+            'new_page': {'p50_ms': 1.0, 'p95_ms': 1.0, 'queries': 1, 'peak_kib': 1.0},
+        }, threshold=0.25), [('page', 'p95_ms', 20.0, 30.0), ('page', 'queries', 4, 5)])
+        # Sub-millisecond noise on a fast page is not a regression
+        self.assertEqual(find_regressions(
+            {'fast': {'p50_ms': 0.5}}, {'fast': {'p50_ms': 1.2}}, threshold=0.25
+        ), [])
+
+
+class RatingAggregateTests(TestCase):
+    """Technician rating sum, count, average and histogram follow the reviews"""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user('customer', password='pass12345')
+        UserProfile.objects.create(user=self.customer)
+        tech_user = User.objects.create_user('tech', password='pass12345')
+        self.technician = UserProfile.objects.create(user=tech_user, is_technician=True).technician_profile
+        self.ticket, _ = open_assistance_request(self.customer, self.technician, 'Broken fan', 'Noisy')
+        self.ticket.status = 'resolved'
+        self.ticket.save()
+
+    def aggregates(self):
+        self.technician.refresh_from_db()
+        return (self.technician.review_count, self.technician.rating_sum, self.technician.average_rating,
+                [row['count'] for row in self.technician.rating_histogram])
+
+    def test_submitting_and_editing_a_review(self):
+        self.client.force_login(self.customer)
+        url = reverse('submit_ticket_review', args=[self.ticket.id])
+        self.client.post(url, {'rating': '5', 'comment': 'Great'})
+        self.assertEqual(self.aggregates(), (1, 5, 5.0, [1, 0, 0, 0, 0]))
+
+        self.client.post(url, {'rating': '2', 'comment': 'Fan broke again'})
+        self.assertEqual(self.aggregates(), (1, 2, 2.0, [0, 0, 0, 1, 0]))
+        self.assertEqual(TechnicianReview.objects.count(), 1)
+
+    def test_stale_instances_do_not_lose_updates(self):
+        others = [User.objects.create_user(f'other{index}') for index in range(3)]
+        stale = [TechnicianReview(technician=self.technician, user=user, rating=4) for user in others]
+        for review in stale:
+            # Each save counts its rating with F(), whatever the technician object in memory says
+            review.save()
+        self.assertEqual(self.aggregates(), (3, 12, 4.0, [0, 3, 0, 0, 0]))
+
+        stale[0].delete()
+        self.assertEqual(self.aggregates(), (2, 8, 4.0, [0, 2, 0, 0, 0]))
+        stale[1].delete()
+        stale[2].delete()
+        self.assertEqual(self.aggregates(), (0, 0, 4.0, [0, 0, 0, 0, 0]))
+
+    def test_reconcile_fixes_drifted_aggregates(self):
+        TechnicianReview.objects.create(technician=self.technician, user=self.customer, ticket=self.ticket, rating=3)
+        self.assertEqual(reconcile_ratings(), [])
+
+        Technician.objects.filter(pk=self.technician.pk).update(review_count=7, average_rating=4.9, rating_5_count=6)
+        with self.assertLogs('accounts.ratings', 'WARNING'):
+            self.assertEqual(reconcile_ratings(), [self.technician.pk])
+        self.assertEqual(self.aggregates(), (1, 3, 3.0, [0, 0, 1, 0, 0]))
+
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('technician_detail', args=[self.technician.pk]))
+        self.assertContains(response, 'style="width: 100%"')
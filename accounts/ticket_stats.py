@@ -0,0 +1,65 @@
+# accounts/ticket_stats.py
+"""
+Ticket counters for the dashboards and the technician tickets page.
+
+Each set of counters is one aggregate query with a filtered Count per
+status, cached in the user's namespace. The customer's namespace is bumped
+by accounts.caching on any ticket change; the receivers below bump the
+technician's namespace when a ticket changes status or is (re)assigned.
+"""
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .caching import bump_on_commit, cached, user_namespace
+from .models import CreateTicket
+
+OPEN_STATUSES = ['open', 'in_progress']
+
+
+@cached(lambda user_id: user_namespace(user_id))
+def technician_ticket_stats(user_id):
+    """Total/open/in progress/resolved counts of a technician's tickets"""
+    return CreateTicket.objects.filter(technician_id=user_id).aggregate(
+        total_tickets=Count('id'),
+        open_tickets=Count('id', filter=Q(status='open')),
+        in_progress_tickets=Count('id', filter=Q(status='in_progress')),
+        resolved_tickets=Count('id', filter=Q(status='resolved')),
+    )
+
+
+@cached(lambda user_id, start_of_month: user_namespace(user_id))
+def customer_ticket_stats(user_id, start_of_month):
+    """Created/open/resolved-this-month counts of a customer's tickets"""
+    return CreateTicket.objects.filter(user_id=user_id).aggregate(
+        total_tickets_created=Count('id'),
+        open_tickets_count=Count('id', filter=Q(status__in=OPEN_STATUSES)),
+        resolved_this_month_count=Count(
+            'id', filter=Q(status='resolved', created_at__gte=start_of_month)
+        ),
+    )
+
+
+# Signals
+
+@receiver(post_init, sender=CreateTicket)
+def remember_ticket_assignment(sender, instance, **kwargs):
+    # __dict__ so deferred fields are not loaded just for this
+    instance._stats_state = (instance.__dict__.get('status'), instance.__dict__.get('technician_id'))
+
+
+@receiver(post_save, sender=CreateTicket)
+def invalidate_assignment_change(sender, instance, created, **kwargs):
+    previous_status, previous_technician_id = instance._stats_state
+    instance._stats_state = (instance.status, instance.technician_id)
+    if not created and (instance.status, instance.technician_id) == (previous_status, previous_technician_id):
+        return
+    user_ids = {instance.technician_id, None if created else previous_technician_id} - {None}
+    if user_ids:
+        bump_on_commit(*(user_namespace(user_id) for user_id in user_ids))
+
+
+@receiver(post_delete, sender=CreateTicket)
+def invalidate_deleted_ticket(sender, instance, **kwargs):
+    if instance.technician_id:
+        bump_on_commit(user_namespace(instance.technician_id))
@@ -30,6 +30,7 @@ path('password_reset/', views.password_reset_view, name='password_reset'), # The
     path('technician-dashboard/', views.technician_dashboard_view, name='technician_dashboard'),
     path('user-dashboard/', views.user_dashboard_view, name='user_dashboard'),
     path('technician_directory/', views.technician_directory_view, name='technician_directory'),
+    path('api/technicians/', views.technician_directory_api, name='technician_directory_api'),
     path('user_message/', views.user_messages_view, name='user_message'),
     path('debug/storage-detailed/', views.debug_storage_detailed, name='debug_storage_detailed'),
     path('debug/comprehensive-test/', views.comprehensive_storage_test, name='comprehensive_test'),
@@ -52,7 +53,11 @@ path('password_reset/', views.password_reset_view, name='password_reset'), # The
     path('user/chat/delete/', views.handle_delete_chat, name='user_delete_chat'),
     path('technician/chat/delete/', views.handle_delete_chat, name='technician_delete_chat'),
     path('api/chat/<int:chat_session_id>/messages/', views.get_chat_messages, name='get_chat_messages'),
+    path('api/chat/<int:chat_session_id>/events/', views.chat_events, name='chat_events'),
     path('api/messages/unread-count/', views.get_unread_count, name='get_unread_count'),
+    path('api/notifications/', views.notifications_api, name='notifications_api'),
+    path('api/notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('technician/debug/fix-chats/', views.debug_fix_chats, name='debug_fix_chats'),
     # path('technician/debug/data/', views.debug_technician_data, name='debug_technician_data'),
     #FAQ/Help Center
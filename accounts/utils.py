@@ -1,10 +1,10 @@
 # accounts/utils.py
-from .models import Notification
+from .notifications import notify
 
 def create_notification(ticket, sender, message):
-    Notification.objects.create(
-        recipient=ticket.user,   # The ticket owner
-        sender=sender,           # The helper responding
-        ticket=ticket,
-        message=message
+    notify(
+        ticket.user_id,          # The ticket owner
+        message,
+        sender_id=sender.id,     # The helper responding
+        ticket_id=ticket.id
     )
@@ -1,7 +1,10 @@
+import asyncio
+import logging
 import os
 from django.contrib.auth.forms import PasswordChangeForm
-from django.http import JsonResponse
-from django.db import models 
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db import models, transaction
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth import login, logout, authenticate
@@ -15,7 +18,8 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 
 from .models import Ticket, UserSettings
-from django.db.models import Q, Avg, Count
+from django.db.models import Q, Avg, Count, Exists, OuterRef, Subquery
+from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -23,10 +27,28 @@ from django.dispatch import receiver
 from django.shortcuts import get_object_or_404
 import json
 from .models import Technician, TechnicianSpecialty, AssistanceRequest
-from .models import User, UserProfile, Message, Contact, CreateTicket, ChatSession, Notification, Notifications_Technician, MessageEditHistory, TechnicianReview
+from .models import User, UserProfile, Message, Contact, CreateTicket, ChatSession, Notification, MessageEditHistory, TechnicianReview, UnreadMessageCounter
 from django.db.models.signals import post_save
 from django.utils import timezone
 from accounts.models import FAQCategory, FAQItem
+from .realtime import get_broker, chat_channel
+from .chat_sessions import ensure_assistance_request_chat, reconcile_ticket_chats
+from .caching import FAQ, TECHNICIANS, cached, user_namespace
+from .technician_search import search_technicians
+from .keyset import InvalidCursor, after_cursor, keyset_page, order_by_keys
+from .assistance import open_assistance_request
+from .images import InvalidImage, save_profile_picture
+from .jobs import enqueue
+from .metrics import query_budget, render_prometheus
+from .notifications import mark_all_read, notification_feed, notify, unread_notification_count
+from .storage_clients import get_s3_client
+from .tasks import send_notifications, send_password_reset_email
+from .ticket_stats import customer_ticket_stats, technician_ticket_stats
+from .faq_bot import (
+    get_faq_index, get_quick_action_buttons, get_category_buttons,
+    get_related_faqs, get_related_buttons,
+)
+from django.utils.crypto import constant_time_compare
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator  # CORE SECURITY
@@ -35,6 +57,8 @@ from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 
+logger = logging.getLogger(__name__)
+
 
 def role_select_view(request):
     """
@@ -149,88 +173,143 @@ def dashboard_view(request):
     return redirect_to_correct_dashboard(request.user)
 
 
-@login_required
-def technician_directory_view(request):
+def get_directory_specialties(technician):
+    """Specialty names from the search document, falling back to the M2M"""
+    document = getattr(technician, 'search_document', None)
+    if document is None:
+        return technician.get_specialties_list()
+    return document.get_specialties_list()
+
+
+TECHNICIAN_DIRECTORY_PAGE_SIZE = 24
+
+# Keyset orderings for the directory sort options; each one is backed by an
+# index on Technician (or on the search document, for names)
+TECHNICIAN_DIRECTORY_ORDERINGS = {
+    'rating': ('-average_rating', 'id'),
+    'name': ('search_document__sort_name', 'search_document__technician'),
+    'experience': ('-experience_years', 'id'),
+    'response_time': ('average_response_time', 'id'),
+    'rate': ('hourly_rate', 'id'),
+}
+
+
+def get_directory_queryset(search_query, service_filter, availability_filter):
     """
-    Display technician directory with dynamic data from database
+    Technicians matching the directory filters, unordered
     """
-    # Get all technicians with their profiles and specialties
+    # Get all technicians with their profiles and search documents
     technicians = Technician.objects.select_related(
         'user_profile',
-        'user_profile__user'
-    ).prefetch_related('specialties').all()
+        'user_profile__user',
+        'search_document'
+    ).all()
 
-    # Apply search filter
-    search_query = request.GET.get('search', '')
-    if search_query:
-        technicians = technicians.filter(
-            Q(user_profile__user__first_name__icontains=search_query) |
-            Q(user_profile__user__last_name__icontains=search_query) |
-            Q(user_profile__user__username__icontains=search_query) |
-            Q(specialties__name__icontains=search_query) |
-            Q(bio__icontains=search_query)
-        ).distinct()
+    # Apply search filter (full-text index over names, specialties and bio)
+    technicians = search_technicians(technicians, search_query)
 
     # Apply service filter
-    service_filter = request.GET.get('service', '')
     if service_filter:
         technicians = technicians.filter(
-            specialties__name__icontains=service_filter
-        ).distinct()
+            search_document__specialty_names__icontains=service_filter
+        )
 
     # Apply availability filter
-    availability_filter = request.GET.get('availability', '')
     if availability_filter == 'available':
         technicians = technicians.filter(is_available=True)
     elif availability_filter == 'busy':
         technicians = technicians.filter(is_available=False)
 
-    # Apply sorting
-    sort_by = request.GET.get('sort', 'rating')
+    return technicians
+
+
+def get_directory_row(technician):
+    """Template/JSON data for one directory card"""
+    return {
+        'id': technician.id,
+        'user_id': technician.user_profile.user.id,
+        'first_name': technician.user_profile.user.first_name,
+        'last_name': technician.user_profile.user.last_name,
+        'username': technician.user_profile.user.username,
+        'email': technician.user_profile.user.email,
+        'specialties': get_directory_specialties(technician),
+        'rating': technician.average_rating,
+        'review_count': technician.review_count,
+        'experience_years': technician.experience_years,
+        'response_time': technician.average_response_time,
+        'availability_status': technician.availability_status,
+        'availability_class': technician.availability_class,
+        'profile_picture_url': technician.profile_picture_url,
+        'initials': technician.initials,
+        'bio': technician.bio,
+        'hourly_rate': technician.hourly_rate,
+        'certification': technician.certification,
+        'completed_tickets': technician.completed_tickets,
+        'success_rate': technician.success_rate,
+        'languages': technician.languages,
+    }
+
+
+@cached(TECHNICIANS)
+def get_technician_directory_page(search_query, service_filter, availability_filter, sort_by, cursor=None):
+    """
+    One keyset page of directory rows and the cursor of the next page
+
+    Raises InvalidCursor for a cursor that was not issued by this view.
+    """
+    ordering = TECHNICIAN_DIRECTORY_ORDERINGS.get(sort_by, TECHNICIAN_DIRECTORY_ORDERINGS['rating'])
+    technicians = get_directory_queryset(search_query, service_filter, availability_filter)
     if sort_by == 'name':
-        technicians = technicians.order_by('user_profile__user__first_name', 'user_profile__user__last_name')
-    elif sort_by == 'experience':
-        technicians = technicians.order_by('-experience_years')
-    elif sort_by == 'response_time':
-        technicians = technicians.order_by('average_response_time')
-    elif sort_by == 'rate':
-        technicians = technicians.order_by('hourly_rate')
-    else:  # Default to rating
-        technicians = technicians.order_by('-average_rating', 'user_profile__user__first_name')
+        # Every technician has a search document; the join keeps the name index usable
+        technicians = technicians.filter(search_document__isnull=False)
+    page, next_cursor = keyset_page(technicians, ordering, cursor, TECHNICIAN_DIRECTORY_PAGE_SIZE)
+    return [get_directory_row(technician) for technician in page], next_cursor
+
 
+@cached(TECHNICIANS)
+def get_technician_directory_summary(search_query, service_filter, availability_filter):
+    """
+    Statistics bar figures for the filtered directory and the specialty options
+    """
+    technicians = get_directory_queryset(search_query, service_filter, availability_filter)
+    summary = technicians.aggregate(
+        total=Count('id'),
+        available=Count('id', filter=Q(is_available=True)),
+        average_rating=Avg('average_rating'),
+    )
     # Get all specialties for filter dropdown
-    all_specialties = TechnicianSpecialty.objects.all()
-
-    # Prepare technician data for template
-    technician_data = []
-    for technician in technicians:
-        technician_data.append({
-            'id': technician.id,
-            'user_id': technician.user_profile.user.id,
-            'first_name': technician.user_profile.user.first_name,
-            'last_name': technician.user_profile.user.last_name,
-            'username': technician.user_profile.user.username,
-            'email': technician.user_profile.user.email,
-            'specialties': technician.get_specialties_list(),
-            'rating': technician.average_rating,
-            'review_count': technician.review_count,
-            'experience_years': technician.experience_years,
-            'response_time': technician.average_response_time,
-            'availability_status': technician.availability_status,
-            'availability_class': technician.availability_class,
-            'profile_picture_url': technician.profile_picture_url,
-            'initials': technician.initials,
-            'bio': technician.bio,
-            'hourly_rate': technician.hourly_rate,
-            'certification': technician.certification,
-            'completed_tickets': technician.completed_tickets,
-            'success_rate': technician.success_rate,
-            'languages': technician.languages,
-        })
+    summary['all_specialties'] = list(TechnicianSpecialty.objects.all())
+    return summary
+
+
+def get_directory_params(request):
+    """Directory filters from the query string"""
+    return (
+        request.GET.get('search', ''),
+        request.GET.get('service', ''),
+        request.GET.get('availability', ''),
+        request.GET.get('sort', 'rating'),
+    )
+
+
+@login_required
+def technician_directory_view(request):
+    """
+    Display the first page of the technician directory; later pages are
+    fetched from technician_directory_api as the user scrolls
+    """
+    search_query, service_filter, availability_filter, sort_by = get_directory_params(request)
+
+    technician_data, next_cursor = get_technician_directory_page(
+        search_query, service_filter, availability_filter, sort_by
+    )
+    summary = get_technician_directory_summary(search_query, service_filter, availability_filter)
 
     context = {
         'technicians': technician_data,
-        'all_specialties': all_specialties,
+        'next_cursor': next_cursor,
+        'summary': summary,
+        'all_specialties': summary['all_specialties'],
         'search_query': search_query,
         'selected_service': service_filter,
         'selected_sort': sort_by,
@@ -242,6 +321,33 @@ def technician_directory_view(request):
     return render(request, 'dashboard/technician_directory.html', context)
 
 
+@login_required
+@require_http_methods(["GET"])
+def technician_directory_api(request):
+    """
+    Next page of the technician directory for infinite scroll
+    """
+    search_query, service_filter, availability_filter, sort_by = get_directory_params(request)
+    try:
+        technician_data, next_cursor = get_technician_directory_page(
+            search_query, service_filter, availability_filter, sort_by,
+            request.GET.get('cursor') or None
+        )
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+
+    html = render_to_string(
+        'dashboard/technician_directory_cards.html', {'technicians': technician_data}, request=request
+    )
+    return JsonResponse({
+        'success': True,
+        'technicians': technician_data,
+        'html': html,
+        'has_more': next_cursor is not None,
+        'next_cursor': next_cursor,
+    })
+
+
 
 import json
 from django.http import JsonResponse
@@ -250,10 +356,7 @@ from .models import Ticket, Technician
 @csrf_exempt
 @login_required
 def request_assistance_view(request):
-    print("🔧 === REQUEST ASSISTANCE STARTED ===")
-
     if request.method != 'POST':
-        print("❌ Invalid method")
         return JsonResponse({
             'success': False,
             'error': 'Only POST requests allowed'
@@ -262,18 +365,13 @@ def request_assistance_view(request):
     try:
         # Check if body exists
         if not request.body:
-            print("❌ Empty request body")
             return JsonResponse({
                 'success': False,
                 'error': 'Empty request body'
             }, status=400)
 
         # Parse JSON data
-        raw_body = request.body.decode('utf-8')
-        print(f"📦 Raw body: {raw_body}")
-
-        data = json.loads(raw_body)
-        print(f"📋 Parsed data: {data}")
+        data = json.loads(request.body.decode('utf-8'))
 
         # Extract fields
         tech_id = data.get('technician_id')
@@ -281,11 +379,8 @@ def request_assistance_view(request):
         description = data.get('description')
         priority = data.get('priority')
 
-        print(f"🔍 Extracted fields - tech_id: {tech_id}, title: {title}, description: {description}, priority: {priority}")
-
         # Validate required fields
         if not tech_id:
-            print("❌ Missing technician_id")
             return JsonResponse({
                 'success': False,
                 'error': 'Missing technician_id'
@@ -295,7 +390,7 @@ def request_assistance_view(request):
             missing = []
             if not title: missing.append('title')
             if not description: missing.append('description')
-            print(f"❌ Missing fields: {missing}")
+            logger.info("Assistance request rejected, missing %s", ", ".join(missing))
             return JsonResponse({
                 'success': False,
                 'error': f'Missing required fields: {", ".join(missing)}'
@@ -303,114 +398,38 @@ def request_assistance_view(request):
 
         # Get the technician
         try:
-            technician = Technician.objects.get(id=tech_id)
+            technician = Technician.objects.select_related('user_profile__user').get(id=tech_id)
             technician_user = technician.user_profile.user
-            print(f"✅ Found technician: {technician_user.username} (ID: {technician.id})")
         except Technician.DoesNotExist:
-            print(f"❌ Technician with id {tech_id} not found")
+            logger.info("Assistance request for unknown technician %s", tech_id)
             return JsonResponse({
                 'success': False,
                 'error': f'Technician with ID {tech_id} not found'
             }, status=400)
         except Exception as e:
-            print(f"❌ Error getting technician: {e}")
+            logger.warning("Error finding technician %s: %s", tech_id, e)
             return JsonResponse({
                 'success': False,
                 'error': f'Error finding technician: {str(e)}'
             }, status=400)
 
-        # Create the ticket
-        #TEST
-        print("🎫 Creating ticket...")
+        # Ticket, assistance request, chat and contact in one transaction;
+        # the technician is notified once it commits
         try:
-            # Use last ticket category if available, otherwise default
-            last_ticket = CreateTicket.objects.filter(user=request.user).order_by('-id').first()
-
-            ticket = CreateTicket.objects.create(
-                user=request.user,
-                title=title,
-                description=description,
-                priority=priority or 'medium',
-                category=last_ticket.category if last_ticket else 'Others',
-                status='open'
+            ticket, assistance_request = open_assistance_request(
+                request.user, technician, title, description, priority
             )
-            print(f"✅ Ticket created: {ticket.id}")
-        except Exception as e:
-            print(f"❌ Error creating ticket: {e}")
-            return JsonResponse({
-                'success': False,
-                'error': f'Error creating ticket: {str(e)}'
-            }, status=400)
-
-        # Create assistance request
-        print("📋 Creating assistance request...")
-        try:
-            assistance_request = AssistanceRequest.objects.create(
-                user=request.user,
-                technician=technician,
-                ticket=ticket,
-                title=title,
-                description=description,
-                priority=priority or 'medium',
-                status='pending'
+            logger.debug(
+                "Assistance request opened",
+                extra={'ticket_id': ticket.id, 'assistance_request_id': assistance_request.id},
             )
-            print(f"✅ Assistance request created: {assistance_request.id}")
         except Exception as e:
-            print(f"❌ Error creating assistance request: {e}")
-            # Delete the ticket if assistance request fails
-            ticket.delete()
+            logger.exception("Error opening assistance request")
             return JsonResponse({
                 'success': False,
                 'error': f'Error creating assistance request: {str(e)}'
             }, status=400)
 
-        # Create contact relationship
-        print("👥 Creating contact...")
-        try:
-            contact_name = f"{technician_user.first_name} {technician_user.last_name}".strip()
-            if not contact_name:
-                contact_name = technician_user.username
-
-            contact, created = Contact.objects.get_or_create(
-                user=request.user,
-                contact_user=technician_user,
-                defaults={'contact_name': contact_name}
-            )
-            print(f"✅ Contact {'created' if created else 'exists'}: {contact.id}")
-        except Exception as e:
-            print(f"⚠️ Contact creation warning: {e}")
-            # Don't fail the whole request if contact creation fails
-
-        # Create initial message
-        print("💬 Creating initial message...")
-        try:
-            initial_message = f"New assistance request: {title}\n\nDescription: {description}\nPriority: {priority or 'medium'}"
-
-            Message.objects.create(
-                sender=request.user,
-                receiver=technician_user,
-                content=initial_message,
-                timestamp=timezone.now()
-            )
-            print("✅ Initial message created")
-        except Exception as e:
-            print(f"⚠️ Message creation warning: {e}")
-            # Don't fail the whole request if message creation fails
-
-        # Create notification for technician
-        print("🔔 Creating notification...")
-        try:
-            Notifications_Technician.objects.create(
-                technician=technician_user,
-                message=f"New assistance request from {request.user.username}: {title}",
-                ticket=ticket
-            )
-            print("✅ Notification created")
-        except Exception as e:
-            print(f"⚠️ Notification creation warning: {e}")
-            # Don't fail the whole request if notification creation fails
-
-        print("🎉 === REQUEST ASSISTANCE COMPLETED SUCCESSFULLY ===")
         return JsonResponse({
             'success': True,
             'ticket_id': ticket.id,
@@ -418,15 +437,12 @@ def request_assistance_view(request):
         })
 
     except json.JSONDecodeError as e:
-        print(f"❌ JSON decode error: {e}")
         return JsonResponse({
             'success': False,
             'error': 'Invalid JSON data in request'
         }, status=400)
     except Exception as e:
-        print(f"❌ Unexpected error: {str(e)}")
-        import traceback
-        print(f"🔍 Traceback: {traceback.format_exc()}")
+        logger.exception("Unexpected error in request_assistance_view")
         return JsonResponse({
             'success': False,
             'error': f'Server error: {str(e)}'
@@ -462,11 +478,15 @@ def assign_ticket_to_technician(request):
             priority=ticket.priority,
             status='pending'
         )
-
-        Notifications_Technician.objects.create(
-            technician=technician_user,
-            message=f"Ticket #{ticket.id} assigned request from {request.user.username}",
-            ticket=ticket
+        # An accepted technician keeps the ticket until they let it go
+        if not ticket.assistance_requests.filter(status__in=['accepted', 'completed']).exists():
+            ticket.assign_technician(technician_user)
+
+        notify(
+            technician_user.id,
+            f"Ticket #{ticket.id} assigned request from {request.user.username}",
+            sender_id=request.user.id,
+            ticket_id=ticket.id
         )
 
         return JsonResponse({'success': True, 'ticket_id': ticket.id, 'message': 'Ticket assigned to technician (pending)'})
@@ -483,7 +503,7 @@ def technician_detail_view(request, technician_id):
     """
     technician = get_object_or_404(
         Technician.objects.select_related('user_profile', 'user_profile__user')
-                         .prefetch_related('specialties', 'reviews'),
+                         .prefetch_related('specialties'),
         id=technician_id
     )
 
@@ -502,67 +522,12 @@ def technician_detail_view(request, technician_id):
         'full_stars': full_stars,
         'has_half_star': has_half_star,
         'empty_stars': empty_stars,
+        'rating_histogram': technician.rating_histogram,
         'title': f'{technician.full_name} - Technician Profile - FixIT'
     }
 
     return render(request, 'dashboard/technician_profile', context)
 
-@receiver(post_save, sender=AssistanceRequest)
-def create_chat_session_on_assistance_request(sender, instance, created, **kwargs):
-    """
-    Automatically create a chat session when an assistance request is created
-    """
-    print(f"🔧 CHAT SIGNAL: AssistanceRequest - Created: {created}, Status: {instance.status}, Ticket: {instance.ticket.id if instance.ticket else 'No Ticket'}")
-    
-    # Create chat session for ANY new assistance request, regardless of status
-    if created:
-        try:
-            # Get the technician user
-            technician_user = instance.technician.user_profile.user
-            print(f"🔧 CHAT SIGNAL: Technician: {technician_user.username}, User: {instance.user.username}")
-            
-            # Check if chat session already exists
-            existing_chat = ChatSession.objects.filter(
-                user=instance.user,
-                technician=technician_user,
-                ticket=instance.ticket
-            ).first()
-            
-            if existing_chat:
-                print(f"🔧 CHAT SIGNAL: Chat session already exists - ID: {existing_chat.id}")
-                return
-            
-            # Create new chat session
-            chat_session = ChatSession.objects.create(
-                user=instance.user,
-                technician=technician_user,
-                ticket=instance.ticket,
-                chat_type='user_tech',
-                status='active',
-                last_message_at=timezone.now()
-            )
-            
-            print(f"🔧 CHAT SIGNAL: Created new chat session - ID: {chat_session.id}")
-            
-            # Create initial message
-            initial_content = f"New assistance request: {instance.title}\n\nDescription: {instance.description}\nPriority: {instance.priority}"
-            
-            Message.objects.create(
-                chat_session=chat_session,
-                sender=instance.user,
-                receiver=technician_user,
-                content=initial_content,
-                message_type='user_to_tech'
-            )
-            
-            print(f"🔧 CHAT SIGNAL: Initial message created for chat {chat_session.id}")
-            
-        except Exception as e:
-            print(f"❌ CHAT SIGNAL: Error creating chat session: {e}")
-            import traceback
-            print(f"🔧 CHAT SIGNAL: Traceback: {traceback.format_exc()}")
-            
-
    
 @login_required
 @require_http_methods(["GET", "POST"])
@@ -631,8 +596,10 @@ def handle_send_message(request, user):
         # Generate enhanced bot response
         bot_response = generate_bot_response(content)
         
-        print(f"🔧 DEBUG: Bot response generated - Type: {bot_response.get('type')}")
-        print(f"🔧 DEBUG: Bot buttons count: {len(bot_response.get('buttons', []))}")
+        logger.debug(
+            "Bot response generated",
+            extra={'response_type': bot_response.get('type'), 'buttons': len(bot_response.get('buttons', []))},
+        )
         
         # Prepare bot response data
         bot_data = {
@@ -653,7 +620,7 @@ def handle_send_message(request, user):
         
         # Update chat session
         chat_session.last_message_at = timezone.now()
-        chat_session.save()
+        chat_session.save(update_fields=['last_message_at', 'updated_at'])
         
         # Return structured response including buttons
         return JsonResponse({
@@ -671,9 +638,7 @@ def handle_send_message(request, user):
     except ChatSession.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Chat session not found'})
     except Exception as e:
-        print(f"❌ ERROR in handle_send_message: {e}")
-        import traceback
-        print(f"🔍 Traceback: {traceback.format_exc()}")
+        logger.exception("Error in handle_send_message")
         return JsonResponse({'success': False, 'error': str(e)})
     
 def handle_edit_message(request, user):
@@ -816,7 +781,7 @@ def handle_delete_chat(request):
         # Soft delete by updating status instead of actually deleting
         chat_session.status = 'deleted'
         chat_session.deleted_at = timezone.now()
-        chat_session.save()
+        chat_session.save(update_fields=['status', 'deleted_at', 'updated_at'])
         
         return JsonResponse({
             'success': True,
@@ -835,11 +800,7 @@ def handle_mark_read(request, user):
         chat_session = ChatSession.objects.get(id=chat_session_id)
         
         # Mark messages as read for this user
-        Message.objects.filter(
-            chat_session=chat_session,
-            receiver=user,
-            is_read=False
-        ).update(is_read=True)
+        chat_session.mark_messages_as_read(user)
         
         return JsonResponse({'success': True})
         
@@ -851,8 +812,6 @@ def handle_mark_read(request, user):
 
 def render_user_messages_with_tickets(request, user):
     """Render user messages interface with ticket integration"""
-    print(f"🔧 DEBUG: Rendering user messages for {user.username}")
-    
     # Get user's tickets
     user_tickets = CreateTicket.objects.filter(user=user).order_by('-created_at')
     
@@ -926,22 +885,24 @@ def render_user_messages_with_tickets(request, user):
             }
             
             # Mark messages as read when opening chat
-            Message.objects.filter(
-                chat_session=selected_chat_obj,
-                receiver=user,
-                is_read=False
-            ).update(is_read=True)
+            selected_chat_obj.mark_messages_as_read(user)
             
             # Get messages - IMPORTANT: Prefetch related data if needed
             chat_messages = selected_chat_obj.messages.filter(is_deleted=False).order_by('created_at')
             
-            # Debug: Check bot messages
-            bot_messages = chat_messages.filter(message_type='bot_to_user')
-            print(f"🔧 DEBUG: Found {bot_messages.count()} bot messages")
-            for msg in bot_messages:
-                print(f"🔧 DEBUG: Bot message {msg.id} has bot_data: {bool(msg.bot_response_data)}")
-                if msg.bot_response_data:
-                    print(f"🔧 DEBUG: Buttons: {len(msg.bot_response_data.get('buttons', []))}")
+            # Debug only: costs a query, so skipped unless debug logging is on
+            if logger.isEnabledFor(logging.DEBUG):
+                bot_data = list(chat_messages.filter(message_type='bot_to_user').values_list(
+                    'bot_response_data', flat=True
+                ))
+                logger.debug(
+                    "Bot messages in chat",
+                    extra={
+                        'chat_session_id': selected_chat_obj.id,
+                        'bot_messages': len(bot_data),
+                        'with_buttons': sum(1 for data in bot_data if data and data.get('buttons')),
+                    },
+                )
             
         except ChatSession.DoesNotExist:
             selected_chat = None
@@ -971,7 +932,7 @@ def render_user_messages_with_tickets(request, user):
             category.top_faqs = list(category.faqs.all())
             
     except Exception as e:
-        print(f"⚠️ FAQ data not available: {e}")
+        logger.warning("FAQ data not available: %s", e)
         faq_categories = []  # Empty list as fallback
     
     context = {
@@ -990,6 +951,7 @@ def render_user_messages_with_tickets(request, user):
 
 
 
+@query_budget(10)
 @login_required
 @require_http_methods(["GET", "POST"])
 def technician_messages_view(request):
@@ -998,8 +960,6 @@ def technician_messages_view(request):
     """
     user = request.user
     
-    print(f"🔧 DEBUG: Technician Messages View - User: {user.username}")
-    
     if request.method == 'POST':
         return handle_technician_message_post(request, user)
     
@@ -1046,7 +1006,7 @@ def handle_technician_send_message(request, user):
         
         # Update chat session
         chat_session.last_message_at = timezone.now()
-        chat_session.save()
+        chat_session.save(update_fields=['last_message_at', 'updated_at'])
         
         # Create notification for user
         create_message_notification(chat_session.user, user, message)
@@ -1062,84 +1022,34 @@ def handle_technician_send_message(request, user):
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+TECHNICIAN_INBOX_PAGE_SIZE = 25
+
 def render_technician_messages_interface(request, user):
     """Render technician messages interface with ticket integration"""
-    print(f"🔧 DEBUG: Rendering technician messages for {user.username}")
-    
     # Get technician's assigned tickets
-    technician_tickets = CreateTicket.objects.filter(
-        assistance_requests__technician__user_profile__user=user
-    ).distinct().order_by('-created_at')
-    
-    print(f"🔧 DEBUG: Found {technician_tickets.count()} assigned tickets")
-    
-    # AUTO-FIX: Create missing chat sessions
-    if technician_tickets.exists():
-        created_count = 0
-        for ticket in technician_tickets:
-            # Check if chat session exists
-            existing_chat = ChatSession.objects.filter(
-                technician=user,
-                ticket=ticket
-            ).exists()
-            
-            if not existing_chat:
-                try:
-                    # Create chat session
-                    chat_session = ChatSession.objects.create(
-                        user=ticket.user,
-                        technician=user,
-                        ticket=ticket,
-                        chat_type='user_tech',
-                        status='active',
-                        last_message_at=timezone.now()
-                    )
-                    
-                    # Create initial message
-                    Message.objects.create(
-                        chat_session=chat_session,
-                        sender=ticket.user,
-                        receiver=user,
-                        content=f"Ticket: {ticket.title}\n\n{ticket.description}",
-                        message_type='user_to_tech'
-                    )
-                    
-                    created_count += 1
-                    print(f"🔧 AUTO-FIX: Created chat for ticket {ticket.id}")
-                    
-                except Exception as e:
-                    print(f"❌ AUTO-FIX: Error creating chat for ticket {ticket.id}: {e}")
-        
-        if created_count > 0:
-            print(f"🔧 AUTO-FIX: Created {created_count} missing chat sessions")
-            # Refresh the chat sessions query
-            chat_sessions = ChatSession.objects.filter(
-                technician=user
-            ).select_related('user', 'ticket').prefetch_related('messages').distinct()
-        else:
-            # Use existing query if no new chats were created
-            chat_sessions = ChatSession.objects.filter(
-                technician=user
-            ).select_related('user', 'ticket').prefetch_related('messages').distinct()
-    else:
-        chat_sessions = ChatSession.objects.filter(
-            technician=user
-        ).select_related('user', 'ticket').prefetch_related('messages').distinct()
+    technician_tickets = CreateTicket.objects.filter(technician=user).order_by('-created_at')
+    
+    # One page of the inbox in a single query: last message preview and time
+    # come from correlated subqueries and unread counts from ChatSession itself
+    last_message = Message.objects.filter(
+        chat_session=OuterRef('pk'),
+        is_deleted=False
+    ).order_by('-created_at', '-id')
+    chat_sessions = ChatSession.objects.filter(
+        technician=user
+    ).select_related('user', 'ticket').annotate(
+        last_message_content=Subquery(last_message.values('content')[:1]),
+        last_message_time=Subquery(last_message.values('created_at')[:1]),
+    ).order_by('-last_message_at', '-created_at', '-id')
     
-    print(f"🔧 DEBUG: Now have {chat_sessions.count()} chat sessions")
+    chats_page = Paginator(chat_sessions, TECHNICIAN_INBOX_PAGE_SIZE).get_page(request.GET.get('page'))
     
     # Prepare chat data for template
     customer_chats = []
-    for chat in chat_sessions:
+    for chat in chats_page:
         customer = chat.user
         customer_name = f"{customer.first_name} {customer.last_name}".strip() or customer.username
         
-        # Get unread message count
-        unread_count = chat.messages.filter(
-            receiver=user,
-            is_read=False
-        ).count()
-        
         customer_chats.append({
             'id': chat.id,
             'customer_name': customer_name,
@@ -1147,12 +1057,11 @@ def render_technician_messages_interface(request, user):
             'ticket_id': chat.ticket.id if chat.ticket else 'N/A',
             'ticket_title': chat.ticket.title if chat.ticket else 'General Support',
             'ticket_status': chat.ticket.status if chat.ticket else 'open',
-            'unread_count': unread_count,
-            'last_message_at': chat.last_message_at,
+            'unread_count': chat.technician_unread_count,
+            'last_message_preview': chat.last_message_content or '',
+            'last_message_at': chat.last_message_time or chat.last_message_at,
         })
     
-    print(f"🔧 DEBUG: Prepared {len(customer_chats)} customer chats")
-    
     # Get selected chat
     selected_chat_id = request.GET.get('chat')
     selected_chat = None
@@ -1175,11 +1084,7 @@ def render_technician_messages_interface(request, user):
             }
             
             # Mark messages as read when opening chat
-            Message.objects.filter(
-                chat_session=selected_chat_obj,
-                receiver=user,
-                is_read=False
-            ).update(is_read=True)
+            selected_chat_obj.mark_messages_as_read(user)
             
             # Get messages
             chat_messages = selected_chat_obj.messages.filter(is_deleted=False).order_by('created_at')
@@ -1192,6 +1097,7 @@ def render_technician_messages_interface(request, user):
         'profile': user.profile,
         'title': 'Messages - FixIT Technician',
         'customer_chats': customer_chats,
+        'chats_page': chats_page,
         'technician_tickets': technician_tickets,  # Add tickets to context
         'selected_chat': selected_chat,
         'chat_messages': chat_messages,
@@ -1204,44 +1110,9 @@ def create_missing_chat_sessions_for_technician(user):
     """
     Create chat sessions for any assigned tickets that don't have chats
     """
-    print(f"🔧 DEBUG: Checking for missing chat sessions for technician {user.username}")
-    
-    # Get assigned tickets without chat sessions
-    assigned_tickets = CreateTicket.objects.filter(
-        assistance_requests__technician__user_profile__user=user
-    ).distinct()
-    
-    created_count = 0
-    for ticket in assigned_tickets:
-        # Check if chat session already exists
-        existing_chat = ChatSession.objects.filter(
-            technician=user,
-            ticket=ticket
-        ).exists()
-        
-        if not existing_chat:
-            # Create new chat session
-            chat_session = ChatSession.objects.create(
-                user=ticket.user,
-                technician=user,
-                ticket=ticket,
-                chat_type='user_tech',
-                status='active'
-            )
-            
-            # Create initial message
-            Message.objects.create(
-                chat_session=chat_session,
-                sender=ticket.user,
-                receiver=user,
-                content=f"Ticket created: {ticket.title} - {ticket.description}",
-                message_type='user_to_tech'
-            )
-            
-            created_count += 1
-            print(f"🔧 DEBUG: Created chat session for ticket {ticket.id}")
-    
-    print(f"🔧 DEBUG: Created {created_count} missing chat sessions")
+    created_count = len(reconcile_ticket_chats(technician_user=user))
+    if created_count:
+        logger.info("Created %d missing chat sessions for technician %s", created_count, user.id)
     return created_count
 
 
@@ -1344,7 +1215,7 @@ def serialize_message(message):
         'id': message.id,
         'content': message.content,
         'sender_name': message.sender.username if message.sender else 'FixIT Assistant',
-        'sender_id': message.sender.id if message.sender else None,
+        'sender_id': message.sender_id,
         'message_type': message.message_type,
         'created_at': message.created_at.isoformat(),
         'is_own_message': False,  # This should be set in the template context
@@ -1354,53 +1225,207 @@ def serialize_message(message):
 def create_message_notification(recipient, sender, message):
     """Create notification for new message"""
     try:
-        Notification.objects.create(
-            recipient=recipient,
-            sender=sender,
-            message=f"New message from {sender.username}",
-            created_at=timezone.now()
-        )
+        notify(recipient.id, f"New message from {sender.username}", sender_id=sender.id)
     except Exception as e:
-        print(f"Error creating notification: {e}")
+        logger.exception("Error creating message notification")
 
 # API endpoints for real-time updates
+CHAT_MESSAGES_PAGE_SIZE = 50
+CHAT_MESSAGES_MAX_PAGE_SIZE = 200
+CHAT_MESSAGES_ORDERING = ('created_at', 'id')
+
+
+def _message_position(chat_session, message_id):
+    """Keyset values of a message in its chat; created_at is resolved in the page query"""
+    created_at = Message.objects.filter(chat_session=chat_session, id=message_id).values('created_at')[:1]
+    return [Subquery(created_at), message_id]
+
+
 @login_required
 @csrf_exempt
 def get_chat_messages(request, chat_session_id):
-    """API endpoint to get chat messages"""
+    """
+    API endpoint to get chat messages.
+
+    ?after_id=<id> returns only the messages newer than <id> (for polling),
+    ?before_id=<id> returns the page of older messages just before <id>,
+    and with neither the latest page is returned. ?limit= sets the page size.
+    """
     try:
         chat_session = ChatSession.objects.filter(
             Q(user=request.user) | Q(technician=request.user)
         ).get(id=chat_session_id)
 
-        messages = chat_session.messages.filter(is_deleted=False).order_by('created_at')
+        try:
+            after_id = request.GET.get('after_id')
+            after_id = int(after_id) if after_id else None
+            before_id = request.GET.get('before_id')
+            before_id = int(before_id) if before_id else None
+            limit = int(request.GET.get('limit', CHAT_MESSAGES_PAGE_SIZE))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid cursor or limit'}, status=400)
+        limit = max(1, min(limit, CHAT_MESSAGES_MAX_PAGE_SIZE))
+
+        # Walks the (chat_session, created_at) index and joins senders in one query
+        messages = Message.objects.filter(
+            chat_session=chat_session,
+            is_deleted=False
+        ).select_related('sender')
+
+        # Cursors are message ids, but pages follow (created_at, id) so
+        # backdated messages are neither skipped nor repeated
+        backwards = tuple(f'-{field}' for field in CHAT_MESSAGES_ORDERING)
+        if after_id is not None:
+            messages = messages.filter(after_cursor(
+                Message, CHAT_MESSAGES_ORDERING, _message_position(chat_session, after_id)
+            ))
+            page = list(order_by_keys(messages, CHAT_MESSAGES_ORDERING)[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            if before_id is not None:
+                messages = messages.filter(after_cursor(
+                    Message, backwards, _message_position(chat_session, before_id)
+                ))
+            page = list(order_by_keys(messages, backwards)[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit][::-1]
 
         return JsonResponse({
             'success': True,
-            'messages': [serialize_message(msg) for msg in messages]
+            'messages': [serialize_message(msg) for msg in page],
+            'has_more': has_more,
+            'next_after_id': page[-1].id if page else after_id,
+            'next_before_id': page[0].id if page else before_id,
         })
 
     except ChatSession.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Chat session not found'})
+
+
+# Seconds between keep-alive comments on an idle event stream
+CHAT_EVENT_KEEPALIVE = 15
+
+@login_required
+async def chat_events(request, chat_session_id):
+    """Server-sent events stream of new, edited and deleted messages in a chat"""
+    user = await request.auser()
+    has_access = await ChatSession.objects.filter(
+        Q(user=user) | Q(technician=user), id=chat_session_id
+    ).aexists()
+    if not has_access:
+        return JsonResponse({'success': False, 'error': 'Chat session not found'}, status=404)
+
+    if not isinstance(request, ASGIRequest):
+        # Streaming needs an ASGI server; 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+
+    async def event_stream():
+        subscription = get_broker().subscribe(chat_channel(chat_session_id))
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), CHAT_EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
     
 @login_required
 @csrf_exempt
 def get_unread_count(request):
     """API endpoint to get unread message count"""
-    if hasattr(request.user, 'profile') and request.user.profile.is_technician:
-        unread_count = Message.objects.filter(
-            receiver=request.user,
-            is_read=False
-        ).count()
-    else:
-        unread_count = Message.objects.filter(
-            receiver=request.user,
-            is_read=False
-        ).count()
-    
+    unread_count = UnreadMessageCounter.get_count(request.user)
+
     return JsonResponse({'success': True, 'unread_count': unread_count})
 
+
+@login_required
+@require_http_methods(["GET"])
+def notifications_api(request):
+    """
+    A page of the user's notifications, newest first (?unread=1 for unread only)
+    """
+    try:
+        notifications, next_cursor = notification_feed(
+            request.user.id,
+            cursor=request.GET.get('cursor') or None,
+            unread_only=request.GET.get('unread') == '1',
+        )
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'notifications': [{
+            'id': notification.id,
+            'message': notification.message,
+            'is_read': notification.is_read,
+            'ticket_id': notification.ticket_id,
+            'sender_id': notification.sender_id,
+            'created_at': notification.created_at.isoformat(),
+        } for notification in notifications],
+        'unread_count': unread_notification_count(request.user.id),
+        'has_more': next_cursor is not None,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+@require_POST
+def mark_notifications_read(request):
+    """Mark all of the user's notifications as read"""
+    return JsonResponse({'success': True, 'updated': mark_all_read(request.user.id), 'unread_count': 0})
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    Request metrics in Prometheus text format (see accounts/metrics.py)
+
+    For staff users, or scrapers sending "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_staff or (
+        token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    )
+    if not authorized:
+        return HttpResponse(status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
     
+def get_customer_info(customer):
+    """Customer card data for a ticket row (expects user__profile selected)"""
+    profile = getattr(customer, 'profile', None)
+    return {
+        'full_name': customer.get_full_name() or customer.username,
+        'email': customer.email,
+        'profile_picture_url': profile.get_profile_picture_url(128) if profile else '',
+        'initials': (customer.first_name[0] + customer.last_name[0]).upper()
+                    if customer.first_name and customer.last_name
+                    else customer.username[:2].upper()
+    }
+
+
+def technician_ticket_rows(tickets):
+    """
+    Tickets with their customer (and profile) joined and has_review annotated,
+    so building the rows takes one query however many tickets there are
+    """
+    return tickets.select_related('user__profile').annotate(
+        has_review=Exists(TechnicianReview.objects.filter(ticket=OuterRef('pk')))
+    )
+
+
+@query_budget(8)
 @login_required
 def technician_tickets_view(request):
     """
@@ -1409,9 +1434,7 @@ def technician_tickets_view(request):
     user = request.user
 
     # Get technician's assigned tickets (base)
-    base_qs = CreateTicket.objects.filter(
-        assistance_requests__technician__user_profile__user=user
-    ).distinct()
+    base_qs = CreateTicket.objects.filter(technician=user)
 
     # Filters
     status = request.GET.get('status', 'all')
@@ -1442,37 +1465,16 @@ def technician_tickets_view(request):
 
     # Prepare ticket data with customer info
     ticket_data = []
-    for ticket in qs:
-        customer = ticket.user
-        customer_info = {
-            'full_name': customer.get_full_name() or customer.username,
-            'email': customer.email,
-            'profile_picture_url': getattr(customer.profile, 'profile_picture_url', ''),
-            'initials': (customer.first_name[0] + customer.last_name[0]).upper()
-                        if customer.first_name and customer.last_name
-                        else customer.username[:2].upper()
-        }
-
-        has_review = TechnicianReview.objects.filter(ticket=ticket).exists()
-
+    for ticket in technician_ticket_rows(qs):
         ticket_data.append({
             'ticket': ticket,
-            'customer': customer_info,
-            'has_review': has_review,
+            'customer': get_customer_info(ticket.user),
+            'has_review': ticket.has_review,
         })
 
-    # Calculate stats
-    total_tickets = base_qs.count()
-    open_tickets = base_qs.filter(status='open').count()
-    in_progress_tickets = base_qs.filter(status='in_progress').count()
-    resolved_tickets = base_qs.filter(status='resolved').count()
-
     context = {
         'ticket_data': ticket_data,
-        'total_tickets': total_tickets,
-        'open_tickets': open_tickets,
-        'in_progress_tickets': in_progress_tickets,
-        'resolved_tickets': resolved_tickets,
+        **technician_ticket_stats(user.id),
         'title': 'My Tickets - FixIT',
         'status': status,
         'sort': sort,
@@ -1502,72 +1504,16 @@ def profile_update_view(request):
     Handle profile updates including profile picture and user details
     """
     if request.method == 'POST' and 'profile_picture' in request.FILES:
-        print("=== PROFILE PICTURE UPLOAD START ===")
         uploaded_file = request.FILES['profile_picture']
-        print(f"📁 File received: {uploaded_file.name}, Size: {uploaded_file.size}")
-
-        # Validate file size
-        if uploaded_file.size > 5 * 1024 * 1024:
-            messages.error(request, 'Image file too large ( > 5MB )')
-            return redirect('profile_update')
-
-        # Validate file type and get proper extension
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
-        file_name = uploaded_file.name.lower()
-
-        # Extract extension properly
-        if '.' in file_name:
-            file_extension = '.' + file_name.split('.')[-1]
-            if file_extension == '.jpeg':
-                file_extension = '.jpg'
-        else:
-            messages.error(request, 'Please upload a valid image file with extension')
-            return redirect('profile_update')
-
-        if file_extension not in valid_extensions:
-            messages.error(request, 'Please upload a valid image file (JPG, PNG, GIF, BMP)')
-            return redirect('profile_update')
 
-        # Handle file upload using Supabase storage
+        # Validated by decoding, then re-encoded with thumbnails (accounts.images)
         try:
-            import uuid
-            from django.core.files.storage import default_storage
-
-            # Generate unique filename - SIMPLIFIED PATH
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-
-            print(f"🔄 Attempting to save to Supabase: {unique_filename}")
-            print(f"🔍 File extension: {file_extension}")
-
-            # Save the file using Django's storage backend
-            file_path = default_storage.save(unique_filename, uploaded_file)
-
-            print(f"✅ File saved to: {file_path}")
-            print(f"🔍 Full file path: {file_path}")
-
-            # Update the profile with the file path
-            request.user.profile.profile_picture = file_path
-            request.user.profile.save()
-
-            # Debug: Check what was actually saved
-            print(f"✅ Profile picture filename in DB: {request.user.profile.profile_picture}")
-
-            # Generate URL and verify
-            try:
-                file_url = default_storage.url(file_path)
-                print(f"🌐 Generated File URL: {file_url}")
-
-                # Construct manual URL to verify
-                manual_url = f"https://gpxaxqghnwguwgpackig.supabase.co/storage/v1/object/public/profile-pictures/{file_path}"
-                print(f"🔗 Manual File URL: {manual_url}")
-
-            except Exception as url_error:
-                print(f"⚠️ URL generation failed: {url_error}")
-
+            save_profile_picture(request.user.profile, uploaded_file)
             messages.success(request, 'Your profile picture has been updated successfully!')
-
+        except InvalidImage as e:
+            messages.error(request, f'Please upload a valid image file (JPG, PNG, GIF, BMP, WebP): {e}')
         except Exception as e:
-            print("❌ Error saving profile picture:", str(e))
+            logger.exception("Error saving profile picture")
             messages.error(request, f'Error updating profile picture: {str(e)}')
 
         return redirect('profile_update')
@@ -1591,9 +1537,9 @@ def profile_update_view(request):
             empty_stars = 5 - full_stars - (1 if has_half_star else 0)
 
         resolved_count = CreateTicket.objects.filter(
-            assistance_requests__technician__user_profile__user=request.user,
+            technician=request.user,
             status='resolved'
-        ).distinct().count()
+        ).count()
 
         levels = [
             ('Novice', 'badge-novice', 0),
@@ -1629,18 +1575,11 @@ def profile_update_view(request):
 @login_required
 def list_bucket_files(request):
     """List all files in the storage bucket"""
-    import boto3
     from django.conf import settings
     from django.http import JsonResponse
 
     try:
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            region_name=settings.AWS_S3_REGION_NAME,
-        )
+        s3 = get_s3_client()
 
         # List all objects in the bucket
         objects = s3.list_objects_v2(Bucket=settings.AWS_STORAGE_BUCKET_NAME)
@@ -1676,8 +1615,6 @@ def comprehensive_storage_test(request):
         test_filename = f"comprehensive_test_{request.user.id}.jpg"  # Explicit .jpg extension
         test_content = b"fake image content for testing"  # Simple text as fake image
 
-        print(f"🧪 Testing with filename: {test_filename}")
-
         # Save
         saved_path = default_storage.save(test_filename, ContentFile(test_content))
         test_results['save_success'] = True
@@ -1692,11 +1629,8 @@ def comprehensive_storage_test(request):
             file_url = default_storage.url(saved_path)
             test_results['url_generation'] = 'Success'
             test_results['file_url'] = file_url
-            print(f"🌐 File URL generated: {file_url}")
-
         except Exception as e:
             test_results['url_generation'] = f'Failed: {e}'
-            print(f"🔗 URL generation failed: {e}")
 
         # Read back
         try:
@@ -1737,7 +1671,6 @@ def debug_storage_detailed(request):
     from django.conf import settings
     from django.core.files.storage import default_storage
     from django.http import JsonResponse
-    import boto3
 
     debug_info = {
         'credentials': {
@@ -1751,13 +1684,8 @@ def debug_storage_detailed(request):
     }
 
     try:
-        # Test direct boto3 connection
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        )
+        # Test direct boto3 connection (shared client)
+        s3 = get_s3_client()
 
         # Test 1: List buckets
         buckets = s3.list_buckets()
@@ -1899,18 +1827,12 @@ def debug_storage_config(request):
 @login_required
 def test_direct_supabase_connection(request):
     """Test direct connection to Supabase storage"""
-    import boto3
     from django.conf import settings
     from django.http import JsonResponse
 
     try:
-        # Create S3 client with your settings
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        )
+        # Shared S3 client (accounts.storage_clients)
+        s3 = get_s3_client()
 
         # Test 1: List buckets
         buckets = s3.list_buckets()
@@ -1963,9 +1885,7 @@ def technician_dashboard_view(request):
     user = request.user
 
     # Get all tickets assigned to this technician
-    technician_tickets = CreateTicket.objects.filter(
-        assistance_requests__technician__user_profile__user=user
-    ).distinct()
+    technician_tickets = CreateTicket.objects.filter(technician=user)
 
     # Example: check for new tickets assigned in the last X minutes
     from django.utils import timezone
@@ -1978,23 +1898,13 @@ def technician_dashboard_view(request):
     for ticket in new_tickets:
         messages.info(request, f'Ticket #{ticket.id} "{ticket.title}" has been assigned to you.')
 
-    # ... existing context setup ...
+    # Only the five most recent tickets are shown, so only those get rows
+    recent_tickets = list(technician_ticket_rows(technician_tickets).order_by('-created_at')[:5])
     ticket_data = []
-    for ticket in technician_tickets:
-        customer = ticket.user
-        customer_info = {
-            'full_name': customer.get_full_name() or customer.username,
-            'email': customer.email,
-            'profile_picture_url': getattr(customer.profile, 'profile_picture_url', ''),
-            'initials': (
-                (customer.first_name[0] + customer.last_name[0]).upper()
-                if customer.first_name and customer.last_name
-                else customer.username[:2].upper()
-            )
-        }
+    for ticket in recent_tickets:
         ticket_data.append({
             'ticket': ticket,
-            'customer': customer_info
+            'customer': get_customer_info(ticket.user)
         })
 
     # Technician average response time display
@@ -2010,12 +1920,9 @@ def technician_dashboard_view(request):
                 pass
 
     context = {
-        'tickets': technician_tickets.order_by('-created_at')[:5],
+        'tickets': recent_tickets,
         'ticket_data': ticket_data,
-        'total_tickets': technician_tickets.count(),
-        'open_tickets': technician_tickets.filter(status='open').count(),
-        'in_progress_tickets': technician_tickets.filter(status='in_progress').count(),
-        'resolved_tickets': technician_tickets.filter(status='resolved').count(),
+        **technician_ticket_stats(user.id),
         'tech_avg_response_time_display': tech_avg_response_time_display,
         'title': 'Dashboard - FixIT',
     }
@@ -2035,54 +1942,35 @@ from django.contrib import messages
 from django.utils import timezone
 
 
-@login_required
-def user_dashboard_view(request):
+@cached(lambda user_id, start_of_month: user_namespace(user_id), TECHNICIANS)
+def get_user_dashboard_tickets(user_id, start_of_month):
     """
-    Display user dashboard with dynamic troubleshooting guides from FAQ
+    Ticket figures, recent tickets and notifications for the user dashboard
     """
-    user = request.user
-
-    # Get or create user profile
-    profile, created = UserProfile.objects.get_or_create(
-        user=user,
-        defaults={'is_technician': False}
-    )
-
-    if created:
-        messages.info(request, 'Your profile has been created.')
-
-    # Check if user is a technician and redirect
-    if profile.is_technician:
-        messages.info(request, 'Redirecting to technician dashboard.')
-        return redirect('technician_dashboard')
-
-    # --- TICKET DATA (existing code) ---
-    user_tickets_queryset = CreateTicket.objects.filter(user=user)
-    recent_tickets = user_tickets_queryset.order_by('-created_at')[:5]
-    
-    now = timezone.now()
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    total_tickets_created = user_tickets_queryset.count()
-    open_tickets_count = user_tickets_queryset.filter(
-        status__in=['open', 'in_progress']
-    ).count()
+    user_tickets_queryset = CreateTicket.objects.filter(user_id=user_id)
+    recent_tickets = list(user_tickets_queryset.order_by('-created_at')[:5])
     
-    resolved_this_month_count = user_tickets_queryset.filter(
-        status='resolved',
-        created_at__gte=start_of_month
-    ).count()
-    
-    ars = AssistanceRequest.objects.filter(user=user).select_related('technician')
+    ars = AssistanceRequest.objects.filter(user_id=user_id).select_related('technician')
     response_times = [ar.technician.average_response_time for ar in ars if ar.technician and ar.technician.average_response_time is not None]
     avg_response_time = round(sum(response_times) / len(response_times), 1) if response_times else None
     avg_response_time_display = f"{avg_response_time}h" if avg_response_time is not None else "—"
     
-    notifications = Notification.objects.filter(recipient=user).order_by('-created_at')[:5]
+    notifications, _ = notification_feed(user_id, limit=5)
     
-    # --- DYNAMIC TROUBLESHOOTING GUIDES FROM FAQ ---
+    return {
+        'recent_tickets': recent_tickets,
+        'avg_response_time_display': avg_response_time_display,
+        'notifications': notifications,
+        **customer_ticket_stats(user_id, start_of_month),
+    }
+
+
+@cached(FAQ)
+def get_dashboard_guides():
+    """
+    Troubleshooting guides shown on the user dashboard
+    """
     try:
-        from .models import FAQItem
         troubleshooting_guides = FAQItem.objects.filter(
             is_active=True,
             show_in_dashboard=True
@@ -2101,21 +1989,44 @@ def user_dashboard_view(request):
                 'faq_url': f"{reverse('help_center')}#{guide.category.slug if guide.category else 'general'}"
             })
     except Exception as e:
-        print(f"⚠️ Dashboard FAQ error: {e}")
+        logger.warning("Dashboard FAQ error: %s", e)
         guide_data = []
     
+    return guide_data
+
+
+@login_required
+def user_dashboard_view(request):
+    """
+    Display user dashboard with dynamic troubleshooting guides from FAQ
+    """
+    user = request.user
+
+    # Get or create user profile
+    profile, created = UserProfile.objects.get_or_create(
+        user=user,
+        defaults={'is_technician': False}
+    )
+
+    if created:
+        messages.info(request, 'Your profile has been created.')
+
+    # Check if user is a technician and redirect
+    if profile.is_technician:
+        messages.info(request, 'Redirecting to technician dashboard.')
+        return redirect('technician_dashboard')
+
+    start_of_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    ticket_data = get_user_dashboard_tickets(user.id, start_of_month)
+    guide_data = get_dashboard_guides()
+    
     context = {
         'user': user,
         'profile': profile,
         'title': 'User Dashboard - FixIT',
         
         # Ticket data
-        'recent_tickets': recent_tickets,
-        'open_tickets_count': open_tickets_count,
-        'resolved_this_month_count': resolved_this_month_count,
-        'avg_response_time_display': avg_response_time_display,
-        'notifications': notifications,
-        'total_tickets_created': total_tickets_created,
+        **ticket_data,
         
         # Dynamic troubleshooting guides
         'troubleshooting_guides': guide_data,
@@ -2153,45 +2064,12 @@ def password_reset_view(request):
             # of whether the user exists to prevent account enumeration.
             return redirect('password_reset_done')
 
-        # --- Begin Secure Email Sending Logic ---
-
-        # 3. Generate Secure Token and UID
-        # UID is the user ID encoded, Token is the time-limited security key
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        token = default_token_generator.make_token(user)
-
-        # 4. Construct the Live Reset Link (Uses your custom URL names)
-        domain = request.get_host()
+        # 3. Queue the email. The job stores only the user id; the reset
+        # token and link are made when it runs (accounts.tasks)
         protocol = 'http'  # Change this to 'https' in your production environment!
+        enqueue(send_password_reset_email, user_id=user.pk, protocol=protocol, domain=request.get_host())
 
-        # This URL relies on your urls.py having the name 'password_reset_confirm'
-        reset_url = f"{protocol}://{domain}/accounts/reset/{uid}/{token}/"
-
-        # 5. Render Email Content (Using templates/registration/password_reset_email.html)
-        email_context = {
-            'user': user,
-            'reset_url': reset_url,
-            'protocol': protocol,
-            'domain': domain,
-            'uid': uid,
-            'token': token,
-        }
-
-        # Ensure you have created templates/registration/password_reset_email.html
-        html_message = render_to_string('accounts/password_reset_email.html', email_context)
-
-        # 6. Send Email using SMTP Configuration
-        send_mail(
-            subject="Password Reset for FixIT",
-            # Use the plain message as a fallback, and the HTML message for styling
-            message=f"Please use this link to reset your password: {reset_url}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-            html_message=html_message
-        )
-
-        # 7. Redirect to the Done page (Notification that the email was sent)
+        # 4. Redirect to the Done page (Notification that the email was sent)
         return redirect('password_reset_done')
 
     # Render the initial form on GET request
@@ -2339,41 +2217,15 @@ def user_profile_view(request):
         # Handle profile picture upload
         uploaded_file = request.FILES['profile_picture']
 
-        # Validate file size
-        if uploaded_file.size > 5 * 1024 * 1024:
-            messages.error(request, 'Image file too large ( > 5MB )')
-            return redirect('user_profile')
-
-        # Validate file type
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
-        file_name = uploaded_file.name.lower()
-        file_extension = '.' + file_name.split('.')[-1] if '.' in file_name else ''
-
-        if file_extension not in valid_extensions:
-            messages.error(request, 'Please upload a valid image file (JPG, PNG, GIF, BMP)')
-            return redirect('user_profile')
-
         try:
-            import uuid
-
-            # Generate unique filename
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-
-            # Save to configured storage and store reference in database
-            request.user.profile.profile_picture.save(unique_filename, uploaded_file)
-            request.user.profile.save()
-
-            print(f"✅ Profile picture saved to Supabase: {unique_filename}")
+            save_profile_picture(request.user.profile, uploaded_file)
             messages.success(request, 'Your profile picture has been updated successfully!')
-
+        except InvalidImage as e:
+            messages.error(request, f'Please upload a valid image file (JPG, PNG, GIF, BMP, WebP): {e}')
         except Exception as e:
-            print(f"❌ Error saving profile picture: {e}")
+            logger.exception("Error saving profile picture")
             messages.error(request, 'Error updating profile picture. Please try again.')
 
-            print(f"✅ Profile picture filename: {request.user.profile.profile_picture}")
-            print(f"✅ Profile picture URL: {request.user.profile.profile_picture.url}")
-            print(f"✅ Full image URL: https://{request.user.profile.profile_picture.url}")
-
         return redirect('user_profile')
 
     # Normal GET request
@@ -2481,7 +2333,7 @@ def user_settings_view(request):
                     tech = Technician.objects.filter(user_profile=user.profile).first()
                     if tech:
                         tech.bio = bio
-                        tech.save()
+                        tech.save(update_fields=['bio', 'updated_at'])
                 except Exception:
                     pass
             user.save()
@@ -2517,14 +2369,17 @@ def user_settings_view(request):
                 profile.city = city
             if country:
                 profile.country = country
-            if 'profile_picture' in request.FILES:
-                import uuid
-                uploaded_file = request.FILES['profile_picture']
-                unique_filename = f"{uuid.uuid4()}_{uploaded_file.name}"
-                profile.profile_picture.save(unique_filename, uploaded_file)
-
-            user.save()
-            profile.save()
+            # The old picture is deleted only once the profile is saved
+            with transaction.atomic():
+                if 'profile_picture' in request.FILES:
+                    try:
+                        save_profile_picture(profile, request.FILES['profile_picture'], save=False)
+                    except InvalidImage as e:
+                        messages.error(request, f'Please upload a valid image file (JPG, PNG, GIF, BMP, WebP): {e}')
+                        return redirect(f"{reverse('user_settings')}?tab=profile")
+
+                user.save()
+                profile.save()
             messages.success(request, 'Profile details updated.')
             return redirect(f"{reverse('user_settings')}?tab=profile")
 
@@ -2555,7 +2410,7 @@ def technician_settings_view(request):
                     tech = Technician.objects.filter(user_profile=user.profile).first()
                     if tech:
                         tech.bio = bio
-                        tech.save()
+                        tech.save(update_fields=['bio', 'updated_at'])
                 except Exception:
                     pass
             user.save()
@@ -2591,14 +2446,17 @@ def technician_settings_view(request):
                 profile.city = city
             if country:
                 profile.country = country
-            if 'profile_picture' in request.FILES:
-                import uuid
-                uploaded_file = request.FILES['profile_picture']
-                unique_filename = f"{uuid.uuid4()}_{uploaded_file.name}"
-                profile.profile_picture.save(unique_filename, uploaded_file)
-
-            user.save()
-            profile.save()
+            # The old picture is deleted only once the profile is saved
+            with transaction.atomic():
+                if 'profile_picture' in request.FILES:
+                    try:
+                        save_profile_picture(profile, request.FILES['profile_picture'], save=False)
+                    except InvalidImage as e:
+                        messages.error(request, f'Please upload a valid image file (JPG, PNG, GIF, BMP, WebP): {e}')
+                        return redirect(f"{reverse('technician_settings')}?tab=profile")
+
+                user.save()
+                profile.save()
             messages.success(request, 'Profile details updated.')
             return redirect(f"{reverse('technician_settings')}?tab=profile")
 
@@ -2684,6 +2542,12 @@ def start_bot_chat(request):
     return redirect(f'/user/messages/?chat={chat_session.id}')
 
 
+@cached(FAQ)
+def get_help_center_categories():
+    """FAQ categories with their FAQs, as shown on the help center"""
+    return list(FAQCategory.objects.prefetch_related('faqs').order_by('order'))
+
+
 # In views.py, update help_center_view
 @login_required
 def help_center_view(request):
@@ -2692,7 +2556,7 @@ def help_center_view(request):
     """
     try:
         # Get all categories with their FAQs
-        categories = FAQCategory.objects.prefetch_related('faqs').order_by('order')
+        categories = get_help_center_categories()
         
         context = {
             'title': 'Help Center - FixIT',
@@ -2700,14 +2564,14 @@ def help_center_view(request):
         }
         
     except Exception as e:
-        print(f"⚠️ Help center error: {e}")
+        logger.warning("Help center error: %s", e)
         # Return empty categories for fallback
         context = {
             'title': 'Help Center - FixIT',
             'categories': [],
         }
     
-    return render(request, 'accounts/FAQ_Page.html', context)
+    return render(request, 'accounts/FAQ_page.html', context)
 
 @login_required
 def get_faq_detail(request, faq_id):
@@ -2784,8 +2648,7 @@ def generate_bot_response(message):
             'buttons': get_quick_action_buttons(),
             'related_faqs': []  # Make sure this is included
         }
-        print(f"🔧 DEBUG: Generated greeting response with {len(response.get('buttons', []))} buttons")
-        print(f"🔧 DEBUG: Button data: {response.get('buttons')}")
+        logger.debug("Generated greeting response", extra={'buttons': len(response['buttons'])})
         return response
     
     
@@ -2822,197 +2685,59 @@ def search_faq_database(query):
     """
     Search FAQ database for relevant answers
     """
-    from .models import FAQItem
-    
-    # First, try exact keyword matching
-    faq_items = FAQItem.objects.filter(is_active=True)
-    
-    # Split query into words
-    query_words = query.lower().split()
-    
-    scored_items = []
-    
-    for faq in faq_items:
-        score = 0
-        
-        # Check if query words are in question
-        question_lower = faq.question.lower()
-        for word in query_words:
-            if len(word) > 3 and word in question_lower:
-                score += 3
-        
-        # Check if query words are in keywords
-        if faq.keywords:
-            keywords = [k.strip().lower() for k in faq.keywords.split(',')]
-            for word in query_words:
-                if word in keywords:
-                    score += 5
-        
-        # Check short question
-        if faq.short_question and query in faq.short_question.lower():
-            score += 8
-        
-        # Check answer
-        if query in faq.answer.lower():
-            score += 2
-        
-        # Add bot priority
-        score += faq.bot_priority
-        
-        if score > 0:
-            scored_items.append((faq, score))
-    
-    # Sort by score (highest first)
-    scored_items.sort(key=lambda x: x[1], reverse=True)
-    
-    return [item[0] for item in scored_items[:3]]  # Return top 3 matches
-
-
-def get_quick_action_buttons():
-    """
-    Get comprehensive quick action buttons for bot chat
-    """
-    from .models import FAQItem, FAQCategory
-    
-    buttons = []
-    
-    # Get categories in order
-    categories = FAQCategory.objects.all().order_by('order')[:3]  # Top 3 categories
-    
-    for category in categories:
-        # Get 2 top FAQs from each category
-        category_faqs = FAQItem.objects.filter(
-            category=category,
-            is_active=True,
-            show_in_bot_buttons=True
-        ).order_by('bot_priority', 'order')[:2]
-        
-        for faq in category_faqs:
-            buttons.append({
-                'text': faq.short_question,
-                'faq_id': faq.id,
-                'category': category.name,
-                'icon': category.icon,
-                'action': f'faq_{faq.id}'
-            })
-    
-    # Add general action buttons
-    buttons.extend([
-        {'text': '🏠 Main Menu', 'action': 'menu', 'icon': 'home'},
-        {'text': '📝 Create Ticket', 'action': 'create_ticket', 'icon': 'ticket-alt'},
-        {'text': '👨‍💻 Contact Tech', 'action': 'contact_technician', 'icon': 'user-cog'},
-        {'text': '📋 All FAQs', 'action': 'view_faqs', 'icon': 'book'},
-    ])
-    
-    return buttons
-
-def get_related_faqs(faq_item):
-    """
-    Get related FAQ items with proper formatting
-    """
-    from .models import FAQItem
-    
-    related = FAQItem.objects.filter(
-        category=faq_item.category,
-        is_active=True
-    ).exclude(id=faq_item.id).order_by('order')[:5]
-    
-    # Format for template
-    return [{
-        'id': faq.id,
-        'short_question': faq.short_question,
-        'question': faq.question,
-    } for faq in related]
-
-def get_related_buttons(category):
-    """
-    Get buttons related to a specific category
-    """
-    from .models import FAQItem
-    
-    faqs = FAQItem.objects.filter(
-        category=category,
-        is_active=True,
-        show_in_bot_buttons=True
-    ).order_by('order')[:5]
-    
-    buttons = []
-    for faq in faqs:
-        buttons.append({
-            'text': faq.short_question,
-            'faq_id': faq.id
-        })
-    
-    return buttons
+    return get_faq_index().search(query)  # Return top 3 matches
 
 
 def get_keyword_response(query):
     """
     Handle specific keyword patterns
     """
-    responses = {
-        'thank': {
-            'type': 'thanks',
-            'message': "You're welcome! 😊 I'm glad I could help. Is there anything else you need assistance with today?",
-            'buttons': get_quick_action_buttons()
-        },
-        'bye': {
-            'type': 'goodbye',
-            'message': "Goodbye! 👋 Don't hesitate to reach out if you need more help. Have a great day!",
-            'buttons': []
-        },
-        'menu': {
-            'type': 'menu',
-            'message': "🏠 **Main Menu**\n\nHow can I help you today?",
-            'buttons': get_quick_action_buttons()
-        },
-        'create_ticket': {
-            'type': 'create_ticket',
-            'message': "📝 **Create Support Ticket**\n\nI can help you create a support ticket! Would you like me to guide you through the process?",
-            'buttons': [
-                {'text': 'Yes, create a ticket', 'action': 'start_ticket_creation'},
-                {'text': 'No, go back', 'action': 'menu'}
-            ]
-        },
-        'contact_technician': {
-            'type': 'contact_technician',
-            'message': "👨‍💻 **Contact Technician**\n\nI can help you find and contact available technicians. Would you like to browse the technician directory?",
-            'buttons': [
-                {'text': 'Browse Technicians', 'action': 'technician_directory'},
-                {'text': 'No, go back', 'action': 'menu'}
-            ]
-        },
-        'view_faqs': {
-            'type': 'view_faqs',
-            'message': "📋 **FAQ Categories**\n\nHere are our main help categories. Click any category to see related FAQs:",
-            'buttons': get_category_buttons()
-        }
-    }
-    
-    for keyword, response in responses.items():
+    # Responses are built lazily so only the matched one touches the button cache
+    for keyword, build_response in KEYWORD_RESPONSES:
         if keyword in query:
-            return response
+            return build_response()
     
     return None
 
 
-def get_category_buttons():
-    """
-    Get FAQ category buttons
-    """
-    from .models import FAQCategory
-    
-    categories = FAQCategory.objects.all().order_by('order')
-    
-    buttons = []
-    for category in categories:
-        buttons.append({
-            'text': category.name,
-            'icon': category.icon,
-            'action': f'category_{category.slug}'
-        })
-    
-    return buttons
+KEYWORD_RESPONSES = (
+    ('thank', lambda: {
+        'type': 'thanks',
+        'message': "You're welcome! 😊 I'm glad I could help. Is there anything else you need assistance with today?",
+        'buttons': get_quick_action_buttons()
+    }),
+    ('bye', lambda: {
+        'type': 'goodbye',
+        'message': "Goodbye! 👋 Don't hesitate to reach out if you need more help. Have a great day!",
+        'buttons': []
+    }),
+    ('menu', lambda: {
+        'type': 'menu',
+        'message': "🏠 **Main Menu**\n\nHow can I help you today?",
+        'buttons': get_quick_action_buttons()
+    }),
+    ('create_ticket', lambda: {
+        'type': 'create_ticket',
+        'message': "📝 **Create Support Ticket**\n\nI can help you create a support ticket! Would you like me to guide you through the process?",
+        'buttons': [
+            {'text': 'Yes, create a ticket', 'action': 'start_ticket_creation'},
+            {'text': 'No, go back', 'action': 'menu'}
+        ]
+    }),
+    ('contact_technician', lambda: {
+        'type': 'contact_technician',
+        'message': "👨‍💻 **Contact Technician**\n\nI can help you find and contact available technicians. Would you like to browse the technician directory?",
+        'buttons': [
+            {'text': 'Browse Technicians', 'action': 'technician_directory'},
+            {'text': 'No, go back', 'action': 'menu'}
+        ]
+    }),
+    ('view_faqs', lambda: {
+        'type': 'view_faqs',
+        'message': "📋 **FAQ Categories**\n\nHere are our main help categories. Click any category to see related FAQs:",
+        'buttons': get_category_buttons()
+    }),
+)
 
 
 from django.shortcuts import render, redirect
@@ -3052,12 +2777,21 @@ def my_tickets(request):
 from django.shortcuts import render
 @login_required
 def available_technicians(request):
-    tech_qs = Technician.objects.select_related('user_profile__user').prefetch_related('specialties').filter(is_available=True)
+    tech_qs = Technician.objects.select_related('user_profile__user', 'search_document').filter(is_available=True)
+    try:
+        page, next_cursor = keyset_page(
+            tech_qs, TECHNICIAN_DIRECTORY_ORDERINGS['rating'],
+            request.GET.get('cursor') or None, TECHNICIAN_DIRECTORY_PAGE_SIZE
+        )
+    except InvalidCursor:
+        page, next_cursor = keyset_page(
+            tech_qs, TECHNICIAN_DIRECTORY_ORDERINGS['rating'], None, TECHNICIAN_DIRECTORY_PAGE_SIZE
+        )
     technicians = []
-    for t in tech_qs:
+    for t in page:
         user_obj = t.user_profile.user
         name = user_obj.get_full_name() or user_obj.username
-        specialties = t.get_specialties_list()
+        specialties = get_directory_specialties(t)
         technicians.append({
             'id': user_obj.id,
             'name': name,
@@ -3068,9 +2802,11 @@ def available_technicians(request):
     return render(request, 'accounts/available_technicians.html', {
         'technicians': technicians,
         'category': category,
+        'next_cursor': next_cursor,
     })
 
 
+@query_budget(8)
 @login_required
 def my_tickets(request):
     from django.db.models import Q
@@ -3085,8 +2821,8 @@ def my_tickets(request):
     if status_filter in allowed_statuses:
         tickets_qs = tickets_qs.filter(status=status_filter)
 
-    tickets = tickets_qs.prefetch_related(
-        'assistance_requests__technician__user_profile__user'
+    tickets = tickets_qs.select_related(
+        'technician__profile__technician_profile'
     ).order_by('-created_at')
 
     ticket_data = []
@@ -3095,9 +2831,9 @@ def my_tickets(request):
             'ticket': ticket,
             'assigned_technician': None
         }
-        ar = ticket.assistance_requests.first()
-        if ar and ar.technician:
-            info['assigned_technician'] = ar.technician
+        if ticket.technician:
+            profile = getattr(ticket.technician, 'profile', None)
+            info['assigned_technician'] = getattr(profile, 'technician_profile', None)
         ticket_data.append(info)
 
     return render(request, 'accounts/my_tickets.html', {
@@ -3128,12 +2864,12 @@ def faq_view(request):
     context = {
         'title': 'Help Center - FixIT'
     }
-    return render(request, 'accounts/FAQ_Page.html', context)
+    return render(request, 'accounts/FAQ_page.html', context)
 
 #TECHNICIAN NOTIFICATION
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from .models import Ticket, Notifications_Technician
+from .models import Ticket
 from django.shortcuts import get_object_or_404, redirect
 
 @login_required
@@ -3145,12 +2881,8 @@ def contact_technician(request, ticket_id, technician_id):
     ticket.technician = technician
     ticket.save()
 
-    # Create notification for technician
-    Notifications_Technician.objects.create(
-        technician=technician,
-        message=f"New ticket assigned: {ticket.title}",
-        ticket=ticket
-    )
+    # Create notification for technician (Ticket is not a CreateTicket, so no link)
+    notify(technician.id, f"New ticket assigned: {ticket.title}", sender_id=request.user.id)
 
     messages.success(request, "Technician has been notified!")
     return redirect('messages_view')  # or wherever you want to redirect
@@ -3164,15 +2896,18 @@ def delete_ticket(request, ticket_id):
     ticket.delete()
     return redirect("my_tickets")  # redirect to your ticket list page
 
+def assigned_technician_profile(ticket):
+    """The Technician assigned to a ticket (CreateTicket.technician), or None"""
+    if ticket.technician_id is None:
+        return None
+    return Technician.objects.filter(user_profile__user_id=ticket.technician_id).first()
+
 @login_required
 def ticket_details_view(request, ticket_id):
     """View ticket details for regular users"""
     ticket = get_object_or_404(CreateTicket, id=ticket_id, user=request.user)
-    assigned_technician = None
-    ar = ticket.assistance_requests.first()
-    if ar and ar.technician:
-        assigned_technician = ar.technician
-    
+    assigned_technician = assigned_technician_profile(ticket)
+
     # Fetch the current user's review for this ticket if available
     user_review = None
     if assigned_technician:
@@ -3196,10 +2931,9 @@ def technician_ticket_details_view(request, ticket_id):
     ticket = get_object_or_404(
         CreateTicket, 
         id=ticket_id,
-        assistance_requests__technician__user_profile__user=request.user
+        technician=request.user
     )
-    ar = ticket.assistance_requests.first()
-    assigned_technician = ar.technician if ar and ar.technician else None
+    assigned_technician = assigned_technician_profile(ticket)
     review = None
     if assigned_technician:
         review = TechnicianReview.objects.filter(
@@ -3222,44 +2956,40 @@ def resolve_ticket(request, ticket_id):
     ticket = get_object_or_404(
         CreateTicket,
         id=ticket_id,
-        assistance_requests__technician__user_profile__user=user
+        technician=user
     )
     if request.method == 'POST':
         if ticket.status == 'resolved':
-            ar = ticket.assistance_requests.first()
-            assigned_technician = ar.technician if ar and ar.technician else None
             has_review = TechnicianReview.objects.filter(ticket=ticket).exists()
             if has_review:
                 messages.error(request, "Cannot unresolve this ticket because a review has already been submitted.")
                 return redirect('technician_tickets')
-            ticket.status = 'open'
-            ticket.save()
-            Notifications_Technician.objects.create(
-                technician=user,
-                message=f"Ticket #{ticket.id} reopened",
-                ticket=None
-            )
-            Notification.objects.create(
-                recipient=ticket.user,
-                sender=user,
-                ticket=ticket,
-                message=f"Your ticket #{ticket.id} '{ticket.title}' was reopened."
-            )
+            with transaction.atomic():
+                ticket.status = 'open'
+                ticket.save()
+                enqueue(send_notifications, notifications=[
+                    {'recipient_id': user.id, 'message': f"Ticket #{ticket.id} reopened"},
+                    {
+                        'recipient_id': ticket.user_id,
+                        'sender_id': user.id,
+                        'ticket_id': ticket.id,
+                        'message': f"Your ticket #{ticket.id} '{ticket.title}' was reopened.",
+                    },
+                ])
             messages.success(request, f"Ticket #{ticket.id} set to Open.")
         else:
-            ticket.status = 'resolved'
-            ticket.save()
-            Notifications_Technician.objects.create(
-                technician=user,
-                message=f"Ticket #{ticket.id} marked as resolved",
-                ticket=None
-            )
-            Notification.objects.create(
-                recipient=ticket.user,
-                sender=user,
-                ticket=ticket,
-                message=f"Your ticket #{ticket.id} '{ticket.title}' has been resolved. Please provide feedback and a rating."
-            )
+            with transaction.atomic():
+                ticket.status = 'resolved'
+                ticket.save()
+                enqueue(send_notifications, notifications=[
+                    {'recipient_id': user.id, 'message': f"Ticket #{ticket.id} marked as resolved"},
+                    {
+                        'recipient_id': ticket.user_id,
+                        'sender_id': user.id,
+                        'ticket_id': ticket.id,
+                        'message': f"Your ticket #{ticket.id} '{ticket.title}' has been resolved. Please provide feedback and a rating.",
+                    },
+                ])
             messages.success(request, f"Ticket #{ticket.id} set to Resolved and notifications sent.")
         return redirect('technician_tickets')
     return redirect('technician_tickets')
@@ -3270,7 +3000,7 @@ def start_work_ticket(request, ticket_id):
     ticket = get_object_or_404(
         CreateTicket,
         id=ticket_id,
-        assistance_requests__technician__user_profile__user=user
+        technician=user
     )
     if request.method == 'POST':
         if ticket.status == 'resolved':
@@ -3279,19 +3009,18 @@ def start_work_ticket(request, ticket_id):
         if ticket.status == 'in_progress':
             messages.info(request, f"Ticket #{ticket.id} is already in progress.")
             return redirect('technician_tickets')
-        ticket.status = 'in_progress'
-        ticket.save()
-        Notifications_Technician.objects.create(
-            technician=user,
-            message=f"Started work on ticket #{ticket.id}",
-            ticket=None
-        )
-        Notification.objects.create(
-            recipient=ticket.user,
-            sender=user,
-            ticket=ticket,
-            message=f"Your ticket #{ticket.id} '{ticket.title}' is now being worked on."
-        )
+        with transaction.atomic():
+            ticket.status = 'in_progress'
+            ticket.save()
+            enqueue(send_notifications, notifications=[
+                {'recipient_id': user.id, 'message': f"Started work on ticket #{ticket.id}"},
+                {
+                    'recipient_id': ticket.user_id,
+                    'sender_id': user.id,
+                    'ticket_id': ticket.id,
+                    'message': f"Your ticket #{ticket.id} '{ticket.title}' is now being worked on.",
+                },
+            ])
         messages.success(request, f"Ticket #{ticket.id} set to In Progress.")
         return redirect('technician_tickets')
     return redirect('technician_tickets')
@@ -3307,12 +3036,11 @@ def submit_ticket_review(request, ticket_id):
         messages.error(request, 'You can only rate after the ticket is resolved.')
         return redirect('ticket_details', ticket_id=ticket_id)
 
-    ar = ticket.assistance_requests.first()
-    if not ar or not ar.technician:
+    technician = assigned_technician_profile(ticket)
+    if technician is None:
         messages.error(request, 'No technician assigned to this ticket.')
         return redirect('ticket_details', ticket_id=ticket_id)
 
-    technician = ar.technician
     try:
         rating = int(request.POST.get('rating', ''))
     except ValueError:
@@ -3324,34 +3052,29 @@ def submit_ticket_review(request, ticket_id):
         messages.error(request, 'Rating must be between 1 and 5.')
         return redirect('ticket_details', ticket_id=ticket_id)
 
-    # Create or update review
-    review, created = TechnicianReview.objects.get_or_create(
-        technician=technician,
-        user=request.user,
-        ticket=ticket,
-        defaults={
-            'rating': rating,
-            'comment': comment
-        }
-    )
-    if not created:
-        # adjust average rating without changing review_count
-        old_rating = review.rating
-        review.rating = rating
-        review.comment = comment
-        review.save()
-        if technician.review_count > 0:
-            technician.average_rating = ((technician.average_rating * technician.review_count) - old_rating + rating) / technician.review_count
-            technician.save()
-    else:
-        technician.update_rating(rating)
+    # Create or update review; accounts.ratings counts the rating into the technician's aggregates
+    with transaction.atomic():
+        review, created = TechnicianReview.objects.select_for_update().get_or_create(
+            technician=technician,
+            user=request.user,
+            ticket=ticket,
+            defaults={
+                'rating': rating,
+                'comment': comment
+            }
+        )
+        if not created:
+            review.rating = rating
+            review.comment = comment
+            review.save(update_fields=['rating', 'comment', 'updated_at'])
 
     # Notify technician
-    Notifications_Technician.objects.create(
-        technician=technician.user_profile.user,
-        message=f"New review received: {rating} stars",
-        ticket=None
-    )
+    enqueue(send_notifications, notifications=[{
+        'recipient_id': technician.user_profile.user_id,
+        'sender_id': request.user.id,
+        'ticket_id': ticket.id,
+        'message': f"New review received: {rating} stars",
+    }])
 
     messages.success(request, 'Thank you for your feedback!')
     return redirect('ticket_details', ticket_id=ticket_id)
@@ -3394,11 +3117,12 @@ def accept_request_view(request, request_id):
             ticket = assistance_request.ticket
 
             # CRITICAL CHANGE: Assign the Django User object
-            ticket.technician = technician_user
-            ticket.status = 'assigned'
-            ticket.save()
+            ticket.assign_technician(technician_user, status='assigned')
+
+            # c. Make sure the customer can reach the technician straight away
+            ensure_assistance_request_chat(assistance_request)
 
-            # c. OPTIONAL: Reject any other pending requests for this same ticket
+            # d. OPTIONAL: Reject any other pending requests for this same ticket
             AssistanceRequest.objects.filter(
                 ticket=ticket,
                 status='pending'
@@ -3438,12 +3162,9 @@ def debug_upload_flow(request):
         test_filename = f"debug_upload_test_{request.user.id}.txt"
         test_content = b"This is a test upload to see where files go"
 
-        print(f"🧪 DEBUG: Attempting to save {test_filename}")
-
         # Save file
         saved_path = default_storage.save(test_filename, ContentFile(test_content))
         debug_info['saved_path'] = saved_path
-        print(f"✅ DEBUG: File saved as: {saved_path}")
 
         # Check if it's a local filesystem path
         if hasattr(default_storage, 'location'):
@@ -3454,20 +3175,16 @@ def debug_upload_flow(request):
             local_path = os.path.join(storage_location, saved_path) if storage_location else saved_path
             debug_info['local_path'] = local_path
             debug_info['local_exists'] = os.path.exists(local_path)
-            print(f"🔍 DEBUG: Local path: {local_path}, Exists: {debug_info['local_exists']}")
 
         # Check if file exists in storage
         debug_info['storage_exists'] = default_storage.exists(saved_path)
-        print(f"🔍 DEBUG: Storage exists: {debug_info['storage_exists']}")
 
         # Try to get URL
         try:
             url = default_storage.url(saved_path)
             debug_info['generated_url'] = url
-            print(f"🌐 DEBUG: Generated URL: {url}")
         except Exception as e:
             debug_info['url_error'] = str(e)
-            print(f"❌ DEBUG: URL error: {e}")
 
         # Clean up
         try:
@@ -3478,7 +3195,7 @@ def debug_upload_flow(request):
 
     except Exception as e:
         debug_info['upload_test_error'] = str(e)
-        print(f"❌ DEBUG: Upload test failed: {e}")
+        logger.warning("Debug upload test failed: %s", e)
 
     return JsonResponse(debug_info)
 
@@ -3515,86 +3232,37 @@ def debug_fix_chats(request):
         return JsonResponse({'error': 'Not a technician'})
     
     user = request.user
-    print(f"🔧 DEBUG FIX: Starting chat fix for technician {user.username}")
-    
-    # Get all assigned tickets
-    assigned_tickets = CreateTicket.objects.filter(
-        assistance_requests__technician__user_profile__user=user
-    ).distinct()
-    
-    print(f"🔧 DEBUG FIX: Found {assigned_tickets.count()} assigned tickets")
+    created_chats = reconcile_ticket_chats(technician_user=user)
+    created_count = len(created_chats)
+    logger.info("Chat fix created %d chat sessions for technician %s", created_count, user.id)
+    
+    # Report every assigned ticket with its chat in one query
+    assigned_tickets = CreateTicket.objects.filter(technician=user).annotate(
+        chat_id=Subquery(ChatSession.objects.filter(
+            ticket=OuterRef('pk'),
+            technician=user
+        ).values('id')[:1])
+    )
+    created_ids = {chat.id for chat in created_chats}
     
-    created_count = 0
     ticket_details = []
-    
     for ticket in assigned_tickets:
-        print(f"🔧 DEBUG FIX: Processing ticket {ticket.id}: {ticket.title}")
-        
-        # Check if chat session already exists
-        existing_chat = ChatSession.objects.filter(
-            technician=user,
-            ticket=ticket
-        ).first()
-        
-        if existing_chat:
-            print(f"🔧 DEBUG FIX: Chat already exists for ticket {ticket.id} - Chat ID: {existing_chat.id}")
-            ticket_details.append({
-                'ticket_id': ticket.id,
-                'ticket_title': ticket.title,
-                'chat_exists': True,
-                'chat_id': existing_chat.id
-            })
-        else:
-            # Create new chat session
-            try:
-                chat_session = ChatSession.objects.create(
-                    user=ticket.user,
-                    technician=user,
-                    ticket=ticket,
-                    chat_type='user_tech',
-                    status='active',
-                    last_message_at=timezone.now()
-                )
-                
-                # Create initial message
-                initial_content = f"Support ticket created: {ticket.title}\n\nDescription: {ticket.description}\nCategory: {ticket.category}\nPriority: {ticket.priority}"
-                
-                Message.objects.create(
-                    chat_session=chat_session,
-                    sender=ticket.user,
-                    receiver=user,
-                    content=initial_content,
-                    message_type='user_to_tech',
-                    created_at=timezone.now()
-                )
-                
-                created_count += 1
-                print(f"🔧 DEBUG FIX: Created chat session {chat_session.id} for ticket {ticket.id}")
-                
-                ticket_details.append({
-                    'ticket_id': ticket.id,
-                    'ticket_title': ticket.title,
-                    'chat_exists': False,
-                    'chat_created': True,
-                    'chat_id': chat_session.id
-                })
-                
-            except Exception as e:
-                print(f"❌ DEBUG FIX: Error creating chat for ticket {ticket.id}: {e}")
-                ticket_details.append({
-                    'ticket_id': ticket.id,
-                    'ticket_title': ticket.title,
-                    'error': str(e)
-                })
-    
-    print(f"🔧 DEBUG FIX: Created {created_count} new chat sessions")
+        detail = {
+            'ticket_id': ticket.id,
+            'ticket_title': ticket.title,
+            'chat_exists': ticket.chat_id not in created_ids,
+            'chat_id': ticket.chat_id,
+        }
+        if ticket.chat_id in created_ids:
+            detail['chat_created'] = True
+        ticket_details.append(detail)
     
     return JsonResponse({
         'success': True,
         'created_count': created_count,
-        'total_tickets': assigned_tickets.count(),
+        'total_tickets': len(ticket_details),
         'ticket_details': ticket_details,
-        'message': f'Created {created_count} missing chat sessions out of {assigned_tickets.count()} assigned tickets'
+        'message': f'Created {created_count} missing chat sessions out of {len(ticket_details)} assigned tickets'
     })
 @login_required
 def debug_technician_data(request):
@@ -3629,9 +3297,7 @@ def debug_technician_data(request):
         })
     
     # Get tickets
-    tickets = CreateTicket.objects.filter(
-        assistance_requests__technician__user_profile__user=user
-    ).distinct()
+    tickets = CreateTicket.objects.filter(technician=user)
     
     for ticket in tickets:
         data['tickets'].append({
@@ -3660,19 +3326,23 @@ def debug_technician_data(request):
 @login_required
 def debug_request_assistance(request):
     """Debug endpoint to see what's being received"""
-    print("=== DEBUG REQUEST ASSISTANCE ===")
-    print(f"Method: {request.method}")
-    print(f"Content-Type: {request.content_type}")
-    print(f"Body: {request.body}")
-    print(f"User: {request.user}")
-    print(f"POST data: {request.POST}")
-
+    # Sizes and keys only; bodies can carry personal data
+    fields = []
     if request.body:
         try:
             data = json.loads(request.body.decode('utf-8'))
-            print(f"JSON data: {data}")
+            fields = sorted(data) if isinstance(data, dict) else []
         except Exception as e:
-            print(f"JSON decode error: {e}")
+            logger.debug("Debug request assistance: invalid JSON: %s", e)
+    logger.debug(
+        "Debug request assistance",
+        extra={
+            'method': request.method,
+            'content_type': request.content_type,
+            'body_bytes': len(request.body),
+            'json_fields': fields,
+        },
+    )
 
     return JsonResponse({
         'success': True,
@@ -3,6 +3,12 @@ ASGI config for fixit_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The chat pages receive message updates as server-sent events from
+``accounts.views.chat_events``, which streams for as long as a chat is open.
+Those streams only work when the project is served through this module by an
+ASGI server (e.g. ``uvicorn fixit_project.asgi:application``); under WSGI the
+endpoint answers 204 and the pages fall back to periodic reloads.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
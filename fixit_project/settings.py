@@ -194,6 +194,7 @@ import os
 from pathlib import Path
 import dj_database_url
 from django.contrib import staticfiles
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
  
 # Load environment variables from .env (for local dev)
@@ -251,10 +252,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # for static files on Render
+    'accounts.middleware.RequestMetricsMiddleware',  # per-route metrics (accounts/metrics.py)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.SessionRefreshMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -266,7 +269,8 @@ ROOT_URLCONF = 'fixit_project.urls'
 # =====================
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for the request metrics
+        'BACKEND': 'accounts.metrics.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True, #DEAFAULT WAS TRUE
         'OPTIONS': {
@@ -396,14 +400,118 @@ SESSION_COOKIE_HTTPONLY = True      # JS can't read session cookies
 SESSION_COOKIE_SAMESITE = 'Lax'     # Protects against CSRF
 SESSION_COOKIE_AGE = 6 * 60 * 60    # 6 hours
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Sessions are re-saved only when close to expiring (accounts.middleware.
+# SessionRefreshMiddleware) instead of on every request
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_WINDOW = 60 * 60    # extend once less than 1 hour is left
+# SESSION_MODE: cached_db (reads from the cache, writes through to the
+# database), db, or signed_cookies (no server-side session storage at all).
+# SESSION_ENGINE is set under CACHING, since cached_db needs a shared cache.
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'db': 'django.contrib.sessions.backends.db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
  
 # Secure cookies only in production
 if not DEBUG:
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
  
+# =====================
+# CACHING
+# =====================
+# Shared Redis cache in production (REDIS_URL=redis://host:6379/0), per-process
+# local memory otherwise. Page data is cached through accounts/caching.py.
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'fixit',
+            'TIMEOUT': 300,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'fixit',
+            'TIMEOUT': 300,
+        }
+    }
+
+# cached_db defaults on only with Redis. With a per-process cache each worker
+# would keep serving a session after another worker logged it out or flushed it.
+SESSION_MODE = os.getenv('SESSION_MODE', 'cached_db' if REDIS_URL else 'db')
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f"SESSION_MODE must be one of {', '.join(SESSION_ENGINES)}")
+if SESSION_MODE == 'cached_db' and CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    raise ImproperlyConfigured('SESSION_MODE=cached_db needs a shared cache; set REDIS_URL or use SESSION_MODE=db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+ 
+# =====================
+# REAL-TIME CHAT EVENTS
+# =====================
+# Broker used to push message changes to open chats (see accounts/realtime.py).
+# The in-process broker needs a single ASGI process per deployment.
+CHAT_EVENT_BROKER = os.getenv('CHAT_EVENT_BROKER', 'accounts.realtime.InProcessBroker')
+ 
+# =====================
+# BACKGROUND JOBS
+# =====================
+# Email and notifications are queued as jobs (accounts/jobs.py). Set
+# JOB_WORKER=true where a `python manage.py run_jobs` process is running.
+# Otherwise the web process runs each job right after its request commits,
+# before the response is sent, so a slow mail server slows that request down.
+JOB_WORKER = os.getenv('JOB_WORKER', 'False').lower() == 'true'
+ 
+# =====================
+# LOGGING
+# =====================
+# Records go through a bounded queue to a background thread that writes them
+# to stdout (accounts/log.py), as JSON lines unless LOG_FORMAT=text.
+# LOG_LEVEL=DEBUG turns on the app's debug events; only LOG_DEBUG_SAMPLE_RATE
+# of them are kept.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'accounts.log.JsonFormatter'},
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'filters': {
+        'sample_debug': {
+            '()': 'accounts.log.SampleFilter',
+            'rate': float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.1')),
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'accounts.log.QueueHandler',
+            'formatter': os.getenv('LOG_FORMAT', 'json'),
+            'filters': ['sample_debug'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': 'WARNING'},
+    'loggers': {
+        'django': {'level': 'INFO'},
+        'django.db.backends': {'level': 'WARNING'},
+        'accounts': {'level': LOG_LEVEL},
+    },
+}
+ 
+# =====================
+# REQUEST METRICS
+# =====================
+# Served in Prometheus format at /accounts/metrics/, to staff users or with
+# "Authorization: Bearer <METRICS_TOKEN>". QUERY_BUDGET_MODE (off, warn or
+# raise) checks views declaring @query_budget; QueryBudgetTests use raise.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'off')
+ 
 # =====================
 # PERFORMANCE OPTIMIZATIONS
 # =====================
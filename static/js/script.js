@@ -226,4 +226,32 @@ function showConfirmModal(title, message, onConfirm) {
     });
     
     modal.show();
-}
\ No newline at end of file
+}
+/**
+ * Listen for pushed message changes on an open chat and refresh it.
+ * Falls back to polling when the server cannot stream (e.g. under WSGI).
+ */
+function listenForChatEvents(chatId, fallbackInterval) {
+    let reloadScheduled = false;
+    const scheduleReload = function() {
+        if (!reloadScheduled) {
+            reloadScheduled = true;
+            setTimeout(function() { window.location.reload(); }, 300);
+        }
+    };
+
+    if (!window.EventSource) {
+        setInterval(scheduleReload, fallbackInterval);
+        return;
+    }
+
+    const source = new EventSource(`/accounts/api/chat/${chatId}/events/`);
+    ['message.created', 'message.updated', 'message.deleted'].forEach(function(eventType) {
+        source.addEventListener(eventType, scheduleReload);
+    });
+    source.onerror = function() {
+        if (source.readyState === EventSource.CLOSED) {
+            setInterval(scheduleReload, fallbackInterval);
+        }
+    };
+}